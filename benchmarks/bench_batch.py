@@ -0,0 +1,52 @@
+"""
+Throughput of `TketPassManager.run_batch` as the number of worker processes grows.
+
+Runs offline with pytket-qiskit's `AerBackend` (requires qiskit-aer). The single process baseline
+is `TketPassManager.run` on the whole batch.
+
+    python benchmarks/bench_batch.py --circuits 500 --qubits 8 --depth 20
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from qiskit.circuit.random import random_circuit
+from pytket.extensions.qiskit import AerBackend
+
+from qiskit_tket_passes import TketPassManager
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--circuits', type=int, default=500)
+    parser.add_argument('--qubits', type=int, default=8)
+    parser.add_argument('--depth', type=int, default=20)
+    parser.add_argument('--optimization-level', type=int, default=2)
+    parser.add_argument('--workers', type=int, nargs='+', default=None)
+    args = parser.parse_args()
+
+    circuits = [random_circuit(args.qubits, args.depth, max_operands=2, seed=seed) for seed in range(args.circuits)]
+    pm = TketPassManager(AerBackend(), optimization_level=args.optimization_level)
+
+    workers = args.workers
+    if workers is None:
+        workers = [1]
+        while workers[-1] * 2 <= os.cpu_count():
+            workers.append(workers[-1] * 2)
+
+    start = time.perf_counter()
+    pm.run(circuits)
+    baseline = time.perf_counter() - start
+    print(f"{'workers':>8} {'time [s]':>10} {'circuits/s':>11} {'speedup':>8}")
+    print(f"{'run':>8} {baseline:>10.2f} {len(circuits) / baseline:>11.1f} {1.0:>8.2f}")
+
+    for max_workers in workers:
+        start = time.perf_counter()
+        for _ in pm.run_batch(circuits, max_workers=max_workers, chunksize=4):
+            pass
+        elapsed = time.perf_counter() - start
+        print(f"{max_workers:>8} {elapsed:>10.2f} {len(circuits) / elapsed:>11.1f} {baseline / elapsed:>8.2f}")
+
+if __name__ == '__main__':
+    main()
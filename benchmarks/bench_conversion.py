@@ -0,0 +1,73 @@
+"""
+Wall time and peak memory of DAGCircuit <-> pytket Circuit conversion.
+
+Compares the native converters of `qiskit_tket_passes.utils` with the previous path that goes
+through an intermediate QuantumCircuit (`dag_to_circuit` + `qiskit_to_tk` and `tk_to_qiskit` +
+`circuit_to_dag`). Peak memory is measured with `tracemalloc`, so it only covers allocations made
+by the Python side (Qiskit objects), not the ones made inside pytket's C++ core.
+
+    python benchmarks/bench_conversion.py --sizes 10000 100000 1000000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from pytket.extensions.qiskit import qiskit_to_tk, tk_to_qiskit
+
+from qiskit_tket_passes.utils import qiskit_dag_to_tk, tk_to_qiskit_dag
+
+def generate_circuit(num_qubits, num_gates, seed=0):
+    rng = random.Random(seed)
+    circ = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        choice = rng.randrange(4)
+        if choice == 0:
+            circ.h(rng.randrange(num_qubits))
+        elif choice == 1:
+            circ.rz(rng.uniform(0, 6.28), rng.randrange(num_qubits))
+        elif choice == 2:
+            circ.sx(rng.randrange(num_qubits))
+        else:
+            control, target = rng.sample(range(num_qubits), 2)
+            circ.cx(control, target)
+    return circ
+
+def measure(func, arg):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(arg)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--qubits', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'gates':>10} {'direction':>10} {'path':>8} {'time [s]':>10} {'peak [MiB]':>11}")
+    for size in args.sizes:
+        dag = circuit_to_dag(generate_circuit(args.qubits, size))
+        tkcirc = qiskit_dag_to_tk(dag)
+
+        cases = [
+            ('dag->tk', 'previous', lambda _dag: qiskit_to_tk(dag_to_circuit(_dag)), dag),
+            ('dag->tk', 'native', qiskit_dag_to_tk, dag),
+            ('tk->dag', 'previous', lambda _tkcirc: circuit_to_dag(tk_to_qiskit(_tkcirc)), tkcirc),
+            ('tk->dag', 'native', tk_to_qiskit_dag, tkcirc),
+        ]
+        for direction, path, func, arg in cases:
+            elapsed, peak = measure(func, arg)
+            print(f"{size:>10} {direction:>10} {path:>8} {elapsed:>10.3f} {peak / 2**20:>11.1f}")
+
+if __name__ == '__main__':
+    main()
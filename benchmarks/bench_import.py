@@ -0,0 +1,60 @@
+"""
+Import time of the package and its effect on Qiskit's plugin discovery.
+
+Every snippet runs in a fresh interpreter, `--repeat` times, and the best time is reported along
+with whether pytket got imported. `import qiskit` is the baseline: discovering the stage plugins
+imports `qiskit_tket_passes.plugins`, which should add little to it and not import pytket, while
+building a tket pass is where pytket gets loaded.
+
+    python benchmarks/bench_import.py --repeat 5
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+import os
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+SNIPPETS = {
+    'import qiskit': 'import qiskit',
+    'import qiskit_tket_passes': 'import qiskit_tket_passes',
+    'import plugins': 'import qiskit_tket_passes.plugins',
+    'list_stage_plugins': (
+        'from qiskit.transpiler.preset_passmanagers.plugin import list_stage_plugins\n'
+        'for stage in ("init", "layout", "routing", "translation", "optimization"):\n'
+        '    list_stage_plugins(stage)'
+    ),
+    'build ToQiskitPass': (
+        'import pytket.passes as tkps\n'
+        'from qiskit_tket_passes import ToQiskitPass\n'
+        'ToQiskitPass(tkps.RemoveRedundancies)'
+    ),
+}
+
+_TEMPLATE = '''
+import json, sys, time
+start = time.perf_counter()
+{snippet}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"time": elapsed, "pytket": any(name.split(".")[0] == "pytket" for name in sys.modules)}}))
+'''
+
+def measure(snippet):
+    code = _TEMPLATE.format(snippet=snippet)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'snippet':>27} {'time [s]':>9} {'pytket':>7}")
+    for name, snippet in SNIPPETS.items():
+        results = [measure(snippet) for _ in range(args.repeat)]
+        best = min(result['time'] for result in results)
+        print(f"{name:>27} {best:>9.3f} {str(results[0]['pytket']):>7}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Wall time of building a `NoiseAwarePlacement` from a Target.
+
+Compares `ToQiskitPass._noise_aware_placer_from_target`, which reads error rates from the target's
+instruction properties into NumPy arrays, with the previous extraction that goes through
+`target_to_backend_properties` and loops over the legacy `BackendProperties` in Python. Targets are
+synthetic square lattices with unidirectional CX couplings and random error rates. The artifact
+cache is cleared before each run, so the NumPy path also pays for rebuilding the Architecture.
+
+    python benchmarks/bench_noise_placement.py --qubits 27 127 433 1121
+"""
+import argparse
+import math
+import random
+import time
+from collections import defaultdict
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from qiskit.circuit import Measure, Parameter
+from qiskit.circuit.library import CXGate, RZGate, SXGate, XGate
+from qiskit.transpiler import InstructionProperties, Target
+from qiskit.transpiler.target import target_to_backend_properties
+import pytket.passes as tkps
+from pytket.circuit import Node
+from pytket.placement import NoiseAwarePlacement
+
+from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes.target_cache import default_cache
+
+def generate_target(num_qubits, seed=0):
+    rng = random.Random(seed)
+    width = math.ceil(math.sqrt(num_qubits))
+    edges = []
+    for q in range(num_qubits):
+        if (q + 1) % width and q + 1 < num_qubits:
+            edges.append((q, q + 1))
+        if q + width < num_qubits:
+            edges.append((q, q + width))
+
+    def props(low, high):
+        return InstructionProperties(duration=rng.uniform(1e-8, 1e-7), error=rng.uniform(low, high))
+
+    target = Target(num_qubits=num_qubits)
+    for gate in (SXGate(), XGate()):
+        target.add_instruction(gate, {(q,): props(1e-4, 1e-3) for q in range(num_qubits)})
+    target.add_instruction(RZGate(Parameter('theta')), {(q,): InstructionProperties(duration=0, error=0) for q in range(num_qubits)})
+    target.add_instruction(CXGate(), {edge: props(5e-3, 2e-2) for edge in edges})
+    target.add_instruction(Measure(), {(q,): props(1e-2, 5e-2) for q in range(num_qubits)})
+    return target
+
+def legacy_placer(target, arc):
+    node_errors = defaultdict(dict)
+    edge_errors = defaultdict(dict)
+    readout_errors = {}
+    coupling_map = target.build_coupling_map()
+    properties = target_to_backend_properties(target)
+    for gate in properties.gates:
+        for param in gate.parameters:
+            if param.name == 'gate_error':
+                if len(gate.qubits) == 1:
+                    node_errors[Node(gate.qubits[0])].update({gate.gate: param.value})
+                else:
+                    edge_errors[(Node(gate.qubits[0]), Node(gate.qubits[1]))].update({gate.gate: param.value})
+                    if gate.qubits[::-1] not in coupling_map:
+                        edge_errors[(Node(gate.qubits[1]), Node(gate.qubits[0]))].update({gate.gate: 2 * param.value})
+    props_dict = properties.to_dict()
+    for n in range(target.num_qubits):
+        readout_errors[Node(n)] = properties.readout_error(n) if len(props_dict['qubits']) > n else 0
+
+    avg = lambda xs: sum(xs.values()) / len(xs)
+    return NoiseAwarePlacement(
+        arc,
+        {k: avg(v) for k, v in node_errors.items()},
+        {k: avg(v) for k, v in edge_errors.items()},
+        readout_errors
+    )
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        default_cache.clear()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--qubits', type=int, nargs='+', default=[27, 127, 433, 1121])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'qubits':>7} {'edges':>6} {'legacy [s]':>11} {'numpy [s]':>10} {'speedup':>8}")
+    for num_qubits in args.qubits:
+        target = generate_target(num_qubits)
+        _pass = ToQiskitPass(tkps.CXMappingPass, target=target)
+        arc = _pass.tket_argument('arc')
+
+        legacy = best_of(lambda: legacy_placer(target, arc), args.repeat)
+        vectorized = best_of(_pass._noise_aware_placer_from_target, args.repeat)
+        num_edges = len(target.build_coupling_map().get_edges())
+        print(f'{num_qubits:>7} {num_edges:>6} {legacy:>11.4f} {vectorized:>10.4f} {legacy / vectorized:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
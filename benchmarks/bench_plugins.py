@@ -0,0 +1,212 @@
+"""
+Compile time, peak memory and circuit quality of the TKET stage plugins against the stock Qiskit
+stages.
+
+Generated QFT, random, quantum volume and Trotter circuits are transpiled offline for a fake
+backend at every requested optimization level, once with the default Qiskit stages (`qiskit`),
+once with all five TKET plugins (`tket`) and once per plugin with only that stage replaced
+(`tket-init`, `tket-layout`, ...). The plugins must be installed (`pip install -e .`) so that
+`transpile` can find them by name.
+
+For every stage of every run, the results record the time spent in its passes, the peak RSS of the
+process at the end of the stage, and the size, depth and two-qubit gate count of the circuit it
+outputs. Each run happens in a fresh process, so peak RSS is not inflated by earlier runs. Results
+are written as JSON together with the package versions, so files from two releases can be diffed.
+
+    python benchmarks/bench_plugins.py --backend FakeGuadalupeV2 --sizes 4 8 12 --output results.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import time
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+STAGES = ['init', 'layout', 'routing', 'translation', 'optimization', 'scheduling']
+
+# Stages that have a TKET plugin, with the `transpile` argument that selects it.
+PLUGIN_STAGES = {
+    'init': 'init_method',
+    'layout': 'layout_method',
+    'routing': 'routing_method',
+    'translation': 'translation_method',
+    'optimization': 'optimization_method',
+}
+
+CONFIGS = {
+    'qiskit': {},
+    'tket': {argument: 'tket' for argument in PLUGIN_STAGES.values()},
+    **{f'tket-{stage}': {argument: 'tket'} for stage, argument in PLUGIN_STAGES.items()},
+    'tket-auto': {'init_method': 'tket_auto', 'optimization_method': 'tket_auto'},
+}
+
+def trotter_circuit(num_qubits, steps=4, dt=0.1):
+    from qiskit import QuantumCircuit
+
+    circ = QuantumCircuit(num_qubits)
+    for _ in range(steps):
+        for parity in (0, 1):
+            for q in range(parity, num_qubits - 1, 2):
+                circ.rxx(dt, q, q + 1)
+                circ.ryy(dt, q, q + 1)
+                circ.rzz(dt, q, q + 1)
+        for q in range(num_qubits):
+            circ.rz(dt, q)
+    return circ
+
+def generate_circuit(name, num_qubits, seed=0):
+    from qiskit.circuit.library import QFT, QuantumVolume
+    from qiskit.circuit.random import random_circuit
+
+    if name == 'qft':
+        return QFT(num_qubits)
+    elif name == 'random':
+        return random_circuit(num_qubits, num_qubits, max_operands=2, seed=seed)
+    elif name == 'qv':
+        return QuantumVolume(num_qubits, seed=seed)
+    elif name == 'trotter':
+        return trotter_circuit(num_qubits)
+    raise ValueError(f'Unknown circuit: {name}')
+
+CIRCUITS = ['qft', 'random', 'qv', 'trotter']
+
+def _peak_rss_mib():
+    # `ru_maxrss` is in KiB on Linux and in bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+def _stage_passes(pm):
+    # Stage of every pass of a `StagedPassManager`, keyed by pass id. The `pre_` and `post_`
+    # stages are counted with their stage.
+    def _flatten(passes):
+        for _pass in passes:
+            if hasattr(_pass, 'passes'):
+                yield from _flatten(_pass.passes)
+            else:
+                yield _pass
+
+    stages = {}
+    for stage in pm.expanded_stages:
+        stage_pm = getattr(pm, stage)
+        if stage_pm is None:
+            continue
+        for pass_set in stage_pm.passes():
+            for _pass in _flatten(pass_set['passes']):
+                stages[id(_pass)] = stage.split('_', 1)[-1]
+    return stages
+
+def run_one(backend_name, circuit_name, num_qubits, config, optimization_level, seed):
+    """
+    Transpile one circuit and return one result per stage, plus a `total` one.
+    """
+    from qiskit.providers import fake_provider
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+    backend = getattr(fake_provider, backend_name)()
+    circ = generate_circuit(circuit_name, num_qubits, seed=seed)
+    pm = generate_preset_pass_manager(optimization_level, backend=backend, seed_transpiler=seed, **CONFIGS[config])
+    pass_stages = _stage_passes(pm)
+
+    stages = {}
+    def callback(**kwargs):
+        dag = kwargs['dag']
+        stage = pass_stages.get(id(kwargs['pass_']), 'other')
+        result = stages.setdefault(stage, {'time': 0.0, 'passes': 0})
+        result['time'] += kwargs['time']
+        result['passes'] += 1
+        result['peak_rss_mib'] = _peak_rss_mib()
+        result['size'] = dag.size()
+        result['depth'] = dag.depth()
+        result['two_qubit_gates'] = len(dag.two_qubit_ops())
+
+    start = time.perf_counter()
+    new_circ = pm.run(circ, callback=callback)
+    elapsed = time.perf_counter() - start
+    stages['total'] = {
+        'time': elapsed,
+        'passes': sum(result['passes'] for result in stages.values()),
+        'peak_rss_mib': _peak_rss_mib(),
+        'size': new_circ.size(),
+        'depth': new_circ.depth(),
+        'two_qubit_gates': sum(1 for instruction in new_circ.data if len(instruction.qubits) == 2 and instruction.operation.name != 'barrier'),
+    }
+
+    run = {
+        'circuit': circuit_name,
+        'qubits': num_qubits,
+        'config': config,
+        'optimization_level': optimization_level,
+    }
+    order = STAGES + ['other', 'total']
+    return [dict(run, stage=stage, **stages[stage]) for stage in order if stage in stages]
+
+def _run_in_child(queue, args):
+    try:
+        queue.put(run_one(*args))
+    except Exception as error:
+        queue.put(error)
+
+def run_isolated(*args):
+    # A fresh process per run, so that the peak RSS only covers this run.
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_run_in_child, args=(queue, args))
+    process.start()
+    result = queue.get()
+    process.join()
+    if isinstance(result, Exception):
+        raise result
+    return result
+
+def environment(backend_name):
+    from importlib.metadata import PackageNotFoundError, version
+
+    packages = {}
+    for package in ('qiskit-terra', 'qiskit', 'pytket', 'pytket-qiskit', 'qiskit-tket-passes'):
+        try:
+            packages[package] = version(package)
+        except PackageNotFoundError:
+            packages[package] = None
+    return {
+        'backend': backend_name,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'packages': packages,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='FakeGuadalupeV2')
+    parser.add_argument('--circuits', nargs='+', default=CIRCUITS, choices=CIRCUITS)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 8, 12])
+    parser.add_argument('--configs', nargs='+', default=list(CONFIGS), choices=list(CONFIGS))
+    parser.add_argument('--optimization-levels', type=int, nargs='+', default=[0, 1, 2, 3], choices=[0, 1, 2, 3])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to write the results to (default: stdout)')
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'circuit':>8} {'qubits':>6} {'config':>17} {'level':>5} {'time [s]':>9} {'peak [MiB]':>11} {'2q gates':>9} {'depth':>6}", file=sys.stderr)
+    for circuit_name in args.circuits:
+        for num_qubits in args.sizes:
+            for optimization_level in args.optimization_levels:
+                for config in args.configs:
+                    run = run_isolated(args.backend, circuit_name, num_qubits, config, optimization_level, args.seed)
+                    results.extend(run)
+                    total = run[-1]
+                    print(f"{circuit_name:>8} {num_qubits:>6} {config:>17} {optimization_level:>5} {total['time']:>9.3f} {total['peak_rss_mib']:>11.1f} {total['two_qubit_gates']:>9} {total['depth']:>6}", file=sys.stderr)
+
+    report = {'environment': environment(args.backend), 'results': results}
+    if args.output is None:
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+if __name__ == '__main__':
+    main()
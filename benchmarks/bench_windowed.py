@@ -0,0 +1,68 @@
+"""
+Quality, wall time and peak memory of windowed TKET passes on deep circuits.
+
+Runs a local TKET pass on a first-order Trotter circuit of a 1D Heisenberg chain, once on the
+whole circuit and once per window depth, and reports the resulting gate and two-qubit gate counts.
+Peak memory is measured with `tracemalloc`, so it only covers allocations made by the Python side
+(Qiskit objects), not the ones made inside pytket's C++ core.
+
+    python benchmarks/bench_windowed.py --qubits 20 --steps 2000 --windows 50 200 1000
+"""
+import argparse
+import time
+import tracemalloc
+
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+import pytket.passes as tkps
+
+from qiskit_tket_passes import ToQiskitPass
+
+def trotter_circuit(num_qubits, steps, dt=0.1):
+    circ = QuantumCircuit(num_qubits)
+    for _ in range(steps):
+        for parity in (0, 1):
+            for q in range(parity, num_qubits - 1, 2):
+                circ.rxx(dt, q, q + 1)
+                circ.ryy(dt, q, q + 1)
+                circ.rzz(dt, q, q + 1)
+        for q in range(num_qubits):
+            circ.rz(dt, q)
+    return circ
+
+def measure(_pass, dag):
+    tracemalloc.start()
+    start = time.perf_counter()
+    new_dag = _pass.run(dag)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    two_qubit = sum(1 for node in new_dag.op_nodes() if len(node.qargs) == 2)
+    return elapsed, peak, new_dag.size(), two_qubit
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--qubits', type=int, default=20)
+    parser.add_argument('--steps', type=int, default=2000)
+    parser.add_argument('--windows', type=int, nargs='+', default=[50, 200, 1000])
+    parser.add_argument('--overlap', type=int, default=2)
+    parser.add_argument('--tket-pass', default='SynthesiseTket', choices=['SynthesiseTket', 'RemoveRedundancies', 'KAKDecomposition', 'CliffordSimp', 'FullPeepholeOptimise'])
+    args = parser.parse_args()
+
+    tket_pass = getattr(tkps, args.tket_pass)
+    dag = circuit_to_dag(trotter_circuit(args.qubits, args.steps))
+    print(f'{args.tket_pass} on {dag.size()} gates, depth {dag.depth()}')
+
+    print(f"{'window':>8} {'time [s]':>10} {'peak [MiB]':>11} {'gates':>9} {'2q gates':>9}")
+    for window_depth in [None] + args.windows:
+        _pass = ToQiskitPass(tket_pass, window_depth=window_depth, window_overlap=args.overlap)
+        elapsed, peak, gates, two_qubit = measure(_pass, dag)
+        label = 'full' if window_depth is None else str(window_depth)
+        print(f'{label:>8} {elapsed:>10.2f} {peak / 2**20:>11.1f} {gates:>9} {two_qubit:>9}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Fit the cost model of the `tket_auto` stage plugins to this machine.
+
+Generated circuits (see `bench_plugins.py`) are compiled with the unfused pass sequences of the
+tket init and optimization stages at optimization levels 1 to 3 for a fake backend, the
+`AutoTketPass` records are collected and a `CostModel` is fitted to them and written as JSON.
+Load it with
+
+    from qiskit_tket_passes.cost_model import CostModel, set_default_cost_model
+    set_default_cost_model(CostModel.load('cost_model.json'), time_budget=2.0)
+
+    python benchmarks/calibrate_cost_model.py --backend FakeGuadalupeV2 --sizes 4 8 12 16 --output cost_model.json
+"""
+import argparse
+import json
+import sys
+
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from bench_plugins import CIRCUITS, generate_circuit
+
+def collect_records(backend_name, circuit_names, sizes, seed=0):
+    from qiskit.converters import circuit_to_dag
+    from qiskit.providers import fake_provider
+    from qiskit.transpiler import PassManagerConfig
+    from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
+
+    from qiskit_tket_passes import instrumentation
+    from qiskit_tket_passes.cost_model import AutoTketPass
+    from qiskit_tket_passes.plugins import _init_passes, _optimization_passes
+
+    backend = getattr(fake_provider, backend_name)()
+    config = PassManagerConfig.from_backend(backend)
+    # Circuits are laid out and translated for the backend first, as the optimization stage would see them.
+    prepare = generate_preset_pass_manager(0, backend=backend, seed_transpiler=seed)
+
+    records = []
+    sink = instrumentation.add_sink(lambda record: records.append(record) if record['pass'] == 'AutoTketPass' else None)
+    try:
+        for circuit_name in circuit_names:
+            for num_qubits in sizes:
+                circ = generate_circuit(circuit_name, num_qubits, seed=seed)
+                stages = [
+                    (circuit_to_dag(circ.decompose()), _init_passes),
+                    (circuit_to_dag(prepare.run(circ)), _optimization_passes),
+                ]
+                for dag, passes_of_level in stages:
+                    for level in (1, 2, 3):
+                        # Unfused, so that the time of every pass is measured on its own.
+                        _pass = AutoTketPass({level: passes_of_level(config, level)}, time_budget=float('inf'))
+                        _pass.run(dag)
+                        print(f"{circuit_name:>8} {num_qubits:>6} {passes_of_level.__name__:>20} {level:>5} {records[-1]['time']:>9.3f}", file=sys.stderr)
+    finally:
+        instrumentation.remove_sink(sink)
+    return records
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--backend', default='FakeGuadalupeV2')
+    parser.add_argument('--circuits', nargs='+', default=CIRCUITS, choices=CIRCUITS)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 8, 12, 16])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--records', help='JSON lines file to also write the records to')
+    parser.add_argument('--output', default='cost_model.json')
+    args = parser.parse_args()
+
+    from qiskit_tket_passes.cost_model import CostModel
+
+    records = collect_records(args.backend, args.circuits, args.sizes, seed=args.seed)
+    if args.records is not None:
+        with open(args.records, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    model = CostModel.fit(records)
+    model.save(args.output)
+    for name, coefficients in sorted(model.coefficients.items()):
+        print(f'{name:>22} ' + ' '.join(f'{value:.2e}' for value in coefficients), file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
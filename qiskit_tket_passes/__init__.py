@@ -1,2 +1,27 @@
-from .tket_pass_manager import TketPassManager
-from .to_qiskit_pass import ToQiskitPass
\ No newline at end of file
+"""
+Use TKET passes in Qiskit's transpiler.
+
+The public names are imported on first access (PEP 562), so that importing the package, e.g. when
+Qiskit discovers the stage plugins, does not import pytket.
+"""
+import importlib
+
+_LAZY_ATTRIBUTES = {
+    'TketPassManager': '.tket_pass_manager',
+    'ToQiskitPass': '.to_qiskit_pass',
+    'portfolio_pass': '.to_qiskit_pass',
+    'fuse_tket_passes': '.to_qiskit_pass',
+    'TimeBudgetExceeded': '.time_budget',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,188 @@
+"""
+Architectures and coupling maps built in bulk.
+
+Edges are normalized to an `(n, 2)` integer array once, whether they are given as an array, a list
+of pairs, a `CouplingMap` or a rustworkx graph, and the pytket `Architecture` and Qiskit
+`CouplingMap` built from them are memoized by the content of that array, so devices with
+thousands of edges are only converted once per process.
+
+An `ArchitecturePrecomputation` holds what the placement and routing passes of every circuit
+compiled for one device can share: the distances between its qubits and the placements already
+found for circuits of a given structure. It is cached with the target's other artifacts and can be
+saved to disk.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from threading import RLock
+
+import numpy as np
+import rustworkx as rx
+from qiskit.transpiler import CouplingMap
+from pytket.architecture import Architecture
+
+from .target_cache import CacheInfo, default_cache
+
+# Types accepted wherever edges are expected.
+EDGE_TYPES = (list, tuple, np.ndarray, CouplingMap, rx.PyGraph, rx.PyDiGraph)
+
+def edge_array(edges):
+    """
+    The edges of `edges` (an array or list of pairs, a `CouplingMap` or a rustworkx graph) as an
+    `(n, 2)` int64 array.
+    """
+    if isinstance(edges, CouplingMap):
+        edges = edges.graph
+    if isinstance(edges, (rx.PyGraph, rx.PyDiGraph)):
+        edges = edges.edge_list()
+    return np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+
+def _num_nodes(edges, edges_array):
+    if isinstance(edges, CouplingMap):
+        edges = edges.graph
+    if isinstance(edges, (rx.PyGraph, rx.PyDiGraph)):
+        return edges.num_nodes()
+    return int(edges_array.max()) + 1 if len(edges_array) else 0
+
+class ArchitectureCache:
+    """
+    LRU cache of `(Architecture, CouplingMap)` pairs keyed by the content of their edge array and
+    their number of qubits. At most `maxsize` pairs are kept.
+    """
+    def __init__(self, maxsize: int = 32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, edges, num_qubits: int = None):
+        edges_array = edge_array(edges)
+        if num_qubits is None:
+            num_qubits = _num_nodes(edges, edges_array)
+        key = (num_qubits, hashlib.sha256(edges_array.tobytes()).hexdigest())
+
+        with self._lock:
+            pair = self._entries.get(key)
+            if pair is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pair
+            self.misses += 1
+
+        edge_list = edges_array.tolist()
+        coupling_map = CouplingMap()
+        coupling_map.graph.add_nodes_from(range(num_qubits))
+        coupling_map.graph.extend_from_edge_list([tuple(edge) for edge in edge_list])
+        pair = (Architecture(edge_list), coupling_map)
+
+        with self._lock:
+            self._entries[key] = pair
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return pair
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+default_architecture_cache = ArchitectureCache()
+
+def architecture_and_coupling_map(edges, num_qubits: int = None):
+    """
+    The memoized `Architecture` and `CouplingMap` of `edges` (see `edge_array`). `num_qubits`
+    defaults to the number of nodes of a graph or coupling map, or to one more than the largest
+    qubit index of an edge list. The returned objects are shared and must not be modified.
+    """
+    return default_architecture_cache.get(edges, num_qubits)
+
+def build_architecture(edges):
+    """The memoized `Architecture` of `edges` (see `edge_array`)."""
+    return architecture_and_coupling_map(edges)[0]
+
+class ArchitecturePrecomputation:
+    """
+    Data derived once per device architecture: its edges, the all-pairs distance matrix of its
+    (undirected) coupling graph, with `inf` between disconnected qubits, and an LRU memo of at most
+    `maxsize` placements, keyed by the structure of the placed circuit and the placement pass.
+    """
+    def __init__(self, edges, num_qubits: int = None, distances=None, maxsize: int = 4096):
+        self.edges = edge_array(edges)
+        if num_qubits is None:
+            num_qubits = _num_nodes(edges, self.edges)
+        self.num_qubits = num_qubits
+        self.maxsize = maxsize
+
+        if distances is None:
+            graph = rx.PyGraph()
+            graph.add_nodes_from(range(num_qubits))
+            graph.extend_from_edge_list([tuple(edge) for edge in self.edges.tolist()])
+            distances = rx.graph_distance_matrix(graph)
+            distances[(distances == 0) & ~np.eye(num_qubits, dtype=bool)] = np.inf
+        self.distances = np.asarray(distances, dtype=float)
+        self._adjacent = self.distances == 1
+
+        self._placements = OrderedDict()
+        self._lock = RLock()
+
+    def are_adjacent(self, pairs):
+        """Whether every pair of qubit indices in the `(n, 2)` array `pairs` is an edge (in either direction)."""
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        if len(pairs) and pairs.max() >= self.num_qubits:
+            return False
+        return bool(self._adjacent[pairs[:, 0], pairs[:, 1]].all())
+
+    def placement(self, key):
+        with self._lock:
+            placement = self._placements.get(key)
+            if placement is not None:
+                self._placements.move_to_end(key)
+            return placement
+
+    def remember_placement(self, key, placement):
+        with self._lock:
+            self._placements[key] = placement
+            self._placements.move_to_end(key)
+            while len(self._placements) > self.maxsize:
+                self._placements.popitem(last=False)
+
+    def save(self, path: str):
+        with self._lock:
+            placements = json.dumps(list(self._placements.items()))
+        with open(path, 'wb') as _file:
+            np.savez_compressed(_file, edges=self.edges, num_qubits=self.num_qubits, distances=self.distances, placements=np.array(placements))
+
+    @classmethod
+    def load(cls, path: str, target=None):
+        """
+        Load a precomputation saved with `save`. With `target`, it is also cached for the target,
+        whose coupling map must have the same edges.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            precomputation = cls(data['edges'], int(data['num_qubits']), data['distances'])
+            for key, placement in json.loads(str(data['placements'])):
+                precomputation.remember_placement(key, placement)
+
+        if target is not None:
+            coupling_map = default_cache.get(target, 'coupling_map', target.build_coupling_map)
+            if coupling_map is None or not np.array_equal(edge_array(coupling_map), precomputation.edges):
+                raise ValueError('The precomputation was built for another architecture than the target.')
+            default_cache.put(target, 'precomputation', precomputation)
+        return precomputation
+
+def architecture_precomputation(target):
+    """
+    The `ArchitecturePrecomputation` of `target`, built once per target content and shared by
+    every tket pass built for it, or None if the target has no coupling map.
+    """
+    def _build():
+        coupling_map = default_cache.get(target, 'coupling_map', target.build_coupling_map)
+        return None if coupling_map is None else ArchitecturePrecomputation(coupling_map)
+
+    return default_cache.get(target, 'precomputation', _build)
@@ -0,0 +1,188 @@
+"""
+Prebuilt pass managers.
+
+Building a pass manager of tket passes derives architectures, placers, gate sets and replacement
+circuits from the backend or Target. A built pass manager can be saved to a JSON artifact and
+loaded again without any of that work: every tket pass is stored with its `to_dict()`
+serialization, which already contains the derived data, together with the options of its
+`ToQiskitPass` wrapper and the structure of the flow controllers around it. Flow controllers are
+either linear or run on a condition registered in `_CONDITIONS`, and the few stateless Qiskit
+passes of the stage plugins (see `_QISKIT_PASSES`) are saved with their arguments. Artifacts
+record the pytket and Qiskit versions they were built with, and loading one with other versions
+fails unless `check_versions` is False.
+"""
+import json
+
+import pytket
+import qiskit
+from qiskit.transpiler import FlowController, PassManager
+from qiskit.transpiler.passes import ApplyLayout, EnlargeWithAncilla, FullAncillaAllocation, GatesInBasis, TrivialLayout
+from qiskit.transpiler.runningpassmanager import ConditionalController, FlowControllerLinear
+
+from .architecture import architecture_and_coupling_map
+from .plugins import _not_all_gates_in_basis
+from .to_qiskit_pass import ToQiskitPass, _is_tket_pass
+from .utils import tket_pass_from_dict
+
+FORMAT_VERSION = 2
+
+# Formats that can still be loaded: format 1 has neither conditions nor Qiskit passes.
+_LOADABLE_FORMATS = (1, FORMAT_VERSION)
+
+# Conditions of flow controllers that can be saved, by name.
+_CONDITIONS = {
+    'not_all_gates_in_basis': _not_all_gates_in_basis,
+}
+
+# Qiskit passes that can be saved: they keep no state between runs besides their arguments.
+_QISKIT_PASSES = {_pass.__name__: _pass for _pass in [GatesInBasis, TrivialLayout, FullAncillaAllocation, EnlargeWithAncilla, ApplyLayout]}
+
+# Options of `ToQiskitPass` stored in artifacts, with their default values.
+_PASS_OPTIONS = {
+    'set_layout': False,
+    'window_depth': None,
+    'window_overlap': 2,
+    'time_budget': None,
+    'incremental': False,
+    'cost': 'two_qubit_gates',
+}
+
+def _versions():
+    return {'pytket': pytket.__version__, 'qiskit': qiskit.__version__}
+
+def _dump_condition(condition):
+    for name, _condition in _CONDITIONS.items():
+        if condition is _condition:
+            return name
+    raise ValueError(f'Only flow controllers with a registered condition can be saved, not {condition}.')
+
+def _dump_qiskit_pass(_pass):
+    name = type(_pass).__name__
+    if _QISKIT_PASSES.get(name) is not type(_pass):
+        return None
+    if isinstance(_pass, GatesInBasis):
+        # Gates are only checked against the target's qubits if it has any, and targets are not saved.
+        if _pass._target is not None or _pass._basis_gates is None:
+            return None
+        return {'qiskit_pass': name, 'basis_gates': sorted(_pass._basis_gates)}
+    if isinstance(_pass, (TrivialLayout, FullAncillaAllocation)):
+        coupling_map = _pass.coupling_map
+        return {'qiskit_pass': name, 'num_qubits': coupling_map.size(), 'edges': [list(edge) for edge in coupling_map.get_edges()]}
+    return {'qiskit_pass': name}
+
+def _load_qiskit_pass(_dict):
+    pass_cls = _QISKIT_PASSES[_dict['qiskit_pass']]
+    if pass_cls is GatesInBasis:
+        return GatesInBasis(basis_gates=_dict['basis_gates'])
+    if 'edges' in _dict:
+        return pass_cls(architecture_and_coupling_map(_dict['edges'], _dict['num_qubits'])[1])
+    return pass_cls()
+
+def _dump_pass(_pass):
+    if _is_tket_pass(_pass):
+        if callable(_pass.cost) or _pass.cost == 'fidelity':
+            # Custom costs are functions, and fidelity costs depend on the target, which is not saved.
+            raise ValueError(f'Passes with a custom or fidelity cost cannot be saved: {_pass.name()}')
+        _dict = {'pass': _pass._pass.to_dict()}
+        for name, default in _PASS_OPTIONS.items():
+            if getattr(_pass, name) != default:
+                _dict[name] = getattr(_pass, name)
+        if _pass.candidates:
+            _dict['candidates'] = [candidate.to_dict() for candidate in _pass.candidates]
+        if _pass.fallbacks:
+            _dict['fallbacks'] = [None if fallback is None else _dump_pass(fallback) for fallback in _pass.fallbacks]
+        return _dict
+    elif isinstance(_pass, FlowControllerLinear):
+        return {'sequence': [_dump_pass(_item) for _item in _pass.passes]}
+    elif isinstance(_pass, ConditionalController):
+        return {'sequence': [_dump_pass(_item) for _item in _pass.passes], 'condition': _dump_condition(_pass.condition)}
+    elif isinstance(_pass, list):
+        return {'sequence': [_dump_pass(_item) for _item in _pass]}
+    _dict = _dump_qiskit_pass(_pass)
+    if _dict is None:
+        raise ValueError(f'Only tket passes, the Qiskit passes of the stage plugins and linear or conditional flow controllers can be saved, not {_pass}.')
+    return _dict
+
+def _load_pass(_dict, result_cache):
+    if 'sequence' in _dict:
+        passes = [_load_pass(_item, result_cache) for _item in _dict['sequence']]
+        if 'condition' in _dict:
+            return FlowController.controller_factory(passes, None, condition=_CONDITIONS[_dict['condition']])
+        return FlowController.controller_factory(passes, None)
+    if 'qiskit_pass' in _dict:
+        return _load_qiskit_pass(_dict)
+    fallbacks = [None if fallback is None else _load_pass(fallback, result_cache) for fallback in _dict.get('fallbacks', [])]
+    candidates = [tket_pass_from_dict(candidate) for candidate in _dict.get('candidates', [])]
+    options = {name: _dict.get(name, default) for name, default in _PASS_OPTIONS.items()}
+    return ToQiskitPass(tket_pass_from_dict(_dict['pass']), result_cache=result_cache, fallbacks=fallbacks, candidates=candidates, **options)
+
+def dump_pass_manager(pm: PassManager):
+    """
+    The artifact of `pm` as a JSON serializable dict. `pm` must only contain tket passes and the
+    Qiskit passes of `_QISKIT_PASSES`, possibly in linear flow controllers or in flow controllers
+    with a condition of `_CONDITIONS` (e.g. a `TketPassManager` or the pass manager of a `tket` or
+    `tket_incremental` stage plugin, but not of a `tket_auto` one, whose cost model is not saved).
+    """
+    from .tket_pass_manager import TketPassManager
+
+    pass_sets = []
+    # `PassManager.passes` only gives the names of the flow controllers of a pass set, not their conditions.
+    for pass_set in pm._pass_sets:
+        flow_controllers = dict(pass_set['flow_controllers'])
+        condition = flow_controllers.pop('condition', None)
+        if flow_controllers:
+            raise ValueError(f'Only linear or conditional flow controllers can be saved, not {", ".join(flow_controllers)}.')
+        _dict = _dump_pass(pass_set['passes'])
+        if condition is not None:
+            _dict = {'sequence': _dict['sequence'] if 'sequence' in _dict else [_dict], 'condition': _dump_condition(condition)}
+        pass_sets.append(_dict)
+
+    artifact = {
+        'format': FORMAT_VERSION,
+        'versions': _versions(),
+        'pass_sets': pass_sets,
+    }
+    if isinstance(pm, TketPassManager):
+        artifact['tket_pass'] = pm._tket_pass.to_dict()
+    return artifact
+
+def load_pass_manager_dict(artifact, result_cache=None, check_versions: bool = True):
+    """
+    The pass manager saved in `artifact` (see `dump_pass_manager`): a `TketPassManager` if it was
+    one, a `PassManager` otherwise. Its tket passes use `result_cache`.
+    """
+    from .tket_pass_manager import TketPassManager
+
+    if artifact.get('format') not in _LOADABLE_FORMATS:
+        raise ValueError(f"Unsupported pass manager artifact format: {artifact.get('format')}")
+    if check_versions:
+        mismatches = [
+            f'{package} {version} (installed: {_versions()[package]})'
+            for package, version in artifact['versions'].items()
+            if version != _versions()[package]
+        ]
+        if mismatches:
+            raise ValueError('The pass manager artifact was built with ' + ', '.join(mismatches) + '.')
+
+    if 'tket_pass' in artifact:
+        pm = TketPassManager.__new__(TketPassManager)
+        PassManager.__init__(pm)
+        pm._result_cache = result_cache
+        pm._tket_pass = tket_pass_from_dict(artifact['tket_pass'])
+    else:
+        pm = PassManager()
+    for pass_set in artifact['pass_sets']:
+        if 'condition' in pass_set:
+            passes = [_load_pass(_item, result_cache) for _item in pass_set['sequence']]
+            pm.append(passes, condition=_CONDITIONS[pass_set['condition']])
+        else:
+            pm.append(_load_pass(pass_set, result_cache))
+    return pm
+
+def save_pass_manager(pm: PassManager, path: str):
+    with open(path, 'w') as _file:
+        json.dump(dump_pass_manager(pm), _file, separators=(',', ':'))
+
+def load_pass_manager(path: str, result_cache=None, check_versions: bool = True):
+    with open(path) as _file:
+        return load_pass_manager_dict(json.load(_file), result_cache=result_cache, check_versions=check_versions)
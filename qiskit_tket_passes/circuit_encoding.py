@@ -0,0 +1,281 @@
+"""
+Array-backed circuits shared between processes.
+
+An `EncodedCircuit` holds the circuit that is interchanged between a Qiskit `DAGCircuit` and a
+pytket `Circuit` (see `utils.qiskit_dag_to_tk` and `utils.tk_to_qiskit_dag`) as a few flat arrays:
+the pytket `OpType` of every command, the indices of its qubits and bits and its parameters in
+half-turns. A small symbol table holds the name of the circuit, its registers and its global
+phase. Encoded circuits can be copied to a block of `multiprocessing.shared_memory`, so that
+worker processes (see `TketPassManager.run_batch`) can rebuild pytket circuits and hand their
+results back without pickling Qiskit or pytket objects.
+
+Only the circuits that the native converters of `utils` handle can be encoded. `ValueError` is
+raised for the others, e.g. circuits with symbolic parameters or conditional operations.
+"""
+from collections import namedtuple
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+import numpy as np
+from qiskit.circuit import Barrier, ClassicalRegister, ParameterExpression, QuantumRegister
+from qiskit.dagcircuit import DAGCircuit
+from pytket.circuit import Bit, Circuit, OpType, Qubit
+
+from .utils import (
+    _NotNativelyConvertible, _expand_unknown_gates, _gate_from_tk, _implicit_permutation, _native_optype, _param_to_tk,
+    qiskit_dag_to_tk, tk_to_qiskit_dag
+)
+
+# `qregs` and `cregs` are lists of `(name, size)` pairs and `phase` is in half-turns. The arguments
+# of command `i` are `args[arg_offsets[i]:arg_offsets[i + 1]]`, indices into the qubits of all
+# `qregs` followed by the bits of all `cregs`, and its parameters are sliced from `params` by
+# `param_offsets` in the same way.
+EncodedCircuit = namedtuple('EncodedCircuit', ['name', 'qregs', 'cregs', 'phase', 'optypes', 'arg_offsets', 'args', 'param_offsets', 'params'])
+
+# A block of shared memory holding the arrays of an encoded circuit, and its symbol table.
+SharedCircuit = namedtuple('SharedCircuit', ['name', 'header'])
+
+# Arrays in the order of their layout in shared memory, the 8 byte parameters first to keep them aligned.
+_ARRAYS = [('params', np.float64), ('optypes', np.int32), ('arg_offsets', np.int32), ('args', np.int32), ('param_offsets', np.int32)]
+
+@lru_cache(maxsize=None)
+def _encodable_optypes():
+    # The op types that `_decode_dag_native` converts, or that pytket-qiskit converts without boxes
+    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate, _known_qiskit_gate_rev
+
+    optypes = {OpType.Barrier, OpType.Phase, OpType.Measure, OpType.Reset, OpType.TK1}
+    for optype, gate_cls in _known_qiskit_gate_rev.items():
+        if _known_qiskit_gate.get(gate_cls) == optype and not optype.name.endswith('Box') and optype != OpType.CustomGate:
+            optypes.add(optype)
+    return frozenset(optypes)
+
+@lru_cache(maxsize=1024)
+def _is_valid_command(optype, num_params, num_qubits, num_bits):
+    # Whether pytket accepts the operation with that many parameters and arguments, e.g. not the
+    # global phase parameter of a CUGate
+    try:
+        Circuit(num_qubits, num_bits).add_gate(optype, [0] * num_params, [Qubit(i) for i in range(num_qubits)] + [Bit(i) for i in range(num_bits)])
+    except RuntimeError:
+        return False
+    return True
+
+def _arrays(optypes, arg_offsets, args, param_offsets, params):
+    return (
+        np.array(optypes, dtype=np.int32),
+        np.array(arg_offsets, dtype=np.int32),
+        np.array(args, dtype=np.int32),
+        np.array(param_offsets, dtype=np.int32),
+        np.array(params, dtype=np.float64),
+    )
+
+def encode_dag(dag: DAGCircuit):
+    """The `EncodedCircuit` of `dag`. Gates unknown to pytket are replaced by their definitions."""
+    dag = _expand_unknown_gates(dag)
+
+    try:
+        return _encode_dag_native(dag)
+    except _NotNativelyConvertible:
+        return encode_tk(qiskit_dag_to_tk(dag))
+
+def _encode_dag_native(dag: DAGCircuit):
+    if isinstance(dag.global_phase, ParameterExpression):
+        raise _NotNativelyConvertible()
+
+    units = {}
+    qregs = []
+    for qreg in dag.qregs.values():
+        qregs.append((qreg.name, qreg.size))
+        units.update((qubit, len(units)) for qubit in qreg)
+    cregs = []
+    for creg in dag.cregs.values():
+        cregs.append((creg.name, creg.size))
+        units.update((clbit, len(units)) for clbit in creg)
+
+    # Bits that do not belong to exactly one register
+    if len(units) != dag.num_qubits() + dag.num_clbits() or sum(size for _, size in qregs + cregs) != len(units):
+        raise _NotNativelyConvertible()
+
+    optypes, arg_offsets, args, param_offsets, params = [], [0], [], [0], []
+    for node in dag.topological_op_nodes():
+        optype = _native_optype(node.op)
+        args.extend(units[qubit] for qubit in node.qargs)
+        if optype != OpType.Barrier:
+            if not _is_valid_command(optype, len(node.op.params), len(node.qargs), len(node.cargs)):
+                raise _NotNativelyConvertible()
+            args.extend(units[clbit] for clbit in node.cargs)
+            params.extend(_param_to_tk(param) for param in node.op.params)
+        optypes.append(optype.value)
+        arg_offsets.append(len(args))
+        param_offsets.append(len(params))
+
+    return EncodedCircuit(dag.name, qregs, cregs, float(dag.global_phase) / np.pi, *_arrays(optypes, arg_offsets, args, param_offsets, params))
+
+def encode_tk(tkcirc: Circuit):
+    """The `EncodedCircuit` of `tkcirc`. Its implicit qubit permutation is replaced by SWAP gates."""
+    if _implicit_permutation(tkcirc):
+        tkcirc = tkcirc.copy()
+        tkcirc.replace_implicit_wire_swaps()
+    if tkcirc.free_symbols():
+        raise ValueError('Circuits with symbolic parameters cannot be encoded.')
+
+    registers = []
+    for units in (tkcirc.qubits, tkcirc.bits):
+        sizes = {}
+        for unit in units:
+            if len(unit.index) != 1:
+                raise ValueError(f'Units with several indices cannot be encoded: {unit}')
+            sizes[unit.reg_name] = max(sizes.get(unit.reg_name, 0), unit.index[0] + 1)
+        registers.append(list(sizes.items()))
+    qregs, cregs = registers
+
+    # Index of the first unit of each register
+    offsets = {}
+    offset = 0
+    for is_qubit, _registers in ((True, qregs), (False, cregs)):
+        for reg_name, size in _registers:
+            offsets[reg_name, is_qubit] = offset
+            offset += size
+
+    encodable = _encodable_optypes()
+    optypes, arg_offsets, args, param_offsets, params = [], [0], [], [0], []
+    for command in tkcirc.get_commands():
+        op = command.op
+        if op.type not in encodable:
+            raise ValueError(f'Operations of type {op.type.name} cannot be encoded.')
+        args.extend(offsets[arg.reg_name, isinstance(arg, Qubit)] + arg.index[0] for arg in command.args)
+        if op.type != OpType.Barrier:
+            params.extend(float(param) for param in op.params)
+        optypes.append(op.type.value)
+        arg_offsets.append(len(args))
+        param_offsets.append(len(params))
+
+    return EncodedCircuit(tkcirc.name, qregs, cregs, float(tkcirc.phase), *_arrays(optypes, arg_offsets, args, param_offsets, params))
+
+def _commands(encoded: EncodedCircuit):
+    # (OpType, arguments, parameters) of every command, with plain Python values
+    optypes = {value: OpType(value) for value in np.unique(encoded.optypes).tolist()}
+    args, arg_offsets = encoded.args.tolist(), encoded.arg_offsets.tolist()
+    params, param_offsets = encoded.params.tolist(), encoded.param_offsets.tolist()
+    for index, value in enumerate(encoded.optypes.tolist()):
+        yield (
+            optypes[value],
+            args[arg_offsets[index]:arg_offsets[index + 1]],
+            params[param_offsets[index]:param_offsets[index + 1]],
+        )
+
+def decode_tk(encoded: EncodedCircuit):
+    """The pytket `Circuit` of `encoded`."""
+    tkcirc = Circuit() if encoded.name is None else Circuit(name=encoded.name)
+    units = []
+    for reg_name, size in encoded.qregs:
+        tkcirc.add_q_register(reg_name, size)
+        units.extend(Qubit(reg_name, index) for index in range(size))
+    for reg_name, size in encoded.cregs:
+        tkcirc.add_c_register(reg_name, size)
+        units.extend(Bit(reg_name, index) for index in range(size))
+
+    for optype, args, params in _commands(encoded):
+        if optype == OpType.Barrier:
+            tkcirc.add_barrier([units[arg] for arg in args])
+        else:
+            tkcirc.add_gate(optype, params, [units[arg] for arg in args])
+
+    tkcirc.add_phase(encoded.phase)
+    return tkcirc
+
+def decode_dag(encoded: EncodedCircuit):
+    """The `DAGCircuit` of `encoded`."""
+    try:
+        return _decode_dag_native(encoded)
+    except _NotNativelyConvertible:
+        return tk_to_qiskit_dag(decode_tk(encoded))
+
+def _decode_dag_native(encoded: EncodedCircuit):
+    dag = DAGCircuit()
+    dag.name = encoded.name
+
+    units = []
+    for reg_name, size in encoded.qregs:
+        qreg = QuantumRegister(size, reg_name)
+        dag.add_qreg(qreg)
+        units.extend(qreg)
+    num_qubits = len(units)
+    for reg_name, size in encoded.cregs:
+        creg = ClassicalRegister(size, reg_name)
+        dag.add_creg(creg)
+        units.extend(creg)
+
+    phase = encoded.phase
+    for optype, args, params in _commands(encoded):
+        qargs = [units[arg] for arg in args if arg < num_qubits]
+        cargs = [units[arg] for arg in args if arg >= num_qubits]
+        if optype == OpType.Barrier:
+            if qargs:
+                dag.apply_operation_back(Barrier(len(qargs)), qargs, [])
+            continue
+        if optype == OpType.Phase:
+            phase += params[0]
+            continue
+
+        gate, gate_phase = _gate_from_tk(optype, params)
+        phase += gate_phase
+        if gate.num_qubits != len(qargs) or gate.num_clbits != len(cargs):
+            raise _NotNativelyConvertible()
+        dag.apply_operation_back(gate, qargs, cargs)
+
+    dag.global_phase = phase * np.pi
+    return dag
+
+def share_circuit(encoded: EncodedCircuit):
+    """
+    Copy the arrays of `encoded` to a new block of shared memory and return a `SharedCircuit`,
+    which is cheap to pickle. The block lives until it is read with `unlink=True` or released with
+    `release_shared_circuit`, by this or any other process.
+    """
+    arrays = [np.asarray(getattr(encoded, name), dtype=dtype) for name, dtype in _ARRAYS]
+    block = shared_memory.SharedMemory(create=True, size=max(sum(array.nbytes for array in arrays), 1))
+    try:
+        offset = 0
+        for array in arrays:
+            np.ndarray(array.shape, array.dtype, buffer=block.buf, offset=offset)[:] = array
+            offset += array.nbytes
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    block.close()
+
+    header = {
+        'name': encoded.name,
+        'qregs': encoded.qregs,
+        'cregs': encoded.cregs,
+        'phase': encoded.phase,
+        'lengths': [len(array) for array in arrays],
+    }
+    return SharedCircuit(block.name, header)
+
+def read_shared_circuit(shared: SharedCircuit, unlink: bool = False):
+    """The `EncodedCircuit` in the block of `shared`, copied out of it. With `unlink`, the block is then released."""
+    block = shared_memory.SharedMemory(name=shared.name)
+    try:
+        arrays = {}
+        offset = 0
+        for (name, dtype), length in zip(_ARRAYS, shared.header['lengths']):
+            arrays[name] = np.frombuffer(block.buf, dtype, length, offset).copy()
+            offset += arrays[name].nbytes
+    finally:
+        block.close()
+        if unlink:
+            block.unlink()
+
+    header = shared.header
+    return EncodedCircuit(header['name'], header['qregs'], header['cregs'], header['phase'], **arrays)
+
+def release_shared_circuit(shared: SharedCircuit):
+    """Release the block of `shared`, if it still exists."""
+    try:
+        block = shared_memory.SharedMemory(name=shared.name)
+    except FileNotFoundError:
+        return
+    block.close()
+    block.unlink()
@@ -0,0 +1,243 @@
+"""
+Adaptive selection of tket pass sequences.
+
+An `AutoTketPass` holds the pass sequences of several optimization levels and picks, for every
+circuit, the heaviest one whose compile time predicted by a `CostModel` fits a time budget. The
+model predicts the time of each tket pass as a power law of features of the circuit (its qubit,
+gate, two-qubit gate and Clifford gate counts). It is calibrated from the instrumentation
+records that `AutoTketPass` emits, so a model can be refitted on the circuits of a workload (see
+`benchmarks/calibrate_cost_model.py`).
+"""
+import json
+import time
+
+import numpy as np
+from qiskit.transpiler import TransformationPass
+
+from . import instrumentation
+from .to_qiskit_pass import _is_tket_pass
+from .utils import standard_pass_names
+
+FEATURES = ['qubits', 'gates', 'two_qubit_gates', 'clifford_gates']
+
+CLIFFORD_GATES = {'id', 'x', 'y', 'z', 'h', 's', 'sdg', 'sx', 'sxdg', 'cx', 'cy', 'cz', 'swap', 'iswap', 'ecr', 'dcx'}
+
+# Coefficients of each pass (see `CostModel`): the log of a time in seconds and the exponents of
+# the features, in the order of `FEATURES`. They include the conversions to and from pytket and
+# were fitted with `benchmarks/calibrate_cost_model.py` on random, QFT, quantum volume and Trotter
+# circuits of 4 to 20 qubits for a 27 qubit backend. Passes that are not listed use the `default`
+# coefficients, about 0.1 ms per gate.
+DEFAULT_COEFFICIENTS = {
+    'default': [-9.0, 0.0, 1.0, 0.0, 0.0],
+    'DecomposeBoxes': [-8.94, 0.12, 0.76, 0.08, -0.16],
+    'RebaseCustom': [-8.72, 0.0, 1.04, 0.73, -0.95],
+    'RemoveRedundancies': [-10.45, 0.0, 1.74, -0.15, -0.69],
+    'SynthesiseTket': [-8.37, -0.13, 1.58, -0.08, -0.47],
+    'CliffordSimp': [-8.04, 0.0, 1.33, -0.16, -0.16],
+    'KAKDecomposition': [-7.71, 0.0, 0.86, 0.11, -0.04],
+    'FullPeepholeOptimise': [-6.02, 0.41, 1.12, 0.3, -0.52],
+    'CXMappingPass': [-4.33, 0.0, 0.69, -0.07, -0.07],
+}
+
+def circuit_features(dag):
+    """The features of `dag` used by `CostModel`, as a dict keyed by the names in `FEATURES`."""
+    gates = two_qubit_gates = clifford_gates = 0
+    for node in dag.op_nodes(include_directives=False):
+        gates += 1
+        if len(node.qargs) == 2:
+            two_qubit_gates += 1
+        if node.op.name in CLIFFORD_GATES:
+            clifford_gates += 1
+    return {
+        'qubits': dag.num_qubits(),
+        'gates': gates,
+        'two_qubit_gates': two_qubit_gates,
+        'clifford_gates': clifford_gates,
+    }
+
+def _log_features(features):
+    return np.array([1.0] + [np.log1p(features[feature]) for feature in FEATURES])
+
+def _pass_names(passes):
+    # Names of the standard tket passes applied by `passes`, one per application.
+    names = []
+    for _pass in passes:
+        try:
+            names.extend(standard_pass_names(_pass._pass.to_dict()))
+        except RuntimeError:
+            names.append('default')
+    return names
+
+class CostModel:
+    """
+    Predicted compile time of tket passes. The time of a pass is `exp(c[0]) * prod((1 + f[k]) **
+    c[k + 1])` for the features `f` of the circuit (see `FEATURES`), with coefficients `c` for
+    each pass name. Passes without coefficients use the `default` ones.
+    """
+    # Weight of the ridge penalty that keeps fitted exponents close to the base model's.
+    ridge = 1.0
+    # Weight of the penalty on the log times, relative to `ridge`. It is only needed for passes that
+    # are always fused with others, whose share of the time cannot be told apart otherwise.
+    intercept_ridge = 1e-3
+    # Maximum number of Gauss-Newton iterations of `fit`.
+    max_iterations = 100
+
+    def __init__(self, coefficients=None):
+        self.coefficients = {name: list(values) for name, values in (coefficients or DEFAULT_COEFFICIENTS).items()}
+
+    def _coefficients(self, name):
+        return np.asarray(self.coefficients.get(name, self.coefficients.get('default', DEFAULT_COEFFICIENTS['default'])), dtype=float)
+
+    def predict(self, pass_names, features):
+        """Predicted time in seconds to apply the tket passes named `pass_names` to a circuit with `features`."""
+        x = _log_features(features)
+        return float(sum(np.exp(self._coefficients(name) @ x) for name in pass_names))
+
+    @classmethod
+    def fit(cls, records, base=None):
+        """
+        A model fitted to the steps of the `AutoTketPass` records in `records` (other records are
+        ignored). A step applies one tket pass, or several when passes are fused (as in the
+        `tket_auto` stage plugins), and its time is the sum of the predicted times of its passes.
+        The coefficients of all passes are fitted together by damped Gauss-Newton iterations on the
+        log of the step times, with a ridge penalty towards the coefficients of `base` (default:
+        `DEFAULT_COEFFICIENTS`), so a few records only adjust them. Steps of a single pass give the
+        most precise coefficients. Passes without records keep the coefficients of `base`.
+        """
+        samples = []
+        for record in records:
+            if record.get('pass') != 'AutoTketPass':
+                continue
+            for step in record['steps']:
+                if step['pass_names'] and step['time'] > 0:
+                    samples.append((step['pass_names'], _log_features(step['features']), np.log(step['time'])))
+
+        model = cls(base.coefficients if base is not None else None)
+        names = sorted({name for sample in samples for name in sample[0]})
+        if not names:
+            return model
+
+        # Number of applications of every pass in every step, and the log features and log time of the steps
+        counts = np.zeros((len(samples), len(names)))
+        for index, sample in enumerate(samples):
+            for name in sample[0]:
+                counts[index, names.index(name)] += 1
+        x = np.array([sample[1] for sample in samples])
+        log_times = np.array([sample[2] for sample in samples])
+
+        prior = np.array([model._coefficients(name) for name in names])
+        penalty = np.full(prior.shape, cls.ridge)
+        penalty[:, 0] *= cls.intercept_ridge
+
+        def _residuals(coefficients):
+            times = counts * np.exp(x @ coefficients.T)
+            return times, np.log(times.sum(axis=1)) - log_times
+
+        def _loss(coefficients):
+            residuals = _residuals(coefficients)[1]
+            return float(residuals @ residuals + np.sum(penalty * (coefficients - prior) ** 2))
+
+        coefficients = prior
+        loss = _loss(coefficients)
+        damping = 1e-3
+        for _ in range(cls.max_iterations):
+            times, residuals = _residuals(coefficients)
+            # The derivative of the log time of a step by the coefficients of a pass is the pass's
+            # share of the step time times the log features.
+            shares = times / times.sum(axis=1, keepdims=True)
+            jacobian = (shares[:, :, None] * x[:, None, :]).reshape(len(samples), -1)
+            hessian = jacobian.T @ jacobian + np.diag(penalty.ravel())
+            gradient = jacobian.T @ residuals + (penalty * (coefficients - prior)).ravel()
+            step = np.linalg.solve(hessian + damping * np.diag(np.diag(hessian)), gradient).reshape(prior.shape)
+
+            new_coefficients = coefficients - step
+            new_loss = _loss(new_coefficients)
+            if new_loss < loss:
+                coefficients, loss = new_coefficients, new_loss
+                damping /= 10
+            else:
+                damping *= 10
+            if np.abs(step).max() < 1e-8 or damping > 1e8:
+                break
+
+        for name, values in zip(names, coefficients):
+            model.coefficients[name] = values.tolist()
+        return model
+
+    def save(self, path: str):
+        with open(path, 'w') as _file:
+            json.dump({'features': FEATURES, 'coefficients': self.coefficients}, _file, indent=1)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path) as _file:
+            _dict = json.load(_file)
+        if _dict['features'] != FEATURES:
+            raise ValueError(f"The cost model was fitted for the features {_dict['features']}, not {FEATURES}.")
+        return cls(_dict['coefficients'])
+
+_default_cost_model = CostModel()
+_default_time_budget = 1.0
+
+def set_default_cost_model(cost_model: CostModel = None, time_budget: float = None):
+    """Use `cost_model` and `time_budget` (in seconds) for the passes built by the `tket_auto` stage plugins."""
+    global _default_cost_model, _default_time_budget
+    if cost_model is not None:
+        _default_cost_model = cost_model
+    if time_budget is not None:
+        _default_time_budget = time_budget
+
+def get_default_cost_model():
+    return _default_cost_model, _default_time_budget
+
+class AutoTketPass(TransformationPass):
+    """
+    Run the pass sequence of the highest of `levels` (a dict of lists of tket passes keyed by
+    optimization level) whose time predicted by `cost_model` fits `time_budget` seconds, or the
+    one of the lowest level if none does. The choice is stored in the `tket_auto` property, and a
+    record with the circuit features, the predicted and measured times and the features and time
+    of every pass is sent to the instrumentation sinks, so models can be refitted with
+    `CostModel.fit`.
+    """
+    def __init__(self, levels, cost_model: CostModel = None, time_budget: float = 1.0):
+        super().__init__()
+        for level, passes in levels.items():
+            if not all(_is_tket_pass(_pass) for _pass in passes):
+                raise ValueError(f'The passes of level {level} must all be tket passes.')
+        self.levels = dict(sorted(levels.items()))
+        self.cost_model = cost_model if cost_model is not None else CostModel()
+        self.time_budget = time_budget
+        self.last_record = None
+
+    def run(self, dag):
+        features = circuit_features(dag)
+        level = min(self.levels)
+        for _level, passes in self.levels.items():
+            if self.cost_model.predict(_pass_names(passes), features) <= self.time_budget:
+                level = _level
+        passes = self.levels[level]
+        pass_names = _pass_names(passes)
+
+        start = time.perf_counter()
+        steps = []
+        for _pass in passes:
+            step_start = time.perf_counter()
+            step_features = features if not steps else circuit_features(dag)
+            _pass.property_set = self.property_set
+            dag = _pass.run(dag)
+            steps.append({'pass_names': _pass_names([_pass]), 'features': step_features, 'time': time.perf_counter() - step_start})
+
+        record = {
+            'pass': 'AutoTketPass',
+            'level': level,
+            'pass_names': pass_names,
+            'features': features,
+            'predicted_time': self.cost_model.predict(pass_names, features),
+            'time': time.perf_counter() - start,
+            'time_budget': self.time_budget,
+            'steps': steps,
+        }
+        self.property_set['tket_auto'] = {'level': level, 'predicted_time': record['predicted_time']}
+        self.last_record = record
+        instrumentation.emit(record)
+        return dag
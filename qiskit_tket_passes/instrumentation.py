@@ -0,0 +1,59 @@
+"""
+Instrumentation of tket passes.
+
+Every run of a `ToQiskitPass` produces a record (a JSON serializable dict) with the time spent
+converting the circuit to pytket, applying the TKET pass and converting back, the gate count and
+depth before and after the pass and whether TKET reported a change. Records are appended to the
+`tket_pass_records` property, stored as the pass' `last_record` and sent to the registered sinks.
+"""
+import json
+import logging
+from threading import Lock
+
+_sinks = []
+
+def add_sink(sink):
+    """Send every record to `sink`, any callable accepting a record (e.g. `LoggingSink`, `JsonLinesSink`)."""
+    _sinks.append(sink)
+    return sink
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+def emit(record):
+    for sink in list(_sinks):
+        sink(record)
+
+class LoggingSink:
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger if logger is not None else logging.getLogger('qiskit_tket_passes')
+        self.level = level
+
+    def __call__(self, record):
+        self.logger.log(self.level, '%s: %s', record['pass'], json.dumps(record))
+
+class JsonLinesSink:
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+
+    def __call__(self, record):
+        line = json.dumps(record) + '\n'
+        with self._lock:
+            with open(self.path, 'a') as _file:
+                _file.write(line)
+
+def pass_manager_callback(sink):
+    """
+    A callback for `PassManager.run(circuits, callback=...)` that sends one record per pass to
+    `sink`: the record of tket passes, extended with the total time measured by Qiskit, and a
+    record with the name and the time for any other pass.
+    """
+    def callback(**kwargs):
+        pass_ = kwargs['pass_']
+        record = getattr(pass_, 'last_record', None)
+        if record is None:
+            record = {'pass': pass_.name()}
+        sink(dict(record, total_time=kwargs['time'], count=kwargs['count']))
+
+    return callback
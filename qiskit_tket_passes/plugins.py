@@ -1,24 +1,25 @@
+import weakref
+
 from qiskit.circuit.library import get_standard_gate_name_mapping
 from qiskit.transpiler.preset_passmanagers.plugin import PassManagerStagePlugin
 from qiskit.transpiler.preset_passmanagers import common
 from qiskit.transpiler import PassManager, PassManagerConfig, Target
-from pytket.passes import (
-    DecomposeBoxes,
-    RebaseCustom,
-    SynthesiseTket,
-    FullPeepholeOptimise,
-    NaivePlacementPass,
-    DecomposeSwapsToCXs,
-    RoutingPass,
-)
-from pytket.passes import CXMappingPass, KAKDecomposition, CliffordSimp, RemoveRedundancies, SimplifyInitial
-
-from .to_qiskit_pass import ToQiskitPass
+
+from .target_cache import default_cache
+
+# Qiskit imports this module when it discovers the stage plugins, even if the tket stages are not
+# used, so pytket is only imported when a stage's pass manager is built.
+
+# Targets built from a pass manager config, so that every stage of a `transpile` call reuses the
+# same Target (and hence the same cached artifacts).
+_config_targets = weakref.WeakKeyDictionary()
 
 def _target_from_pm_config(pm_config: PassManagerConfig):
     target = pm_config.target
 
-    if target is None:
+    if target is None and pm_config in _config_targets:
+        target = _config_targets[pm_config]
+    elif target is None:
         target = Target.from_configuration(
             basis_gates=list(filter(lambda gate: gate in get_standard_gate_name_mapping(), pm_config.basis_gates)),
             coupling_map=pm_config.coupling_map,
@@ -27,78 +28,204 @@ def _target_from_pm_config(pm_config: PassManagerConfig):
             instruction_durations=pm_config.instruction_durations,
             timing_constraints=pm_config.timing_constraints,
         )
+        _config_targets[pm_config] = target
 
     return target
 
-#TODO: Add support to Aer simulators
+def _is_all_to_all(target: Target):
+    # Targets without connectivity constraints (simulators, targets built from basis gates only)
+    # and fully connected ones need neither placement nor routing.
+    coupling_map = default_cache.get(target, 'coupling_map', target.build_coupling_map)
+    if coupling_map is None:
+        return True
+    num_qubits = coupling_map.size()
+    return len(set(coupling_map.get_edges())) == num_qubits * (num_qubits - 1)
+
+def _not_all_gates_in_basis(property_set):
+    # A named condition, so that pass managers using it can be saved (see `artifacts`).
+    return not property_set['all_gates_in_basis']
+
+def _rebase_if_needed(pm: PassManager, rebase, target: Target):
+    # The rebase only runs (and converts the circuit to pytket and back) if some gates of the
+    # circuit are not in the gate set of the target. The rebase cannot do more than change the gate
+    # set, so gates are not checked on their qubits, which also works for targets built from basis
+    # gates only (without qubits) and keeps the stage savable (see `artifacts`).
+    from qiskit.transpiler.passes import GatesInBasis
+
+    pm.append(GatesInBasis(basis_gates=sorted(target.operation_names)))
+    pm.append(rebase, condition=_not_all_gates_in_basis)
+    return pm
+
+def _rebase_to_target(pm: PassManager, target: Target):
+    # Passes that cannot keep implicit permutations in the layout replace them by SWAP gates, which
+    # may not be supported by the target, so the last passes of a stage rebase the circuit if needed.
+    from pytket.passes import RebaseCustom
+    from .to_qiskit_pass import ToQiskitPass
+
+    return _rebase_if_needed(pm, ToQiskitPass(RebaseCustom, target=target), target)
+
+def _init_passes(pass_manager_config, optimization_level):
+    from pytket.passes import DecomposeBoxes, FullPeepholeOptimise, RebaseCustom, SynthesiseTket
+    from .to_qiskit_pass import ToQiskitPass
+
+    passes = [
+        ToQiskitPass(DecomposeBoxes, set_layout=True),
+    ]
+    if optimization_level == 0:
+        passes.append(ToQiskitPass(RebaseCustom, target=_target_from_pm_config(pass_manager_config), set_layout=True))
+    elif optimization_level == 1 or optimization_level == 2:
+        passes.append(ToQiskitPass(SynthesiseTket, set_layout=True))
+    elif optimization_level == 3:
+        passes.append(ToQiskitPass(FullPeepholeOptimise, set_layout=True))
+
+    return passes
+
 class TketInitPassManager(PassManagerStagePlugin):
     def pass_manager(self, pass_manager_config, optimization_level):
+        from .to_qiskit_pass import fuse_tket_passes
 
-        passes = [
-            ToQiskitPass(DecomposeBoxes),
-        ]
+        passes = _init_passes(pass_manager_config, optimization_level)
         if optimization_level == 0:
-            passes.append(ToQiskitPass(RebaseCustom, target=_target_from_pm_config(pass_manager_config)))
-        elif optimization_level == 1 or optimization_level == 2:
-            passes.append(ToQiskitPass(SynthesiseTket))
-        elif passes == 3:
-            passes.append(ToQiskitPass(FullPeepholeOptimise))
+            target = _target_from_pm_config(pass_manager_config)
+            if _is_all_to_all(target):
+                return _rebase_if_needed(PassManager(passes[:1]), passes[1], target)
 
-        return PassManager(passes)
+        return PassManager(fuse_tket_passes(passes))
 
 class TketLayoutPassManager(PassManagerStagePlugin):
     def pass_manager(self, pass_manager_config, optimization_level):
+        from pytket.passes import NaivePlacementPass
+        from .to_qiskit_pass import ToQiskitPass
 
-        #TODO:The output from this stage is expected to have the layout property set field
-        # set with a Layout object.
-        return PassManager(
-            [
-                ToQiskitPass(NaivePlacementPass, target=_target_from_pm_config(pass_manager_config)),
-                ToQiskitPass(DecomposeSwapsToCXs, target=_target_from_pm_config(pass_manager_config)),
-                ToQiskitPass(NaivePlacementPass, target=_target_from_pm_config(pass_manager_config)),
-            ]
-        )
+        target = _target_from_pm_config(pass_manager_config)
+        coupling_map = default_cache.get(target, 'coupling_map', target.build_coupling_map)
+
+        if _is_all_to_all(target):
+            if coupling_map is None:
+                return None
+            # Every placement is as good as the trivial one.
+            from qiskit.transpiler.passes import TrivialLayout
+
+            layout = PassManager([TrivialLayout(coupling_map)])
+            layout += common.generate_embed_passmanager(coupling_map)
+            return layout
+
+        # The placement sets the `layout` property, which the embedding then applies to the circuit.
+        layout = PassManager([
+            ToQiskitPass(NaivePlacementPass, target=target, set_layout=True),
+        ])
+        layout += common.generate_embed_passmanager(coupling_map)
+        return layout
 
 class TketRoutingPassManager(PassManagerStagePlugin):
     def pass_manager(self, pass_manager_config, optimization_level):
+        target = _target_from_pm_config(pass_manager_config)
+        if _is_all_to_all(target):
+            return None
+
+        from pytket.passes import DecomposeSwapsToCXs, RoutingPass
+        from .to_qiskit_pass import ToQiskitPass
+
 
         return PassManager(
             [
-                ToQiskitPass(RoutingPass, target=_target_from_pm_config(pass_manager_config)),
+                ToQiskitPass(RoutingPass, target=target, set_layout=True),
+                ToQiskitPass(DecomposeSwapsToCXs, target=target, set_layout=True),
             ]
         )
 
 class TketTranslationPassManager(PassManagerStagePlugin):
     def pass_manager(self, pass_manager_config, optimization_level):
-  
+        from pytket.passes import RebaseCustom
+        from .to_qiskit_pass import ToQiskitPass
+
+        target = _target_from_pm_config(pass_manager_config)
+        if _is_all_to_all(target):
+            return _rebase_to_target(PassManager(), target)
+
         return PassManager(
             [
-                ToQiskitPass(RebaseCustom, target=_target_from_pm_config(pass_manager_config))
+                ToQiskitPass(RebaseCustom, target=target)
             ]
         )
 
+def _optimization_passes(pass_manager_config, optimization_level):
+    from pytket.passes import CXMappingPass, CliffordSimp, KAKDecomposition, RebaseCustom, RemoveRedundancies, SimplifyInitial, SynthesiseTket
+    from .to_qiskit_pass import ToQiskitPass
+
+    target = _target_from_pm_config(pass_manager_config)
+
+    passes = []
+
+    if optimization_level == 3:
+        passes.append(ToQiskitPass(KAKDecomposition, target=target, target_2qb_gate='cx', allow_swaps=False, set_layout=True))
+        passes.append(ToQiskitPass(CliffordSimp, target=target, allow_swaps=False, set_layout=True))
+
+        # TODO: Why do we need this?
+        if pass_manager_config.coupling_map is not None:
+            passes.append(ToQiskitPass(CXMappingPass, target=target, directed_cx=False, delay_measures=False, set_layout=True))
+
+    if optimization_level > 1:
+        passes.append(ToQiskitPass(SynthesiseTket, set_layout=True))
+
+    passes.append(ToQiskitPass(RebaseCustom, target=target, set_layout=True))
+    passes.append(ToQiskitPass(RemoveRedundancies, target=target, set_layout=True))
+
+    if optimization_level > 1:
+        passes.append(ToQiskitPass(SimplifyInitial, allow_classical=False, create_all_qubits=True, set_layout=True))
+
+    return passes
+
 class TketOptimizationPassManager(PassManagerStagePlugin):
     def pass_manager(self, pass_manager_config, optimization_level):
         if optimization_level == 0:
             return None
 
-        passes = []
+        from .to_qiskit_pass import fuse_tket_passes
 
-        if optimization_level == 3:
-            passes.append(ToQiskitPass(KAKDecomposition, target=_target_from_pm_config(pass_manager_config), target_2qb_gate='cx', allow_swaps=False))
-            passes.append(ToQiskitPass(CliffordSimp, target=_target_from_pm_config(pass_manager_config), allow_swaps=False))
+        target = _target_from_pm_config(pass_manager_config)
+        return _rebase_to_target(PassManager(fuse_tket_passes(_optimization_passes(pass_manager_config, optimization_level))), target)
 
-            # TODO: Why do we need this?
-            if pass_manager_config.coupling_map is not None:
-                passes.append(ToQiskitPass(CXMappingPass, target=_target_from_pm_config(pass_manager_config), directed_cx=False, delay_measures=False))
+class TketIncrementalOptimizationPassManager(PassManagerStagePlugin):
+    """
+    The tket optimization stage with its local passes applied incrementally: when a circuit is
+    transpiled again after a small edit, only the windows around the edit are optimized again.
+    """
+    def pass_manager(self, pass_manager_config, optimization_level):
+        if optimization_level == 0:
+            return None
 
-        if optimization_level > 1:
-            passes.append(ToQiskitPass(SynthesiseTket))
+        from .to_qiskit_pass import fuse_tket_passes
 
-        passes.append(ToQiskitPass(RebaseCustom, target=_target_from_pm_config(pass_manager_config)))
-        passes.append(ToQiskitPass(RemoveRedundancies, target=_target_from_pm_config(pass_manager_config)))
+        target = _target_from_pm_config(pass_manager_config)
+        return _rebase_to_target(PassManager(fuse_tket_passes(_optimization_passes(pass_manager_config, optimization_level), incremental=True)), target)
 
-        if optimization_level > 1:
-            passes.append(ToQiskitPass(SimplifyInitial, allow_classical=False, create_all_qubits=True))
+def _auto_pass_manager(passes_of_level):
+    # The sequences of levels 1 to 3, chosen per circuit by the default cost model.
+    from .cost_model import AutoTketPass, get_default_cost_model
+    from .to_qiskit_pass import fuse_tket_passes
+
+    cost_model, time_budget = get_default_cost_model()
+    levels = {level: fuse_tket_passes(passes_of_level(level)) for level in (1, 2, 3)}
+    return PassManager(AutoTketPass(levels, cost_model=cost_model, time_budget=time_budget))
+
+class TketAutoInitPassManager(PassManagerStagePlugin):
+    """
+    The tket init stage with the pass sequence of each circuit chosen among those of optimization
+    levels 1 to 3, so that its predicted compile time fits the budget of the default cost model
+    (see `cost_model.set_default_cost_model`). Level 0 is the same as for the `tket` plugin.
+    """
+    def pass_manager(self, pass_manager_config, optimization_level):
+        if optimization_level == 0:
+            return TketInitPassManager().pass_manager(pass_manager_config, optimization_level)
+
+        return _auto_pass_manager(lambda level: _init_passes(pass_manager_config, level))
+
+class TketAutoOptimizationPassManager(PassManagerStagePlugin):
+    """The tket optimization stage with its pass sequence chosen per circuit, like `TketAutoInitPassManager`."""
+    def pass_manager(self, pass_manager_config, optimization_level):
+        if optimization_level == 0:
+            return None
 
-        return PassManager(passes)
\ No newline at end of file
+        target = _target_from_pm_config(pass_manager_config)
+        return _rebase_to_target(_auto_pass_manager(lambda level: _optimization_passes(pass_manager_config, level)), target)
@@ -0,0 +1,141 @@
+"""
+Portfolios of tket passes.
+
+Several candidate passes are applied to the same pytket circuit, each in its own child process (see
+`time_budget`), and the result with the lowest cost is kept. Costs are computed in the parent
+process from the returned circuits. A global time budget bounds the whole portfolio: candidates
+still running when it runs out are killed and only the finished ones are compared.
+"""
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing.connection import wait
+
+from qiskit.transpiler.exceptions import TranspilerError
+from pytket.circuit import Circuit, OpType
+
+from .time_budget import TimeBudgetExceeded, _apply_in_child, _map_from_list
+
+def two_qubit_gate_cost(circuit: Circuit):
+    return circuit.n_2qb_gates()
+
+def depth_cost(circuit: Circuit):
+    return circuit.depth()
+
+def fidelity_cost(averages):
+    """
+    A cost that estimates the infidelity of a circuit, as `-log` of the product of the success
+    rates of its gates and measurements, from the average error rates of a target (see
+    `_average_errors_from_target`). Qubits are looked up by index, so the estimate is only exact
+    for circuits that are already laid out; gates on unknown qubits or edges get the mean error.
+    """
+    node_errors, edge_errors, readout_errors = averages or ({}, {}, {})
+
+    def _mean(errors):
+        return sum(errors.values()) / len(errors) if errors else 0.0
+
+    mean_node, mean_edge, mean_readout = _mean(node_errors), _mean(edge_errors), _mean(readout_errors)
+
+    def _cost(circuit: Circuit):
+        log_fidelity = 0.0
+        for command in circuit.get_commands():
+            op_type = command.op.type
+            if op_type == OpType.Barrier:
+                continue
+            indices = [qubit.index[0] if len(qubit.index) == 1 else None for qubit in command.qubits]
+            if op_type == OpType.Measure:
+                error = readout_errors.get(indices[0], mean_readout)
+            elif len(indices) == 1:
+                error = node_errors.get(indices[0], mean_node)
+            elif len(indices) == 2:
+                error = edge_errors.get(tuple(indices), edge_errors.get(tuple(indices[::-1]), mean_edge))
+            elif indices:
+                error = mean_edge
+            else:
+                continue
+            log_fidelity += math.log1p(-min(error, 1 - 1e-12))
+        return -log_fidelity
+
+    return _cost
+
+def apply_portfolio(tket_passes, tkcirc: Circuit, cost, time_budget: float = None, max_workers: int = None, implicit_swaps: bool = False):
+    """
+    Apply each of `tket_passes` to a `CompilationUnit` of `tkcirc` in a child process, at most
+    `max_workers` (default: the number of CPUs) at a time, and pick the result for which `cost`
+    (a function of a pytket circuit) is lowest. Ties go to the earlier pass. Candidates that fail
+    are skipped. `tkcirc` is left unchanged.
+
+    Results are scored with their implicit qubit permutations replaced by SWAP gates, as they are
+    converted to Qiskit, unless `implicit_swaps` is True because the caller keeps the permutations
+    out of the circuit.
+
+    Returns the index of the chosen pass, the costs of all candidates (None for the ones that
+    failed or did not finish) and the result of the chosen pass, as returned by
+    `apply_with_time_budget`. Raises `TimeBudgetExceeded` if no candidate finished within
+    `time_budget` seconds, or `TranspilerError` if they all failed.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    deadline = None if time_budget is None else time.monotonic() + time_budget
+    circuit_dict = tkcirc.to_dict()
+    pending = list(enumerate(tket_passes))
+    running = {}
+    results = [None] * len(tket_passes)
+    errors = []
+    timed_out = False
+
+    try:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                index, tket_pass = pending.pop(0)
+                receiver, sender = multiprocessing.Pipe(duplex=False)
+                process = multiprocessing.Process(target=_apply_in_child, args=(tket_pass.to_dict(), circuit_dict, sender), daemon=True)
+                process.start()
+                sender.close()
+                running[receiver] = (index, process)
+
+            timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
+            ready = wait(list(running), timeout)
+            if not ready:
+                timed_out = True
+                break
+            for receiver in ready:
+                index, process = running.pop(receiver)
+                try:
+                    result = receiver.recv()
+                except EOFError:
+                    process.join()
+                    result = f'The process applying the tket pass exited with code {process.exitcode}.'
+                process.join()
+                receiver.close()
+                if isinstance(result, str):
+                    errors.append(result)
+                else:
+                    results[index] = result
+    finally:
+        for receiver, (_, process) in running.items():
+            if process.is_alive():
+                process.kill()
+            process.join()
+            receiver.close()
+
+    costs = [None] * len(tket_passes)
+    circuits = {}
+    for index, result in enumerate(results):
+        if result is not None:
+            circuits[index] = Circuit.from_dict(result[1])
+            scored = circuits[index]
+            if not implicit_swaps:
+                scored = scored.copy()
+                scored.replace_implicit_wire_swaps()
+            costs[index] = cost(scored)
+
+    if not circuits:
+        if timed_out:
+            raise TimeBudgetExceeded(f'No tket pass of the portfolio finished within its time budget of {time_budget} s.')
+        raise TranspilerError('Every tket pass of the portfolio failed: ' + '; '.join(errors))
+
+    best = min(circuits, key=lambda index: (costs[index], index))
+    modified, _, initial_map, final_map = results[best]
+    return best, costs, (modified, circuits[best], _map_from_list(initial_map), _map_from_list(final_map))
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import numbers
+import os
+import pickle
+import tempfile
+from collections import OrderedDict, namedtuple
+from threading import RLock
+
+import numpy as np
+from qiskit.circuit import Parameter, ParameterExpression
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from qiskit.dagcircuit import DAGCircuit
+
+from .target_cache import target_fingerprint
+
+ResultCacheInfo = namedtuple('ResultCacheInfo', ['hits', 'misses', 'disk_hits', 'hit_rate', 'saved_time', 'maxsize', 'currsize'])
+
+def dag_structure_key(dag: DAGCircuit, abstract_parameters: bool = True):
+    """
+    Canonical hash of a DAG's operations, wires and parameters. With `abstract_parameters`, the
+    circuit parameters are replaced by placeholders in order of first appearance, so circuits that
+    only differ in their `Parameter` objects share the same key. Returns the hash and the circuit
+    parameters in placeholder order.
+    """
+    qubit_indices = {qubit: index for index, qubit in enumerate(dag.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(dag.clbits)}
+    parameters = []
+    placeholders = {}
+
+    def _param_repr(param):
+        if isinstance(param, ParameterExpression):
+            if not abstract_parameters:
+                return str(param)
+            for _param in sorted(param.parameters, key=lambda _param: _param.name):
+                if _param not in placeholders:
+                    placeholders[_param] = Parameter(f'_p{len(placeholders)}')
+                    parameters.append(_param)
+            return str(param.subs({_param: placeholders[_param] for _param in param.parameters}))
+        if isinstance(param, numbers.Real):
+            return repr(float(param))
+        if isinstance(param, np.ndarray):
+            # The repr of large arrays is abbreviated, e.g. the matrix of a UnitaryGate
+            return repr((param.shape, param.dtype.str, hashlib.sha256(np.ascontiguousarray(param).tobytes()).hexdigest()))
+        return repr(param)
+
+    _hash = hashlib.sha256()
+    _hash.update(repr((
+        [(qreg.name, qreg.size) for qreg in dag.qregs.values()],
+        [(creg.name, creg.size) for creg in dag.cregs.values()],
+        dag.num_qubits(),
+        dag.num_clbits(),
+    )).encode())
+
+    for node in dag.topological_op_nodes():
+        _hash.update(repr((
+            node.op.name,
+            tuple(qubit_indices[qubit] for qubit in node.qargs),
+            tuple(clbit_indices[clbit] for clbit in node.cargs),
+            tuple(_param_repr(param) for param in node.op.params),
+            repr(getattr(node.op, 'condition', None)),
+        )).encode())
+
+    _hash.update(_param_repr(dag.global_phase).encode())
+
+    return _hash.hexdigest(), parameters
+
+def _pass_digest(tket_pass):
+    try:
+        _dict = tket_pass.to_dict()
+    except RuntimeError:
+        return None
+    return hashlib.sha256(json.dumps(_dict, sort_keys=True).encode()).hexdigest()
+
+class CompiledCircuitCache:
+    """
+    Cache of the circuits compiled by tket passes. Entries are keyed by the structure of the input
+    DAG (with its parameters abstracted away), the pass' `to_dict()` serialization and the target
+    fingerprint. On a hit the parameters of the new circuit are bound into the cached output and the
+    TKET pass is skipped. At most `maxsize` entries are kept in memory. If `directory` is given,
+    entries are also written there, so they can be shared between processes.
+    """
+    def __init__(self, maxsize: int = 256, directory: str = None):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.saved_time = 0.0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def key(self, dag: DAGCircuit, tket_pass, target=None):
+        pass_digest = _pass_digest(tket_pass)
+        if pass_digest is None:
+            return None, None
+
+        structure, parameters = dag_structure_key(dag)
+        _hash = hashlib.sha256(structure.encode())
+        _hash.update(pass_digest.encode())
+        if target is not None:
+            _hash.update(target_fingerprint(target).encode())
+
+        return _hash.hexdigest(), parameters
+
+    def lookup(self, key, parameters):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        dag = self._rebind(entry, parameters)
+        if dag is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.saved_time += entry['time']
+        return dag
+
+    def store(self, key, parameters, dag: DAGCircuit, elapsed: float):
+        entry = {
+            'circuit': dag_to_circuit(dag),
+            'parameters': [param.name for param in parameters],
+            'time': elapsed,
+        }
+        self._remember(key, entry)
+        self._dump(key, entry)
+
+    def info(self):
+        lookups = self.hits + self.misses
+        return ResultCacheInfo(
+            self.hits,
+            self.misses,
+            self.disk_hits,
+            self.hits / lookups if lookups else 0.0,
+            self.saved_time,
+            self.maxsize,
+            len(self._entries),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.hits = self.misses = self.disk_hits = 0
+        self.saved_time = 0.0
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _rebind(self, entry, parameters):
+        circuit = entry['circuit']
+        # The compiled circuit has its own Parameter objects, they are matched by name with the
+        # parameters of the circuit the entry was created from.
+        compiled_parameters = {param.name: param for param in circuit.parameters}
+        binding = {}
+        for name, param in zip(entry['parameters'], parameters):
+            if name in compiled_parameters and compiled_parameters[name] != param:
+                binding[compiled_parameters[name]] = param
+
+        if binding:
+            try:
+                circuit = circuit.assign_parameters(binding)
+            except Exception:
+                return None
+
+        return circuit_to_dag(circuit)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as _file:
+                return pickle.load(_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _dump(self, key, entry):
+        if self.directory is None:
+            return
+        # Write to a temporary file first, so other processes never read a partial entry.
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as _file:
+            pickle.dump(entry, _file)
+        os.replace(tmp_path, self._path(key))
+
+_default_cache = None
+
+# Windows compiled by incremental passes when neither the pass nor the process has a result cache.
+default_window_cache = CompiledCircuitCache(maxsize=4096)
+
+def set_default_result_cache(cache: CompiledCircuitCache):
+    """Use `cache` for every tket pass created without an explicit `result_cache` (e.g. by the stage plugins)."""
+    global _default_cache
+    _default_cache = cache
+
+def get_default_result_cache():
+    return _default_cache
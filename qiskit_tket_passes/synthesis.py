@@ -0,0 +1,161 @@
+from collections import namedtuple
+from threading import RLock
+
+from pytket.circuit import Circuit, OpType
+from pytket.passes._decompositions import _TK1_to_X_SX_Rz, _TK1_to_U
+
+SynthesisCacheInfo = namedtuple('SynthesisCacheInfo', ['hits', 'misses', 'transpilations', 'currsize'])
+
+def _TK1_to_RzRx(a, b, c):
+    return Circuit(1).Rz(c, 0).Rx(b, 0).Rz(a, 0)
+
+# CX replacement circuits for common gate sets, as the qiskit gate names each of them needs, the
+# pytket commands `(optype, params in half-turns, qubits)` and the global phase in half-turns.
+# The first entry whose gates are all in a basis is used for it. SWAP replacements are built from
+# three of these CX replacements, so none of these gate sets goes through the Qiskit transpiler.
+_CX_RECIPES = [
+    # Any basis with CX
+    ({'cx'}, [
+        (OpType.CX, [], (0, 1)),
+    ], 0),
+    # IBM Eagle
+    ({'ecr', 'rz', 'sx', 'x'}, [
+        (OpType.X, [], (0,)),
+        (OpType.SX, [], (1,)),
+        (OpType.Rz, [-0.5], (0,)),
+        (OpType.ECR, [], (0, 1)),
+    ], 0),
+    # IBM Heron
+    ({'cz', 'rz', 'sx', 'x'}, [
+        (OpType.Rz, [0.5], (1,)),
+        (OpType.SX, [], (1,)),
+        (OpType.Rz, [0.5], (1,)),
+        (OpType.CZ, [], (0, 1)),
+        (OpType.Rz, [0.5], (1,)),
+        (OpType.SX, [], (1,)),
+        (OpType.Rz, [0.5], (1,)),
+    ], 0.5),
+    # Ion traps with Molmer-Sorensen gates
+    ({'rxx', 'rx', 'ry', 'rz'}, [
+        (OpType.Ry, [0.5], (0,)),
+        (OpType.XXPhase, [0.5], (0, 1)),
+        (OpType.Ry, [-0.5], (0,)),
+        (OpType.Rx, [-0.5], (1,)),
+        (OpType.Rz, [-0.5], (0,)),
+    ], 1.75),
+    # Ion traps with ZZ phase gates
+    ({'rzz', 'rx', 'rz'}, [
+        (OpType.Rz, [0.5], (0,)),
+        (OpType.Rz, [-0.5], (1,)),
+        (OpType.Rx, [-1.5], (1,)),
+        (OpType.ZZPhase, [0.5], (0, 1)),
+        (OpType.Rz, [-0.5], (1,)),
+        (OpType.Rx, [-0.5], (1,)),
+        (OpType.Rz, [0.5], (1,)),
+    ], 1.25),
+]
+
+def _cx_recipe(basis):
+    for gates, commands, phase in _CX_RECIPES:
+        if gates.issubset(basis):
+            return commands, phase
+    return None
+
+def _build_circuit(recipe, cx_args):
+    commands, phase = recipe
+    circ = Circuit(2)
+    for control, target in cx_args:
+        qubits = (control, target)
+        for optype, params, args in commands:
+            circ.add_gate(optype, params, [qubits[arg] for arg in args])
+        circ.add_phase(phase)
+    return circ
+
+def _transpile(basis, gate):
+    from qiskit import QuantumCircuit, transpile
+    from pytket.extensions.qiskit import qiskit_to_tk
+
+    circ = QuantumCircuit(2)
+    getattr(circ, gate)(0, 1)
+    return qiskit_to_tk(transpile(circ, basis_gates=sorted(basis)))
+
+def _cx_replacement(basis):
+    recipe = _cx_recipe(basis)
+    if recipe is None:
+        return None
+    return _build_circuit(recipe, [(0, 1)])
+
+def _swap_replacement(basis):
+    recipe = _cx_recipe(basis)
+    if recipe is None:
+        return None
+    return _build_circuit(recipe, [(0, 1), (1, 0), (0, 1)])
+
+def _tk1_replacement(basis):
+    if {'x', 'sx', 'rz'}.issubset(basis):
+        return _TK1_to_X_SX_Rz
+    elif {'rx', 'rz'}.issubset(basis):
+        return _TK1_to_RzRx
+    else:
+        return _TK1_to_U
+
+class SynthesisCache:
+    """
+    Process-wide cache of the pytket circuits and functions used to rebase to a basis-gate set:
+    CX and SWAP replacement circuits and the TK1 replacement. Entries are keyed by the set of
+    basis gate names. Gate sets without a CX recipe above fall back to the Qiskit transpiler,
+    once per set.
+    """
+    _builders = {
+        'cx_replacement': (_cx_replacement, 'cx'),
+        'swap_replacement': (_swap_replacement, 'swap'),
+        'tk1_replacement': (_tk1_replacement, None),
+    }
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.transpilations = 0
+        self._entries = {}
+        self._lock = RLock()
+
+    def get(self, basis_gates, name: str):
+        basis = frozenset(basis_gates)
+        key = (basis, name)
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        builder, gate = self._builders[name]
+        value = builder(basis)
+        if value is None:
+            value = _transpile(basis, gate)
+            with self._lock:
+                self.transpilations += 1
+
+        with self._lock:
+            return self._entries.setdefault(key, value)
+
+    def info(self):
+        with self._lock:
+            return SynthesisCacheInfo(self.hits, self.misses, self.transpilations, len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.transpilations = 0
+
+default_synthesis_cache = SynthesisCache()
+
+def cx_replacement(basis_gates):
+    return default_synthesis_cache.get(basis_gates, 'cx_replacement')
+
+def swap_replacement(basis_gates):
+    return default_synthesis_cache.get(basis_gates, 'swap_replacement')
+
+def tk1_replacement(basis_gates):
+    return default_synthesis_cache.get(basis_gates, 'tk1_replacement')
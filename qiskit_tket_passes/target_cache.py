@@ -0,0 +1,93 @@
+import hashlib
+from collections import OrderedDict, namedtuple
+from threading import RLock
+
+from qiskit.transpiler import Target
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# Fingerprints of the targets seen last, keyed by `id(target)`. Targets cannot be weakly
+# referenced, so each entry also holds the target, which keeps its id from being reused.
+_FINGERPRINTS_MAXSIZE = 64
+_fingerprints = OrderedDict()
+_fingerprints_lock = RLock()
+
+def target_fingerprint(target: Target):
+    """
+    Content hash of a target: its qubits, instructions and their error and duration values.
+    Fingerprints are memoized per Target object, so a target should not be modified after it has
+    been used to build tket passes.
+    """
+    with _fingerprints_lock:
+        entry = _fingerprints.get(id(target))
+        if entry is not None and entry[0] is target:
+            _fingerprints.move_to_end(id(target))
+            return entry[1]
+
+    _hash = hashlib.sha256(repr(target.num_qubits).encode())
+    for op_name in sorted(target.operation_names):
+        _hash.update(op_name.encode())
+        props_map = target[op_name]
+        for qargs in sorted(props_map, key=lambda _qargs: () if _qargs is None else _qargs):
+            props = props_map[qargs]
+            error = None if props is None else props.error
+            duration = None if props is None else props.duration
+            _hash.update(repr((qargs, error, duration)).encode())
+    fingerprint = _hash.hexdigest()
+
+    with _fingerprints_lock:
+        _fingerprints[id(target)] = (target, fingerprint)
+        _fingerprints.move_to_end(id(target))
+        while len(_fingerprints) > _FINGERPRINTS_MAXSIZE:
+            _fingerprints.popitem(last=False)
+
+    return fingerprint
+
+class TargetArtifactCache:
+    """
+    LRU cache of the pytket objects derived from a Target (architecture, gate set, placers,
+    replacement circuits, ...), keyed by the target's fingerprint. Targets with the same content
+    share their artifacts, and at most `maxsize` targets are kept.
+    """
+    def __init__(self, maxsize: int = 16):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, target: Target, name: str, factory):
+        key = target_fingerprint(target)
+        with self._lock:
+            artifacts = self._entries.get(key)
+            if artifacts is not None:
+                self._entries.move_to_end(key)
+                if name in artifacts:
+                    self.hits += 1
+                    return artifacts[name]
+            self.misses += 1
+
+        value = factory()
+        self.put(target, name, value)
+        return value
+
+    def put(self, target: Target, name: str, value):
+        key = target_fingerprint(target)
+        with self._lock:
+            self._entries.setdefault(key, {})[name] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+# Shared by all `ToQiskitPass` instances and the tket stage plugins.
+default_cache = TargetArtifactCache()
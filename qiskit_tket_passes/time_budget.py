@@ -0,0 +1,71 @@
+"""
+Wall-clock budgets for tket passes.
+
+A pass with a budget is applied in a child process that is killed when the budget runs out, since
+pytket cannot be interrupted while it applies a pass. The circuit and the pass are sent to the
+child with their `to_dict()` serialization, so the budget also covers starting the child process
+and the serialization round trip.
+"""
+import multiprocessing
+
+from qiskit.transpiler.exceptions import TranspilerError
+from pytket.circuit import Circuit, Qubit, UnitType
+from pytket.predicates import CompilationUnit
+
+from .utils import tket_pass_from_dict
+
+class TimeBudgetExceeded(TranspilerError):
+    """Raised when a tket pass does not finish within its time budget."""
+
+def apply_with_time_budget(tket_pass, tkcirc: Circuit, time_budget: float):
+    """
+    Apply `tket_pass` to a `CompilationUnit` of `tkcirc` in a child process that is killed after
+    `time_budget` seconds. `tkcirc` is left unchanged.
+
+    Returns whether the pass modified the circuit, the new circuit and the initial and final maps
+    of the qubits of the compilation unit, or raises `TimeBudgetExceeded`.
+    """
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_apply_in_child, args=(tket_pass.to_dict(), tkcirc.to_dict(), sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if not receiver.poll(time_budget):
+            raise TimeBudgetExceeded(f'The tket pass did not finish within its time budget of {time_budget} s.')
+        try:
+            result = receiver.recv()
+        except EOFError:
+            process.join()
+            raise TranspilerError(f'The process applying the tket pass exited with code {process.exitcode}.')
+    finally:
+        if process.is_alive():
+            process.kill()
+        process.join()
+        receiver.close()
+
+    if isinstance(result, str):
+        raise TranspilerError(f'The tket pass failed: {result}')
+    modified, circuit_dict, initial_map, final_map = result
+    return modified, Circuit.from_dict(circuit_dict), _map_from_list(initial_map), _map_from_list(final_map)
+
+def _apply_in_child(pass_dict, circuit_dict, sender):
+    try:
+        compilation_unit = CompilationUnit(Circuit.from_dict(circuit_dict))
+        modified = tket_pass_from_dict(pass_dict).apply(compilation_unit)
+        sender.send((
+            modified,
+            compilation_unit.circuit.to_dict(),
+            _map_to_list(compilation_unit.initial_map),
+            _map_to_list(compilation_unit.final_map),
+        ))
+    except Exception as error:
+        # pybind11 exceptions are not always picklable.
+        sender.send(f'{type(error).__name__}: {error}')
+    finally:
+        sender.close()
+
+def _map_to_list(unit_map):
+    return [(unit.to_list(), node.to_list()) for unit, node in unit_map.items() if unit.type == UnitType.qubit]
+
+def _map_from_list(unit_list):
+    return {Qubit.from_list(unit): Qubit.from_list(node) for unit, node in unit_list}
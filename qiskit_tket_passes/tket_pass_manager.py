@@ -1,20 +1,35 @@
-from typing import Optional
+import asyncio
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
+from typing import Iterable, Optional, Union
 
+from qiskit import QuantumCircuit
+from qiskit.converters import circuit_to_dag, dag_to_circuit
 from qiskit.transpiler import PassManager, FlowController
 from qiskit.providers.backend import Backend
 from pytket.passes import SequencePass
-from .to_qiskit_pass import ToQiskitPass
+from .artifacts import load_pass_manager, save_pass_manager
+from .circuit_encoding import SharedCircuit, decode_dag, decode_tk, encode_dag, encode_tk, read_shared_circuit, release_shared_circuit, share_circuit
+from .to_qiskit_pass import ToQiskitPass, fuse_tket_passes
+from .utils import qiskit_dag_to_tk, tk_to_qiskit_dag, tket_pass_from_dict
 
 class TketPassManager(PassManager):
-    def __init__(self, backend: Backend, optimization_level: Optional[int] = None):
+    def __init__(self, backend: Backend, optimization_level: Optional[int] = None, fuse: bool = False, result_cache=None):
 
         super().__init__()
 
+        self._result_cache = result_cache
+
         if optimization_level is None:
             optimization_level = 1
 
         _pass = backend.default_compilation_pass(optimisation_level=optimization_level)
-        self.append(self._visit_recursively(_pass))
+        self._tket_pass = _pass
+        if fuse:
+            # Run the whole backend pass on a single pytket conversion.
+            self.append(fuse_tket_passes(self._visit_recursively(_pass)))
+        else:
+            self.append(self._visit_recursively(_pass))
 
     def _visit_recursively(self, _pass):
         if isinstance(_pass, SequencePass):
@@ -23,4 +38,185 @@ class TketPassManager(PassManager):
                 _list.append(self._visit_recursively(_item))
             return FlowController.controller_factory(_list, None)
         else:
-            return ToQiskitPass(_pass)
\ No newline at end of file
+            return ToQiskitPass(_pass, result_cache=self._result_cache)
+
+    def save(self, path: str):
+        """
+        Save the pass manager to a JSON artifact that `TketPassManager.load` rebuilds without the backend.
+        """
+        save_pass_manager(self, path)
+
+    @classmethod
+    def load(cls, path: str, result_cache=None, check_versions: bool = True):
+        pm = load_pass_manager(path, result_cache=result_cache, check_versions=check_versions)
+        if not isinstance(pm, cls):
+            raise ValueError(f'{path} is not a TketPassManager artifact.')
+        return pm
+
+    def run_batch(self, circuits: Iterable[QuantumCircuit], max_workers: Optional[int] = None, ordered: bool = True, chunksize: int = 1, shared_memory: bool = True):
+        """
+        Compile `circuits` in a pool of `max_workers` processes. Every worker rebuilds the backend's
+        tket pass once from its `to_dict()` serialization and then applies it to each circuit it gets.
+        Results are yielded in the order of `circuits`, or as `(index, circuit)` pairs as soon as
+        they are ready if `ordered` is False.
+
+        With `shared_memory`, circuits and results are exchanged with the workers as arrays in shared
+        memory (see `circuit_encoding`) instead of being pickled. Circuits that cannot be encoded
+        are pickled as before.
+        """
+        pass_dict = self._tket_pass.to_dict()
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(pass_dict,)) as executor:
+            if shared_memory:
+                yield from _run_shared(executor, list(circuits), ordered, chunksize)
+            elif ordered:
+                yield from executor.map(_compile_in_worker, circuits, chunksize=chunksize)
+            else:
+                futures = {executor.submit(_compile_in_worker, circuit): index for index, circuit in enumerate(circuits)}
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+
+    async def arun(self, circuits: Union[QuantumCircuit, Iterable[QuantumCircuit]], executor: Optional[Executor] = None, max_concurrency: Optional[int] = None, timeout: Optional[float] = None):
+        """
+        Coroutine version of `run`: compile `circuits` off the event loop with `arun_iter` and
+        return the compiled circuits in order (or a single one if a single circuit is given).
+        """
+        single = isinstance(circuits, QuantumCircuit)
+        results = [result async for result in self.arun_iter([circuits] if single else circuits, executor=executor, max_concurrency=max_concurrency, timeout=timeout)]
+        return results[0] if single else results
+
+    async def arun_iter(self, circuits: Iterable[QuantumCircuit], executor: Optional[Executor] = None, max_concurrency: Optional[int] = None, timeout: Optional[float] = None, ordered: bool = True):
+        """
+        Compile `circuits` in `executor` and yield the results as an async iterator, in the order of
+        `circuits` or as `(index, circuit)` pairs as soon as they are ready if `ordered` is False.
+
+        pytket holds the GIL while it applies a pass, so only a process pool keeps the event loop
+        responsive. Without `executor`, a `ProcessPoolExecutor` of `max_concurrency` workers is
+        created for the call, as in `run_batch`. At most `max_concurrency` circuits are submitted at
+        once, and a circuit that takes longer than `timeout` seconds raises `asyncio.TimeoutError`.
+        On errors, timeouts, cancellation or when the iterator is closed early, circuits that have
+        not started are cancelled; the ones already running in worker processes are left to finish
+        and their results are discarded.
+        """
+        loop = asyncio.get_running_loop()
+        pass_dict = self._tket_pass.to_dict()
+        owned = executor is None
+        if owned:
+            executor = ProcessPoolExecutor(max_workers=max_concurrency, initializer=_init_worker, initargs=(pass_dict,))
+            submit = lambda circuit: loop.run_in_executor(executor, _compile_in_worker, circuit)
+        else:
+            submit = lambda circuit: loop.run_in_executor(executor, _compile_with_pass_dict, pass_dict, circuit)
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def _compile(index, circuit):
+            if semaphore is None:
+                return index, await asyncio.wait_for(submit(circuit), timeout)
+            async with semaphore:
+                return index, await asyncio.wait_for(submit(circuit), timeout)
+
+        tasks = [asyncio.ensure_future(_compile(index, circuit)) for index, circuit in enumerate(circuits)]
+        try:
+            if ordered:
+                for task in tasks:
+                    yield (await task)[1]
+            else:
+                for task in asyncio.as_completed(tasks):
+                    yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+            if owned:
+                executor.shutdown(wait=False)
+
+def _compile_circuit(tket_pass, circuit):
+    tkcirc = qiskit_dag_to_tk(circuit_to_dag(circuit))
+    tket_pass.apply(tkcirc)
+    result = dag_to_circuit(tk_to_qiskit_dag(tkcirc))
+    result.name = circuit.name
+    return result
+
+# The tket pass of the batch, rebuilt once in every worker process.
+_worker_pass = None
+
+def _init_worker(pass_dict):
+    global _worker_pass
+    _worker_pass = tket_pass_from_dict(pass_dict)
+
+def _compile_in_worker(circuit):
+    return _compile_circuit(_worker_pass, circuit)
+
+# Tket passes rebuilt in this process for executors that are not set up by `_init_worker`, as
+# `(pass_dict, tket_pass)` pairs.
+_worker_passes = []
+
+def _compile_with_pass_dict(pass_dict, circuit):
+    for _pass_dict, tket_pass in _worker_passes:
+        if _pass_dict == pass_dict:
+            break
+    else:
+        tket_pass = tket_pass_from_dict(pass_dict)
+        _worker_passes.append((pass_dict, tket_pass))
+    return _compile_circuit(tket_pass, circuit)
+
+def _share(circuit):
+    # The circuit in shared memory, or the circuit itself if it cannot be encoded. Circuits that
+    # cannot be converted at all are left to the worker too, which raises as without shared memory.
+    try:
+        return share_circuit(encode_dag(circuit_to_dag(circuit)))
+    except Exception:
+        return circuit
+
+def _compile_shared_in_worker(payloads):
+    results = []
+    for payload in payloads:
+        if not isinstance(payload, SharedCircuit):
+            results.append(_compile_in_worker(payload))
+            continue
+
+        tkcirc = decode_tk(read_shared_circuit(payload))
+        _worker_pass.apply(tkcirc)
+        try:
+            results.append(share_circuit(encode_tk(tkcirc)))
+        except ValueError:
+            results.append(dag_to_circuit(tk_to_qiskit_dag(tkcirc)))
+    return results
+
+def _receive(result, circuit):
+    if isinstance(result, SharedCircuit):
+        result = dag_to_circuit(decode_dag(read_shared_circuit(result, unlink=True)))
+    result.name = circuit.name
+    return result
+
+def _release(payloads):
+    for payload in payloads:
+        if isinstance(payload, SharedCircuit):
+            release_shared_circuit(payload)
+
+def _run_shared(executor, circuits, ordered, chunksize):
+    # Chunks of `chunksize` circuits are sent to the workers as lists of `SharedCircuit`s. The
+    # blocks of the circuits are released once their chunk is compiled and the blocks of the
+    # results once they are read, or when the generator is closed early.
+    futures = {}
+    payloads = {}
+    unread = deque()
+    try:
+        for start in range(0, len(circuits), chunksize):
+            payloads[start] = [_share(circuit) for circuit in circuits[start:start + chunksize]]
+            futures[executor.submit(_compile_shared_in_worker, payloads[start])] = start
+
+        for future in (list(futures) if ordered else as_completed(futures)):
+            unread.extend(future.result())
+            start = futures.pop(future)
+            _release(payloads.pop(start))
+            for index in range(start, start + len(unread)):
+                result = _receive(unread.popleft(), circuits[index])
+                yield result if ordered else (index, result)
+    finally:
+        _release(unread)
+        for future in futures:
+            if not future.cancel():
+                try:
+                    _release(future.result())
+                except Exception:
+                    pass
+        for _payloads in payloads.values():
+            _release(_payloads)
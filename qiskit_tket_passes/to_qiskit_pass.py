@@ -1,26 +1,52 @@
+import hashlib
+import itertools
 import re
+import time
 from collections import OrderedDict
 
-from qiskit import QuantumCircuit
-from qiskit.transpiler import TransformationPass
-from qiskit.transpiler.target import Target, target_to_backend_properties
+import numpy as np
+from qiskit.transpiler import Layout, TransformationPass
+from qiskit.transpiler.runningpassmanager import FlowControllerLinear
+from qiskit.transpiler.target import Target
 from pytket.architecture import Architecture
-from pytket.circuit import OpType
-from pytket.passes import BasePass
-from pytket.passes._decompositions import _TK1_to_X_SX_Rz, _TK1_to_U
+from pytket.circuit import Node, OpType, Qubit
+from pytket.passes import BasePass, SequencePass
+from pytket.passes._decompositions import _TK1_to_U
 from pytket.transform import CXConfigType, PauliSynthStrat
-from pytket.extensions.qiskit import qiskit_to_tk
 from pytket.placement import GraphPlacement, LinePlacement, NoiseAwarePlacement
+from pytket.predicates import CompilationUnit
 
-from .utils import get_arguments_from_doc, qiskit_dag_to_tk, tk_to_qiskit_dag
+from . import instrumentation, portfolio, synthesis
+from .architecture import EDGE_TYPES, architecture_precomputation, build_architecture, edge_array
+from .result_cache import _pass_digest, dag_structure_key, default_window_cache, get_default_result_cache
+from .target_cache import default_cache
+from .time_budget import TimeBudgetExceeded, apply_with_time_budget
+from .utils import qiskit_dag_to_tk, select_signature, standard_pass_names, tk_to_qiskit_dag, tk_to_qiskit_dag_and_permutation
+from .windowing import is_local_pass, run_windowed
 
-def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
+# Window depth of incremental passes created without one. Small windows keep the part of a circuit
+# that is compiled again around a change small.
+INCREMENTAL_WINDOW_DEPTH = 10
+
+def ToQiskitPass(tket_pass, target: Target = None, result_cache=None, window_depth: int = None, window_overlap: int = 2, set_layout: bool = False, time_budget: float = None, fallbacks=None, incremental: bool = False, candidates=None, cost='two_qubit_gates', **kwargs):
     class TketPassClass(TransformationPass):
-        def __init__(self, target: Target = None, **kwargs):
+        def __init__(self, target: Target = None, result_cache=None, window_depth: int = None, window_overlap: int = 2, set_layout: bool = False, time_budget: float = None, fallbacks=None, incremental: bool = False, candidates=None, cost='two_qubit_gates', **kwargs):
+            if incremental and window_depth is None:
+                window_depth = INCREMENTAL_WINDOW_DEPTH
+            self._result_cache = result_cache
+            self.incremental = incremental
+            self.window_depth = window_depth
+            self.window_overlap = window_overlap
+            self.set_layout = set_layout
+            self.time_budget = time_budget
+            self.cost = cost
+            self.last_record = None
+
             if isinstance(tket_pass, BasePass):
+                super().__init__()
                 self._pass = tket_pass
-                _dict = tket_pass.to_dict()
-                class_name = _dict[_dict['pass_class']]['name']
+                self.target = target
+                class_name = _tket_pass_name(tket_pass)
 
                 self.requires = []
                 self.preserves = []
@@ -30,21 +56,18 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                 class_name = tket_pass.__name__
 
                 self._args_dict = OrderedDict()
-                parsed_args = get_arguments_from_doc(tket_pass)
+                parsed_args = select_signature(tket_pass, kwargs)
                 for parsed_arg in parsed_args:
                     arg_name = parsed_arg[0]
                     arg_type = parsed_arg[1]
                     if arg_type.endswith('architecture.Architecture'):
                         if arg_name in kwargs:
                             arc = kwargs.pop(arg_name)
-                            if type(arc) == list:
-                                connections = []
-                                for edge in arc:
-                                    connections.append(tuple(edge))
-                                arc = Architecture(connections)
+                            if isinstance(arc, EDGE_TYPES):
+                                arc = build_architecture(arc)
                             self._args_dict[arg_name] = arc
                         elif self.target:
-                            arc = self._arch_from_target()
+                            arc = self._cached('architecture', self._arch_from_target)
                             self._args_dict[arg_name] = arc
                     elif arg_type.endswith('placement.Placement'):
                         if arg_name in kwargs:
@@ -53,32 +76,32 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                             placer_str = 'NoiseAware'
 
                         if placer_str == 'Graph':
-                            placer = GraphPlacement(self._arch_from_target())
+                            placer = self._cached('graph_placer', lambda: GraphPlacement(self._cached('architecture', self._arch_from_target)))
                             self._args_dict[arg_name] = placer
                         elif placer_str == 'Line':
-                            placer = LinePlacement(self._arch_from_target())
+                            placer = self._cached('line_placer', lambda: LinePlacement(self._cached('architecture', self._arch_from_target)))
                             self._args_dict[arg_name] = placer
                         elif placer_str == 'NoiseAware':
                             if self.target:
-                                placer = self._noise_aware_placer_from_target()
+                                placer = self._cached('noise_aware_placer', self._noise_aware_placer_from_target)
                                 self._args_dict[arg_name] = placer
                         else:
                             raise ValueError('Unsupported placer type:', placer_str)
                     elif arg_type.endswith('circuit.Circuit'):
                         if arg_name in kwargs:
+                            from pytket.extensions.qiskit import qiskit_to_tk
+
                             circ = kwargs.pop(arg_name)
                             tkcirc = qiskit_to_tk(circ)
                             self._args_dict[arg_name] = tkcirc
                         elif self.target:
                             if class_name == 'DecomposeSwapsToCircuit' and arg_name == 'replacement_circuit':
                                 # Construct SWAP replacement circuit based on target's gate set.
-                                circ = self._swap_decomposition_from_target()
-                                tkcirc = qiskit_to_tk(circ)
+                                tkcirc = self._cached('swap_replacement', self._swap_decomposition_from_target)
                                 self._args_dict[arg_name] = tkcirc
                             elif class_name == 'RebaseCustom' and arg_name == 'cx_replacement':
                                 # Construct CNOT replacement circuit based on target's gate set.
-                                circ = self._cnot_decomposition_from_target()
-                                tkcirc = qiskit_to_tk(circ)
+                                tkcirc = self._cached('cx_replacement', self._cnot_decomposition_from_target)
                                 self._args_dict[arg_name] = tkcirc
                     elif arg_type.endswith('circuit.OpType'):
                         if arg_name in kwargs:
@@ -98,7 +121,7 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                                 self._args_dict[arg_name] = _value
                         elif self.target and class_name == 'RebaseCustom' and arg_name == 'gateset':
                             # Get the target's gate set.
-                            self._args_dict[arg_name] = self._gateset_from_target()
+                            self._args_dict[arg_name] = set(self._cached('gateset', self._gateset_from_target))
                     elif arg_type.endswith('transform.PauliSynthStrat'):
                         if arg_name in kwargs:
                             strategy = kwargs.pop(arg_name)
@@ -122,7 +145,7 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                             self._args_dict[arg_name] = value
                     elif arg_name == 'tk1_replacement':
                         if self.target:
-                            self._args_dict[arg_name] = self._tk1_replacement_from_target()
+                            self._args_dict[arg_name] = self._cached('tk1_replacement', self._tk1_replacement_from_target)
                         else:
                             self._args_dict[arg_name] = _TK1_to_U
                     else:
@@ -134,10 +157,347 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                 self._pass = tket_pass(*args, **kwargs)
             __class__.__name__ = 'TketPass_' + class_name
 
+            if window_depth is not None and not is_local_pass(self._pass):
+                raise ValueError(f'{class_name} is not a local pass and cannot be applied to windows of a circuit.')
+            if window_depth is not None and time_budget is not None:
+                raise ValueError('A time budget cannot be set for a windowed pass.')
+
+            # Passes to run instead when the time budget runs out, in order. Items are anything
+            # `ToQiskitPass` accepts, or `None` to leave the circuit unchanged.
+            self.fallbacks = [
+                _item if _item is None or _is_tket_pass(_item) else ToQiskitPass(_item, target=target, result_cache=result_cache, set_layout=set_layout)
+                for _item in (fallbacks or [])
+            ]
+
+            # With `set_layout`, placement passes set the `layout` of the circuit instead of relabelling
+            # its qubits, and routing passes on a laid out circuit set its `final_layout`.
+            self._mapping_mode = _mapping_mode(self._pass) if set_layout else None
+
+            # Other tket passes to apply in parallel to this one, keeping the result with the lowest
+            # `cost`. Items are anything `ToQiskitPass` accepts.
+            self.candidates = [
+                (_item if _is_tket_pass(_item) else ToQiskitPass(_item, target=target))._pass
+                for _item in (candidates or [])
+            ]
+            if self.candidates and window_depth is not None:
+                raise ValueError('Candidate passes cannot be set for a windowed pass.')
+            if set_layout and any(_mapping_mode(_item) != self._mapping_mode for _item in self.candidates):
+                raise ValueError('The candidate passes must all be placement, routing or other passes, like the pass itself.')
+            if not (callable(cost) or cost in ('two_qubit_gates', 'depth', 'fidelity')):
+                raise ValueError(f'Unsupported cost: {cost}')
+            if cost == 'fidelity' and not target:
+                raise ValueError('The fidelity cost requires a target.')
+
         def run(self, dag):
+            try:
+                return self._run(dag)
+            except TimeBudgetExceeded:
+                if not self.fallbacks:
+                    raise
+
+            self._record({'pass': self.name(), 'time_budget_exceeded': True})
+            for fallback in self.fallbacks:
+                if self.property_set['tket_fallbacks'] is None:
+                    self.property_set['tket_fallbacks'] = []
+                self.property_set['tket_fallbacks'].append({
+                    'pass': self.name(),
+                    'time_budget': self.time_budget,
+                    'fallback': None if fallback is None else fallback.name(),
+                })
+                if fallback is None:
+                    self.property_set['tket_pass_modified'] = False
+                    return dag
+                fallback.property_set = self.property_set
+                try:
+                    return fallback.run(dag)
+                except TimeBudgetExceeded:
+                    pass
+            raise TimeBudgetExceeded(f'{self.name()} and its fallbacks did not finish within their time budgets.')
+
+        def _run(self, dag):
+            if self.window_depth is not None:
+                # Windowed runs are meant for circuits too large to be worth hashing for the result cache.
+                return self._run_windowed(dag)
+            if self._mapping_mode == 'placement' or (self._mapping_mode == 'routing' and self.property_set['layout'] is not None):
+                # Cached results would not restore the layouts set in the property set.
+                return self._run_mapping(dag)
+            if self.candidates:
+                # The chosen candidate depends on which ones finish within the time budget.
+                return self._run_tket(dag)
+
+            result_cache = self._result_cache
+            if result_cache is None:
+                result_cache = get_default_result_cache()
+            if result_cache is None:
+                return self._run_tket(dag)
+
+            key, parameters = result_cache.key(dag, self._pass, self.target)
+            if key is None:
+                return self._run_tket(dag)
+
+            new_dag = result_cache.lookup(key, parameters)
+            if new_dag is None:
+                start = time.perf_counter()
+                new_dag = self._run_tket(dag)
+                if not self.last_record.get('permuted'):
+                    result_cache.store(key, parameters, new_dag, time.perf_counter() - start)
+            else:
+                # As if the pass had run, so that flow controllers reading the property see this pass.
+                modified = new_dag != dag
+                self.property_set['tket_pass_modified'] = modified
+                if not modified:
+                    new_dag = dag
+                self._record({'pass': self.name(), 'result_cache_hit': True, 'modified': modified})
+
+            return new_dag
+
+        def _run_tket(self, dag):
+            start = time.perf_counter()
             tkcirc = qiskit_dag_to_tk(dag)
-            self._pass.apply(tkcirc)
-            return tk_to_qiskit_dag(tkcirc)
+            converted = time.perf_counter()
+            gates_before, depth_before = tkcirc.n_gates, tkcirc.depth()
+
+            if self.candidates:
+                modified, tkcirc, _, _ = self._apply_portfolio(tkcirc)
+            elif self.time_budget is None:
+                modified = self._pass.apply(tkcirc)
+            else:
+                modified, tkcirc, _, _ = apply_with_time_budget(self._pass, tkcirc, self.time_budget)
+            applied = time.perf_counter()
+            self.property_set['tket_pass_modified'] = modified
+
+            permutation = {}
+            if modified and self._keeps_permutation():
+                new_dag, permutation = tk_to_qiskit_dag_and_permutation(tkcirc)
+                if permutation:
+                    self._set_permutation_layout(new_dag, permutation)
+            elif modified:
+                new_dag = tk_to_qiskit_dag(tkcirc)
+            else:
+                # Nothing to convert back, the input DAG is still valid.
+                new_dag = dag
+            end = time.perf_counter()
+
+            self._record({
+                'pass': self.name(),
+                'conversion_in_time': converted - start,
+                'apply_time': applied - converted,
+                'conversion_out_time': end - applied,
+                'gates_before': gates_before,
+                'gates_after': tkcirc.n_gates,
+                'depth_before': depth_before,
+                'depth_after': tkcirc.depth(),
+                'modified': modified,
+                'permuted': bool(permutation),
+            })
+            return new_dag
+
+        def _apply_portfolio(self, tkcirc):
+            tket_passes = [self._pass] + self.candidates
+            if self.cost == 'two_qubit_gates':
+                cost = portfolio.two_qubit_gate_cost
+            elif self.cost == 'depth':
+                cost = portfolio.depth_cost
+            elif self.cost == 'fidelity':
+                cost = portfolio.fidelity_cost(self._cached('error_averages', lambda: _average_errors_from_target(self.target, self._cached('coupling_map', self.target.build_coupling_map))))
+            else:
+                cost = self.cost
+            # Permutations are left out of the circuit by routing passes and passes that keep them in the layout.
+            implicit_swaps = self._mapping_mode == 'routing' or self._keeps_permutation()
+            index, costs, result = portfolio.apply_portfolio(tket_passes, tkcirc, cost, self.time_budget, implicit_swaps=implicit_swaps)
+
+            if self.property_set['tket_portfolio'] is None:
+                self.property_set['tket_portfolio'] = []
+            self.property_set['tket_portfolio'].append({
+                'pass': self.name(),
+                'chosen': _tket_pass_name(tket_passes[index]),
+                'candidates': [_tket_pass_name(_item) for _item in tket_passes],
+                'costs': costs,
+            })
+            return result
+
+        def _keeps_permutation(self):
+            # Before layout, only Qiskit versions with `ElidePermutations` account for `virtual_permutation_layout`.
+            return self.set_layout and (self.property_set['layout'] is not None or _supports_virtual_permutation_layout())
+
+        def _set_permutation_layout(self, dag, permutation):
+            positions = {qubit: index for index, qubit in enumerate(dag.qubits)}
+            permutation_layout = Layout({qubit: positions[permutation.get(qubit, qubit)] for qubit in dag.qubits})
+            if self.property_set['layout'] is None:
+                # Like `ElidePermutations`
+                self.property_set['original_layout'] = Layout(positions)
+                if self.property_set['original_qubit_indices'] is None:
+                    self.property_set['original_qubit_indices'] = positions
+                current_layout = self.property_set['virtual_permutation_layout']
+                if current_layout is None:
+                    self.property_set['virtual_permutation_layout'] = permutation_layout
+                else:
+                    self.property_set['virtual_permutation_layout'] = _compose_layouts(permutation_layout, current_layout, dag.qubits)
+            else:
+                # The permutation follows the DAG, so the states end on the qubits it maps to theirs.
+                inverse = {_to: _from for _from, _to in permutation.items()}
+                self._compose_final_layout(Layout({qubit: positions[inverse.get(qubit, qubit)] for qubit in dag.qubits}), dag.qubits)
+
+        def _compose_final_layout(self, layout, qubits):
+            # Like the routing passes of Qiskit
+            if self.property_set['final_layout'] is None:
+                self.property_set['final_layout'] = layout
+            else:
+                self.property_set['final_layout'] = _compose_layouts(self.property_set['final_layout'], layout, qubits)
+
+        def _run_mapping(self, dag):
+            start = time.perf_counter()
+            routing = self._mapping_mode == 'routing'
+            precomputation = architecture_precomputation(self.target) if self.target else None
+            placement_key = None
+            if precomputation is not None and routing and self._routes_only() and self._is_routed(dag, precomputation):
+                # Nothing to route: the circuit and its layout stay as they are.
+                self._compose_final_layout(Layout({qubit: index for index, qubit in enumerate(dag.qubits)}), dag.qubits)
+                self.property_set['tket_pass_modified'] = False
+                self._record({'pass': self.name(), 'routing_skipped': True})
+                return dag
+            if precomputation is not None and not routing:
+                placement_key = self._placement_key(dag)
+                placement = None if placement_key is None else precomputation.placement(placement_key)
+                if placement is not None:
+                    self._set_placement(dag, {qubit: node for qubit, node in zip(dag.qubits, placement) if node is not None})
+                    self.property_set['tket_pass_modified'] = False
+                    self._record({'pass': self.name(), 'placement_reused': True})
+                    return dag
+
+            tkcirc = qiskit_dag_to_tk(dag)
+            positions = {qubit: index for index, qubit in enumerate(dag.qubits)}
+            # pytket units of the DAG qubits
+            units = {qubit: Qubit(qreg.name, index) for qreg in dag.qregs.values() for index, qubit in enumerate(qreg)}
+            if routing:
+                # The qubits of a laid out circuit are the nodes of the architecture.
+                tkcirc.rename_units({units[qubit]: Node(positions[qubit]) for qubit in dag.qubits})
+                units = {qubit: Node(positions[qubit]) for qubit in dag.qubits}
+            converted = time.perf_counter()
+            gates_before, depth_before = tkcirc.n_gates, tkcirc.depth()
+
+            if self.candidates:
+                modified, tkcirc, unit_initial_map, unit_final_map = self._apply_portfolio(tkcirc)
+            elif self.time_budget is None:
+                compilation_unit = CompilationUnit(tkcirc)
+                modified = self._pass.apply(compilation_unit)
+                tkcirc, unit_initial_map, unit_final_map = compilation_unit.circuit, compilation_unit.initial_map, compilation_unit.final_map
+            else:
+                modified, tkcirc, unit_initial_map, unit_final_map = apply_with_time_budget(self._pass, tkcirc, self.time_budget)
+            applied = time.perf_counter()
+            initial_map = {qubit: unit_initial_map[unit] for qubit, unit in units.items()}
+
+            permutation = {}
+            if routing:
+                final_map = {qubit: unit_final_map[unit] for qubit, unit in units.items()}
+                if modified:
+                    tk_units = {qubit: Qubit(qreg.name, index) for qreg in dag.qregs.values() for index, qubit in enumerate(qreg)}
+                    tkcirc.rename_units({node: tk_units[dag.qubits[node.index[0]]] for node in tkcirc.qubits})
+                    new_dag, permutation = tk_to_qiskit_dag_and_permutation(tkcirc)
+                    # Permutation over the DAG's own qubits
+                    new_qubits = {(qreg.name, index): qubit for qreg in dag.qregs.values() for index, qubit in enumerate(qreg)}
+                    keys = {qubit: (qreg.name, index) for qreg in new_dag.qregs.values() for index, qubit in enumerate(qreg)}
+                    permutation = {new_qubits[keys[_from]]: new_qubits[keys[_to]] for _from, _to in permutation.items()}
+                else:
+                    new_dag = dag
+
+                # As above, the states end on the qubits that the permutation maps to theirs.
+                inverse = {_to: _from for _from, _to in permutation.items()}
+                final_positions = {}
+                for qubit in dag.qubits:
+                    end = dag.qubits[final_map[qubit].index[0]]
+                    final_positions[qubit] = positions[inverse.get(end, end)]
+                # A placement at the start of the pass only relabels the physical qubits.
+                start_positions = {qubit: initial_map[qubit].index[0] for qubit in dag.qubits}
+                self.property_set['layout'] = Layout({
+                    virtual: start_positions[dag.qubits[physical]]
+                    for virtual, physical in self.property_set['layout'].get_virtual_bits().items()
+                })
+                final_layout = self.property_set['final_layout']
+                ends = {qubit: dag.qubits[final_layout[qubit]] if final_layout is not None else qubit for qubit in dag.qubits}
+                self.property_set['final_layout'] = Layout({
+                    dag.qubits[start_positions[qubit]]: final_positions[ends[qubit]] for qubit in dag.qubits
+                })
+            else:
+                placed = {qubit: unit.index[0] for qubit, unit in initial_map.items() if unit.reg_name == 'node'}
+                self._set_placement(dag, placed)
+                if placement_key is not None:
+                    precomputation.remember_placement(placement_key, [placed.get(qubit) for qubit in dag.qubits])
+                # The circuit itself is unchanged until the layout is applied.
+                new_dag, modified = dag, False
+            end = time.perf_counter()
+            self.property_set['tket_pass_modified'] = modified
+
+            self._record({
+                'pass': self.name(),
+                'conversion_in_time': converted - start,
+                'apply_time': applied - converted,
+                'conversion_out_time': end - applied,
+                'gates_before': gates_before,
+                'gates_after': tkcirc.n_gates,
+                'depth_before': depth_before,
+                'depth_after': tkcirc.depth(),
+                'modified': modified,
+                'permuted': bool(permutation),
+            })
+            return new_dag
+
+        def _set_placement(self, dag, placed):
+            free_positions = (position for position in itertools.count() if position not in placed.values())
+            self.property_set['layout'] = Layout({qubit: placed[qubit] if qubit in placed else next(free_positions) for qubit in dag.qubits})
+
+        def _placement_key(self, dag):
+            # Placements only depend on the structure of the circuit and on the placement passes.
+            digests = [_pass_digest(_item) for _item in [self._pass] + self.candidates]
+            if None in digests:
+                return None
+            structure, _ = dag_structure_key(dag)
+            return hashlib.sha256(''.join([structure] + digests).encode()).hexdigest()
+
+        def _routes_only(self):
+            try:
+                return set(standard_pass_names(self._pass.to_dict())) <= _ROUTING_ONLY_PASSES and not self.candidates
+            except RuntimeError:
+                return False
+
+        def _is_routed(self, dag, precomputation):
+            # Whether every two-qubit gate of the laid out circuit already acts on neighbouring qubits.
+            positions = {qubit: index for index, qubit in enumerate(dag.qubits)}
+            pairs = []
+            for node in dag.op_nodes(include_directives=False):
+                if len(node.qargs) > 2:
+                    return False
+                if len(node.qargs) == 2:
+                    pairs.append((positions[node.qargs[0]], positions[node.qargs[1]]))
+            return precomputation.are_adjacent(pairs)
+
+        def _run_windowed(self, dag):
+            result_cache = None
+            if self.incremental:
+                result_cache = self._result_cache or get_default_result_cache() or default_window_cache
+            new_dag, stats = run_windowed(dag, self._pass.apply, self.window_depth, self.window_overlap, result_cache, self._pass, self.target)
+            self.property_set['tket_pass_modified'] = stats['modified']
+            if not stats['modified']:
+                new_dag = dag
+
+            self._record({
+                'pass': self.name(),
+                'window_depth': self.window_depth,
+                'incremental': self.incremental,
+                **stats,
+                'gates_before': dag.size(),
+                'gates_after': new_dag.size(),
+                'depth_before': dag.depth(),
+                'depth_after': new_dag.depth(),
+            })
+            return new_dag
+
+        def _record(self, record):
+            self.last_record = record
+            if self.property_set['tket_pass_records'] is None:
+                self.property_set['tket_pass_records'] = []
+            self.property_set['tket_pass_records'].append(record)
+            instrumentation.emit(record)
 
         def tket_argument(self, arg_name):
             if arg_name in self._args_dict:
@@ -145,6 +505,10 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
             else:
                 raise ValueError(f"{__class__.__name__} has no argument with the name {arg_name}.")
 
+        def _cached(self, name, factory):
+            # Target-derived artifacts are shared between passes built for the same target.
+            return default_cache.get(self.target, name, factory)
+
         #TODO: May be we should move the following methods to utils file instead of having them as class methods
         def _optype_from_str(self, op_str):
             for op_type in dir(OpType):
@@ -172,91 +536,222 @@ def ToQiskitPass(tket_pass, target: Target = None, **kwargs):
                 if op in operation_names:
                     operation_names.remove(op)
 
-            return { self._optype_from_str(op_str) for op_str in operation_names }
+            gateset = set()
+            for op_str in operation_names:
+                try:
+                    gateset.add(self._optype_from_str(op_str))
+                except KeyError:
+                    # Instructions without a pytket equivalent, e.g. the save instructions of simulators.
+                    pass
+            return gateset
 
         def _arch_from_target(self):
-            _coupling_map = self.target.build_coupling_map()
+            _coupling_map = self._cached('coupling_map', self.target.build_coupling_map)
             if _coupling_map is None:
                 return Architecture([])
             else:
-                return Architecture(_coupling_map.get_edges())
+                return build_architecture(_coupling_map)
 
         def _cnot_decomposition_from_target(self):
-            circ = QuantumCircuit(2)
-            circ.cx(0, 1)
-            if 'cx' not in self.target.operation_names:
-                from qiskit import transpile
-                circ = transpile(circ, basis_gates=list(self.target.operation_names))
-            return circ
+            return synthesis.cx_replacement(self.target.operation_names)
 
         def _swap_decomposition_from_target(self):
-            from qiskit import transpile
-            circ = QuantumCircuit(2)
-            circ.swap(0, 1)
-            return transpile(circ, basis_gates=list(self.target.operation_names))
+            return synthesis.swap_replacement(self.target.operation_names)
 
         def _tk1_replacement_from_target(self):
-            if {'x', 'sx', 'rz'}.issubset(self.target.operation_names):
-                return _TK1_to_X_SX_Rz
-            else:
-                return _TK1_to_U
+            return synthesis.tk1_replacement(self.target.operation_names)
 
         def _noise_aware_placer_from_target(self):
             """
             Get noise data from target.
-            This code is a modified copy from `process_characterisation` & `get_avg_characterisation` functions in pytket-qiskit module.
+            The averaging follows `process_characterisation` & `get_avg_characterisation` functions in pytket-qiskit module,
+            but error rates are read from the target's instruction properties directly.
             """
-            from collections import defaultdict
-            from pytket.circuit import Node
+            averages = _average_errors_from_target(self.target, self._cached('coupling_map', self.target.build_coupling_map))
+            if averages is None:
+                return None
+            node_errors, edge_errors, readout_errors = averages
+            return NoiseAwarePlacement(
+                self._cached('architecture', self._arch_from_target),
+                {Node(q): e for q, e in node_errors.items()},
+                {(Node(a), Node(b)): e for (a, b), e in edge_errors.items()},
+                {Node(q): e for q, e in readout_errors.items()}
+            )
 
+    return TketPassClass(target, result_cache=result_cache, window_depth=window_depth, window_overlap=window_overlap, set_layout=set_layout, time_budget=time_budget, fallbacks=fallbacks, incremental=incremental, candidates=candidates, cost=cost, **kwargs)
 
-            node_errors = defaultdict(dict)
-            edge_errors = defaultdict(dict)
-            readout_errors = {}
+def portfolio_pass(candidates, target: Target = None, cost='two_qubit_gates', time_budget: float = None, **kwargs):
+    """
+    A pass that applies every candidate (anything `ToQiskitPass` accepts, e.g. a pytket
+    `SequencePass` or a `ToQiskitPass` built with a placer name) to the same circuit in parallel
+    child processes and keeps the result with the lowest `cost`: 'two_qubit_gates', 'depth',
+    'fidelity' (estimated from the error rates of `target`) or a function of a pytket circuit.
+    Candidates still running after `time_budget` seconds are discarded. The other keyword
+    arguments are passed on to `ToQiskitPass`.
+    """
+    candidates = [_item if _is_tket_pass(_item) else ToQiskitPass(_item, target=target) for _item in candidates]
+    return ToQiskitPass(candidates[0]._pass, target=target, candidates=candidates[1:], cost=cost, time_budget=time_budget, **kwargs)
 
-            coupling_map = target.build_coupling_map()
-            arc = self._arch_from_target()
-            properties = target_to_backend_properties(target)
-            if properties is None:
-                return None
-            else:
-                for gate in properties.gates:
-                    for param in gate.parameters:
-                        if param.name == 'gate_error':
-                            optype = self._optype_from_str(gate.gate)
-                            gate_error = param.value
-                            if len(gate.qubits) == 1:
-                                node_errors[Node(gate.qubits[0])].update({optype: gate_error})
-                            else:
-                                edge_errors[(Node(gate.qubits[0]), Node(gate.qubits[1]))].update({optype: gate_error})
-                                if gate.qubits[::-1] not in coupling_map:
-                                    edge_errors[(Node(gate.qubits[1]), Node(gate.qubits[0]))].update({optype: 2 * gate_error})
-
-                props_dict = properties.to_dict()
-                for n in range(target.num_qubits):
-                    if len(props_dict['qubits']) > n:
-                        readout_error = properties.readout_error(n)
-                    else:
-                        readout_error = 0
+def _average_errors_from_target(target, coupling_map):
+    """
+    Average single-qubit, two-qubit and readout error rates of a target per qubit and per edge.
+
+    Returns a tuple of dicts ``(node_errors, edge_errors, readout_errors)`` keyed by qubit index and by
+    ``(control, target)`` index pair, or None if the target has no error data at all. A two-qubit error on an
+    edge whose reverse is not in the coupling map is also charged, doubled, to the reverse edge.
+    """
+    num_qubits = target.num_qubits
+    if not num_qubits:
+        return None
+
+    qubits_1q, errors_1q, edges_2q, errors_2q = [], [], [], []
+    readout = np.zeros(num_qubits)
+    has_readout = False
+    for op_name in target.operation_names:
+        for qargs, props in target[op_name].items():
+            if qargs is None or props is None or props.error is None:
+                continue
+            if op_name == 'measure':
+                readout[qargs[0]] = props.error
+                has_readout = True
+            elif len(qargs) == 1:
+                qubits_1q.append(qargs[0])
+                errors_1q.append(props.error)
+            elif len(qargs) == 2:
+                edges_2q.append(qargs)
+                errors_2q.append(props.error)
+    if not (qubits_1q or edges_2q or has_readout):
+        return None
+
+    node_errors = {}
+    if qubits_1q:
+        qubits = np.asarray(qubits_1q, dtype=np.int64)
+        counts = np.bincount(qubits, minlength=num_qubits)
+        sums = np.bincount(qubits, weights=np.asarray(errors_1q, dtype=float), minlength=num_qubits)
+        present = np.flatnonzero(counts)
+        node_errors = dict(zip(present.tolist(), (sums[present] / counts[present]).tolist()))
+
+    edge_errors = {}
+    if edges_2q:
+        # Edges are encoded as `control * num_qubits + target` so that they can be grouped with `np.unique`.
+        edges = np.asarray(edges_2q, dtype=np.int64)
+        errors = np.asarray(errors_2q, dtype=float)
+        codes = edges[:, 0] * num_qubits + edges[:, 1]
+        reverse_codes = edges[:, 1] * num_qubits + edges[:, 0]
+        coupling_edges = edge_array(coupling_map)
+        coupling_codes = coupling_edges[:, 0] * num_qubits + coupling_edges[:, 1]
+        missing = ~np.isin(reverse_codes, coupling_codes)
+        codes = np.concatenate([codes, reverse_codes[missing]])
+        errors = np.concatenate([errors, 2 * errors[missing]])
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        averages = np.bincount(inverse, weights=errors) / np.bincount(inverse)
+        edge_errors = {
+            (int(code // num_qubits), int(code % num_qubits)): error
+            for code, error in zip(unique_codes.tolist(), averages.tolist())
+        }
+
+    readout_errors = dict(enumerate(readout.tolist()))
+    return node_errors, edge_errors, readout_errors
+
+def _tket_pass_name(tket_pass):
+    _dict = tket_pass.to_dict()
+    pass_class = _dict['pass_class']
+    return _dict[pass_class].get('name', pass_class)
+
+_PLACEMENT_PASSES = {'NaivePlacementPass', 'PlacementPass'}
+_ROUTING_PASSES = {'AASRouting', 'CXMappingPass', 'DecomposeSwapsToCXs', 'DefaultMappingPass', 'FullMappingPass', 'RoutingPass'}
+# Routing passes that leave circuits whose two-qubit gates are all on neighbouring qubits unchanged.
+_ROUTING_ONLY_PASSES = {'RoutingPass'}
+
+def _mapping_mode(tket_pass):
+    try:
+        names = set(standard_pass_names(tket_pass.to_dict()))
+    except RuntimeError:
+        return None
+    if names and names.issubset(_PLACEMENT_PASSES):
+        return 'placement'
+    elif names & (_PLACEMENT_PASSES | _ROUTING_PASSES):
+        return 'routing'
+    return None
+
+def _supports_virtual_permutation_layout():
+    try:
+        from qiskit.transpiler.passes import ElidePermutations
+    except ImportError:
+        return False
+    return True
+
+def _compose_layouts(first, second, qubits):
+    # `first` followed by `second`, like `Layout.compose` of newer Qiskit versions: every virtual
+    # qubit of `first` goes to the position that `second` gives to the qubit of `qubits` at its
+    # position in `first`.
+    positions = second.get_virtual_bits()
+    return Layout({virtual: positions[qubits[physical]] for virtual, physical in first.get_virtual_bits().items()})
+
+def _is_tket_pass(_pass):
+    return isinstance(_pass, TransformationPass) and isinstance(getattr(_pass, '_pass', None), BasePass)
+
+def _flatten_linear(passes):
+    if isinstance(passes, FlowControllerLinear):
+        passes = passes.passes
+    elif not isinstance(passes, (list, tuple)):
+        passes = [passes]
+
+    for _item in passes:
+        if isinstance(_item, (list, tuple, FlowControllerLinear)):
+            yield from _flatten_linear(_item)
+        else:
+            yield _item
+
+def fuse_tket_passes(passes, incremental: bool = False, window_depth: int = None):
+    """
+    Merge every run of consecutive TKET passes into a single pass that applies them as one
+    pytket `SequencePass`, so the circuit is converted to pytket and back only once per run.
+    Linear flow controllers (e.g. the ones built by `TketPassManager`) are flattened, other
+    flow controllers, windowed TKET passes, TKET passes with a time budget or candidates, placement
+    and routing passes that set the layout and native Qiskit passes are kept as they are and split
+    the runs.
 
-                    readout_errors[Node(n)] = [       
-                        [1.0 - readout_error, readout_error],
-                        [readout_error, 1.0 - readout_error],
-                    ]
+    With `incremental`, runs are also split where passes stop or start being local, and every run
+    of local passes becomes an incremental pass (see `ToQiskitPass`) with windows of
+    `window_depth` layers.
+    """
+    fused = []
+    _run = []
 
-                avg = lambda xs: sum(xs.values()) / len(xs)
-                avg_mat = (lambda xs: (xs[0][1] + xs[1][0]) / 2.0)
-                map_values = lambda f, d: { k: f(v) for k, v in d.items() }
+    def _shared(attr_name):
+        values = [getattr(_item, attr_name, None) for _item in _run]
+        return values[0] if all(value is values[0] for value in values) else None
 
-                avg_node_errors = map_values(avg, node_errors)
-                avg_edge_errors = map_values(avg, edge_errors)
-                avg_readout_errors = map_values(avg_mat, readout_errors)
+    def _flush():
+        if incremental and _run and is_local_pass(_run[0]._pass):
+            fused.append(ToQiskitPass(
+                SequencePass([_item._pass for _item in _run]) if len(_run) > 1 else _run[0]._pass,
+                target=_shared('target'),
+                result_cache=_shared('_result_cache'),
+                set_layout=bool(_shared('set_layout')),
+                incremental=True,
+                window_depth=window_depth,
+            ))
+        elif len(_run) == 1:
+            fused.append(_run[0])
+        elif len(_run) > 1:
+            fused.append(ToQiskitPass(
+                SequencePass([_item._pass for _item in _run]),
+                target=_shared('target'),
+                result_cache=_shared('_result_cache'),
+                set_layout=bool(_shared('set_layout')),
+            ))
+        _run.clear()
 
-                return NoiseAwarePlacement(
-                    arc,
-                    avg_node_errors,
-                    avg_edge_errors,
-                    avg_readout_errors
-                )
+    for _item in _flatten_linear(passes):
+        if _is_tket_pass(_item) and _item.window_depth is None and _item._mapping_mode is None and _item.time_budget is None and not _item.candidates:
+            if incremental and _run and is_local_pass(_item._pass) != is_local_pass(_run[0]._pass):
+                _flush()
+            _run.append(_item)
+        else:
+            _flush()
+            fused.append(_item)
+    _flush()
 
-    return TketPassClass(target, **kwargs)
\ No newline at end of file
+    return fused
\ No newline at end of file
@@ -1,57 +1,432 @@
 import pydoc
 import re
+from collections import OrderedDict
+from math import pi
 
+import pytket
 import pytket.passes as tkps
+from pytket.circuit import Bit, Circuit, OpType, Qubit
+from qiskit.circuit import ClassicalRegister, ControlledGate, ParameterExpression, QuantumRegister
+from qiskit.converters import dag_to_circuit, circuit_to_dag
+from qiskit.dagcircuit import DAGCircuit
+
+# Signatures of pytket pass constructors, parsed from their docstrings once per pytket version.
+_signatures = {}
+
+def get_signatures(tket_pass):
+    key = (pytket.__version__, getattr(tket_pass, '__module__', None), tket_pass.__name__)
+    signatures = _signatures.get(key)
+    if signatures is None:
+        signatures = _signatures[key] = _parse_signatures(tket_pass)
+    return signatures
+
+def select_signature(tket_pass, kwargs):
+    # The first overload that accepts all the given keyword arguments
+    signatures = get_signatures(tket_pass)
+    for signature in signatures:
+        arg_names = {argument[0] for argument in signature}
+        if arg_names.issuperset(kwargs):
+            return signature
+    return signatures[0] if signatures else ()
 
 def get_arguments_from_doc(tket_pass):
-    arguments = []
+    signatures = get_signatures(tket_pass)
+    return list(signatures[0]) if signatures else []
 
+def _parse_signatures(tket_pass):
     _doc = pydoc.getdoc(tket_pass)
     if 'Overloaded function.' in _doc:
-        #Return the first signature
-        #TODO: We should return all possible signatures. This would requires changes in ToQiskitPass also.
-        matches = re.findall("[1-9]\. (" + tket_pass.__name__ + '[^\n]+)', _doc)
-        synopsis_line = matches[0]
+        synopsis_lines = re.findall(r"\d+\. `*(" + re.escape(tket_pass.__name__) + r"\(.*)", _doc)
     else:
-        synopsis_line = pydoc.splitdoc(_doc)[0]
-
-    # To avoid issue caused by callable parentheses:
-    synopsis_line = re.sub('Callable\[\[[^\[]+\][^\[]+\]', 'Callable', synopsis_line)
-
-    match = re.search("\(([^(]+)\)", synopsis_line)
-    if match is not None:
-        splitted_args = match.group(1).split(', ')
-        for arg_str in splitted_args:
-            if arg_str == '**kwargs':
-                continue
-            else:
-                argument = arg_str.split(': ')
-                eq_index = argument[1].find('=')
-                if eq_index > 0:
-                    (_type, _default) = argument[1].split(' = ')
-                    arguments.append((argument[0], _type, _default))
-                else:
-                    arguments.append(tuple(argument))
-
-    return arguments
-
-# This is **temp**. Conversion should be done in a better way
-# https://github.com/CQCL/pytket-qiskit/blob/develop/pytket/extensions/qiskit/qiskit_convert.py
+        synopsis_lines = [pydoc.splitdoc(_doc)[0]]
 
-from pytket.extensions.qiskit import qiskit_to_tk, tk_to_qiskit
-from qiskit.converters import dag_to_circuit, circuit_to_dag
+    return tuple(_parse_synopsis_line(synopsis_line) for synopsis_line in synopsis_lines)
 
-from pytket.circuit import Circuit
-from qiskit.dagcircuit import DAGCircuit
+def _split_top_level(text, sep=', '):
+    parts = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        if text[i] in '([{':
+            depth += 1
+        elif text[i] in ')]}':
+            depth -= 1
+        elif depth == 0 and text.startswith(sep, i):
+            parts.append(text[start:i])
+            i += len(sep)
+            start = i
+            continue
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+def _parse_synopsis_line(synopsis_line):
+    start = synopsis_line.find('(')
+    if start < 0:
+        return ()
+
+    # Find the matching parenthesis, argument types (e.g. callables) may have nested brackets.
+    depth = 0
+    for end in range(start, len(synopsis_line)):
+        if synopsis_line[end] in '([':
+            depth += 1
+        elif synopsis_line[end] in ')]':
+            depth -= 1
+            if depth == 0:
+                break
+
+    args_str = synopsis_line[start + 1:end]
+    if not args_str:
+        return ()
+
+    arguments = []
+    for arg_str in _split_top_level(args_str):
+        if arg_str.startswith('*'):
+            continue
+
+        arg_name, _, arg_type = arg_str.partition(': ')
+        arg_type, has_default, _default = arg_type.partition(' = ')
+        if 'Callable[' in arg_type:
+            arg_type = arg_type[:arg_type.index('Callable[')] + 'Callable'
+
+        if has_default:
+            arguments.append((arg_name, arg_type, _default))
+        else:
+            arguments.append((arg_name, arg_type))
+
+    return tuple(arguments)
+
+# pytket cannot serialize the Python callables held by some passes (e.g. the TK1 replacement of
+# `RebaseCustom`), `to_dict()` stores this placeholder instead.
+_NOT_SERIALIZED = 'SERIALIZATION OF FUNCTIONS IS NOT YET SUPPORTED'
+
+def tket_pass_from_dict(pass_dict):
+    """
+    Like `BasePass.from_dict`, but also rebuilds `RebaseCustom` passes (possibly nested in sequences
+    or repeats) whose TK1 replacement could not be serialized, using the TK1 decomposition of their
+    gate set.
+    """
+    try:
+        return tkps.BasePass.from_dict(pass_dict)
+    except RuntimeError:
+        pass_class = pass_dict['pass_class']
+        if pass_class == 'SequencePass':
+            return tkps.SequencePass([tket_pass_from_dict(_item) for _item in pass_dict['SequencePass']['sequence']])
+        elif pass_class == 'RepeatPass':
+            return tkps.RepeatPass(tket_pass_from_dict(pass_dict['RepeatPass']['body']))
+        elif pass_class == 'StandardPass' and pass_dict['StandardPass'].get('basis_tk1_replacement') == _NOT_SERIALIZED:
+            _dict = pass_dict['StandardPass']
+            gateset = {OpType.from_name(name) for name in _dict['basis_allowed']}
+            cx_replacement = Circuit.from_dict(_dict['basis_cx_replacement'])
+            return tkps.RebaseCustom(gateset, cx_replacement, _tk1_replacement_for_gateset(gateset))
+        raise
+
+def _tk1_replacement_for_gateset(gateset):
+    try:
+        from pytket.passes.auto_rebase import get_tk1_decomposition_function
+    except ImportError:
+        from pytket.passes._decompositions import _TK1_to_X_SX_Rz, _TK1_to_U
+        if {OpType.X, OpType.SX, OpType.Rz}.issubset(gateset):
+            return _TK1_to_X_SX_Rz
+        return _TK1_to_U
+
+    return get_tk1_decomposition_function(gateset)
+
+# The native converters below build the pytket Circuit straight from the DAG op nodes and the
+# DAG straight from the pytket commands. Anything they do not handle (symbolic parameters,
+# conditional operations, boxes, non-default control states, ...) is converted through the
+# pytket-qiskit converters as before:
+# https://github.com/CQCL/pytket-qiskit/blob/develop/pytket/extensions/qiskit/qiskit_convert.py
+
+class _NotNativelyConvertible(Exception):
+    pass
 
 def qiskit_dag_to_tk(dag: DAGCircuit):
     # Replace any gate that is not known to pyket by its definition
-    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate
-    for node in dag.op_nodes():
-        if not type(node.op) in _known_qiskit_gate:
-            dag.substitute_node_with_dag(node, circuit_to_dag(node.op.definition))
+    dag = _expand_unknown_gates(dag)
 
-    return qiskit_to_tk(dag_to_circuit(dag))
+    try:
+        return _dag_to_tk_native(dag)
+    except _NotNativelyConvertible:
+        from pytket.extensions.qiskit import qiskit_to_tk
+        return qiskit_to_tk(dag_to_circuit(dag))
 
 def tk_to_qiskit_dag(tkcirc: Circuit):
-    return circuit_to_dag(tk_to_qiskit(tkcirc))
\ No newline at end of file
+    # Implicit wire swaps are made explicit
+    if _implicit_permutation(tkcirc):
+        tkcirc = tkcirc.copy()
+        tkcirc.replace_implicit_wire_swaps()
+
+    try:
+        return _tk_to_dag_native(tkcirc)
+    except _NotNativelyConvertible:
+        from pytket.extensions.qiskit import tk_to_qiskit
+        return circuit_to_dag(tk_to_qiskit(tkcirc))
+
+def tk_to_qiskit_dag_and_permutation(tkcirc: Circuit):
+    """
+    Like `tk_to_qiskit_dag`, but the implicit qubit permutation of the circuit is left out of the
+    DAG instead of being replaced by SWAP gates. It is returned as a dict mapping each DAG qubit
+    that is permuted to the DAG qubit that its state ends on, which is empty if the circuit has no
+    such permutation or if it had to be replaced by SWAP gates after all.
+    """
+    permutation = _implicit_permutation(tkcirc)
+    if not permutation:
+        return tk_to_qiskit_dag(tkcirc), {}
+
+    try:
+        dag = _tk_to_dag_native(tkcirc, implicit_permutation=True)
+    except _NotNativelyConvertible:
+        return tk_to_qiskit_dag(tkcirc), {}
+
+    qubits = {(qreg.name, index): qubit for qreg in dag.qregs.values() for index, qubit in enumerate(qreg)}
+    return dag, {
+        qubits[(_from.reg_name, _from.index[0])]: qubits[(_to.reg_name, _to.index[0])]
+        for _from, _to in permutation.items()
+    }
+
+def _implicit_permutation(tkcirc: Circuit):
+    return {_from: _to for _from, _to in tkcirc.implicit_qubit_permutation().items() if _from != _to}
+
+def standard_pass_names(pass_dict):
+    """
+    Names of the passes that make up a serialized pytket pass, looking into sequences and repeats.
+    """
+    pass_class = pass_dict['pass_class']
+    if pass_class == 'SequencePass':
+        for _item in pass_dict['SequencePass']['sequence']:
+            yield from standard_pass_names(_item)
+    elif pass_class == 'RepeatPass':
+        yield from standard_pass_names(pass_dict['RepeatPass']['body'])
+    else:
+        yield pass_dict[pass_class].get('name', pass_class)
+
+# Expansions of gates that pytket does not know, keyed by gate class, name, parameters and size.
+# Like Qiskit's equivalence library, this assumes that such gates have the same definition.
+_EXPANSIONS_MAXSIZE = 1024
+_expansions = OrderedDict()
+
+def _is_known_gate(op):
+    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate
+    return getattr(op, 'base_class', type(op)) in _known_qiskit_gate
+
+def _expand_unknown_gates(dag: DAGCircuit):
+    """
+    Return a DAG in which every gate unknown to pytket is replaced, recursively, by its definition.
+    The input DAG is returned as is if it has no such gate, and is never modified.
+    """
+    if all(_is_known_gate(node.op) for node in dag.op_nodes()):
+        return dag
+
+    expanded = dag.copy_empty_like()
+    for node in dag.topological_op_nodes():
+        expansion = None if _is_known_gate(node.op) else _expanded_definition(node.op)
+        if expansion is None:
+            expanded.apply_operation_back(node.op, node.qargs, node.cargs)
+            continue
+
+        phase, instructions = expansion
+        condition = getattr(node.op, 'condition', None)
+        expanded.global_phase += phase
+        for op, qubit_indices, clbit_indices in instructions:
+            if condition is not None:
+                op = op.copy()
+                op.condition = condition
+            expanded.apply_operation_back(
+                op,
+                tuple(node.qargs[index] for index in qubit_indices),
+                tuple(node.cargs[index] for index in clbit_indices)
+            )
+    return expanded
+
+def _expanded_definition(op):
+    """
+    The definition of `op` expanded down to gates known to pytket, as a global phase and a tuple of
+    `(operation, qubit indices, clbit indices)`, or None if `op` cannot be expanded.
+    """
+    key = (getattr(op, 'base_class', type(op)), op.name, tuple(op.params), op.num_qubits, op.num_clbits)
+    try:
+        expansion = _expansions.get(key)
+    except TypeError:
+        # Unhashable parameters (e.g. the matrix of a UnitaryGate)
+        return _expand_definition(op)
+
+    if expansion is None:
+        expansion = _expansions[key] = _expand_definition(op)
+        if len(_expansions) > _EXPANSIONS_MAXSIZE:
+            _expansions.popitem(last=False)
+    else:
+        _expansions.move_to_end(key)
+    return expansion
+
+def _expand_definition(op):
+    definition = op.definition
+    if definition is None:
+        return None
+
+    qubit_indices = {qubit: index for index, qubit in enumerate(definition.qubits)}
+    clbit_indices = {clbit: index for index, clbit in enumerate(definition.clbits)}
+    phase = definition.global_phase
+    instructions = []
+    for instruction in definition.data:
+        sub_op = instruction.operation
+        if getattr(sub_op, 'condition', None) is not None:
+            # Conditions refer to the definition's own classical bits
+            return None
+        qubits = tuple(qubit_indices[qubit] for qubit in instruction.qubits)
+        clbits = tuple(clbit_indices[clbit] for clbit in instruction.clbits)
+
+        expansion = None if _is_known_gate(sub_op) else _expanded_definition(sub_op)
+        if expansion is None:
+            instructions.append((sub_op, qubits, clbits))
+        else:
+            sub_phase, sub_instructions = expansion
+            phase += sub_phase
+            for _op, _qubits, _clbits in sub_instructions:
+                instructions.append((_op, tuple(qubits[index] for index in _qubits), tuple(clbits[index] for index in _clbits)))
+
+    return phase, tuple(instructions)
+
+def _param_to_tk(param):
+    if isinstance(param, ParameterExpression):
+        if param.parameters:
+            raise _NotNativelyConvertible()
+        param = float(param)
+    return param / pi
+
+def _native_optype(op):
+    # The OpType of a Qiskit operation that the native converters handle
+    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate
+
+    optype = _known_qiskit_gate.get(getattr(op, 'base_class', type(op)))
+    if optype is None or optype.name.endswith('Box') or optype == OpType.CustomGate:
+        raise _NotNativelyConvertible()
+    if getattr(op, 'condition', None) is not None:
+        raise _NotNativelyConvertible()
+    if isinstance(op, ControlledGate) and op.ctrl_state != 2 ** op.num_ctrl_qubits - 1:
+        raise _NotNativelyConvertible()
+    return optype
+
+def _dag_to_tk_native(dag: DAGCircuit):
+    if isinstance(dag.global_phase, ParameterExpression):
+        raise _NotNativelyConvertible()
+
+    tkcirc = Circuit() if dag.name is None else Circuit(name=dag.name)
+
+    qubit_map = {}
+    for qreg in dag.qregs.values():
+        tkcirc.add_q_register(qreg.name, qreg.size)
+        for index, qubit in enumerate(qreg):
+            qubit_map[qubit] = Qubit(qreg.name, index)
+
+    bit_map = {}
+    for creg in dag.cregs.values():
+        tkcirc.add_c_register(creg.name, creg.size)
+        for index, clbit in enumerate(creg):
+            bit_map[clbit] = Bit(creg.name, index)
+
+    # Bits that do not belong to any register
+    if len(qubit_map) != dag.num_qubits() or len(bit_map) != dag.num_clbits():
+        raise _NotNativelyConvertible()
+
+    for node in dag.topological_op_nodes():
+        op = node.op
+        optype = _native_optype(op)
+
+        qubits = [qubit_map[qubit] for qubit in node.qargs]
+        if optype == OpType.Barrier:
+            tkcirc.add_barrier(qubits)
+        else:
+            bits = [bit_map[clbit] for clbit in node.cargs]
+            try:
+                tkcirc.add_gate(optype, [_param_to_tk(param) for param in op.params], qubits + bits)
+            except RuntimeError:
+                # e.g. parameters that pytket does not have (CUGate's global phase)
+                raise _NotNativelyConvertible()
+
+    tkcirc.add_phase(dag.global_phase / pi)
+
+    return tkcirc
+
+def _gate_from_tk(optype, params):
+    """
+    The Qiskit gate of a pytket operation (other than a barrier or a phase) with parameters
+    `params` in half-turns, and the global phase in half-turns that it adds.
+    """
+    from qiskit.circuit import Measure, Reset
+    from qiskit.circuit.library import UGate
+    from pytket.extensions.qiskit.qiskit_convert import _known_qiskit_gate, _known_qiskit_gate_rev
+
+    if optype == OpType.Measure:
+        return Measure(), 0
+    elif optype == OpType.Reset:
+        return Reset(), 0
+    elif optype == OpType.TK1:
+        # TK1(a, b, c) = exp(-i pi (a + c) / 2) U3(b, a - 1/2, c + 1/2)
+        return UGate(params[1] * pi, (params[0] - 0.5) * pi, (params[2] + 0.5) * pi), -0.5 * (params[0] + params[2])
+
+    gate_cls = _known_qiskit_gate_rev.get(optype)
+    if gate_cls is None or _known_qiskit_gate.get(gate_cls) != optype:
+        raise _NotNativelyConvertible()
+    try:
+        return gate_cls(*[param * pi for param in params]), 0
+    except TypeError:
+        raise _NotNativelyConvertible()
+
+def _tk_to_dag_native(tkcirc: Circuit, implicit_permutation: bool = False):
+    from qiskit.circuit import Barrier
+
+    if tkcirc.free_symbols():
+        raise _NotNativelyConvertible()
+    if not implicit_permutation and _implicit_permutation(tkcirc):
+        raise _NotNativelyConvertible()
+
+    dag = DAGCircuit()
+    dag.name = tkcirc.name
+
+    qreg_sizes = {}
+    for qubit in tkcirc.qubits:
+        if len(qubit.index) != 1:
+            raise _NotNativelyConvertible()
+        qreg_sizes[qubit.reg_name] = max(qreg_sizes.get(qubit.reg_name, 0), qubit.index[0] + 1)
+    creg_sizes = {}
+    for bit in tkcirc.bits:
+        if len(bit.index) != 1:
+            raise _NotNativelyConvertible()
+        creg_sizes[bit.reg_name] = max(creg_sizes.get(bit.reg_name, 0), bit.index[0] + 1)
+
+    qregs = {}
+    for reg_name, size in qreg_sizes.items():
+        qregs[reg_name] = QuantumRegister(size, reg_name)
+        dag.add_qreg(qregs[reg_name])
+    cregs = {}
+    for reg_name, size in creg_sizes.items():
+        cregs[reg_name] = ClassicalRegister(size, reg_name)
+        dag.add_creg(cregs[reg_name])
+
+    phase = float(tkcirc.phase)
+    for command in tkcirc.get_commands():
+        optype = command.op.type
+        qargs = [qregs[arg.reg_name][arg.index[0]] for arg in command.args if isinstance(arg, Qubit)]
+        cargs = [cregs[arg.reg_name][arg.index[0]] for arg in command.args if not isinstance(arg, Qubit)]
+        if optype == OpType.Barrier:
+            if qargs:
+                dag.apply_operation_back(Barrier(len(qargs)), qargs, [])
+            continue
+
+        params = [float(param) for param in command.op.params]
+
+        if optype == OpType.Phase:
+            phase += params[0]
+            continue
+
+        gate, gate_phase = _gate_from_tk(optype, params)
+        phase += gate_phase
+        if gate.num_qubits != len(qargs) or gate.num_clbits != len(cargs):
+            raise _NotNativelyConvertible()
+        dag.apply_operation_back(gate, qargs, cargs)
+
+    dag.global_phase = phase * pi
+
+    return dag
\ No newline at end of file
@@ -0,0 +1,168 @@
+import time
+
+from qiskit.dagcircuit import DAGCircuit
+
+from .utils import qiskit_dag_to_tk, standard_pass_names, tk_to_qiskit_dag
+
+# Passes that only rewrite gates locally, so that applying them to consecutive slices of a circuit
+# gives a valid (if possibly less optimized) result.
+LOCAL_PASSES = {
+    'CliffordSimp',
+    'CommuteThroughMultis',
+    'DecomposeMultiQubitsCX',
+    'DecomposeSingleQubitsTK1',
+    'EulerAngleReduction',
+    'FullPeepholeOptimise',
+    'KAKDecomposition',
+    'PeepholeOptimise2Q',
+    'RebaseCustom',
+    'RemoveRedundancies',
+    'SquashCustom',
+    'SquashTK1',
+    'SynthesiseTket',
+    'ThreeQubitSquash',
+}
+
+def is_local_pass(tket_pass):
+    try:
+        return all(name in LOCAL_PASSES for name in standard_pass_names(tket_pass.to_dict()))
+    except RuntimeError:
+        return False
+
+def _wires(node):
+    wires = list(node.qargs) + list(node.cargs)
+    condition = getattr(node.op, 'condition', None)
+    if condition is not None:
+        target = condition[0]
+        wires.extend(target if hasattr(target, 'size') else [target])
+    return wires
+
+def layer_indices(nodes):
+    """
+    Yield `(node, layer)` for op nodes given in topological order, where the layer of a node is
+    the length of the longest path of operations ending with it (starting at 0).
+    """
+    wire_layers = {}
+    for node in nodes:
+        wires = _wires(node)
+        layer = max((wire_layers.get(wire, -1) for wire in wires), default=-1) + 1
+        for wire in wires:
+            wire_layers[wire] = layer
+        yield node, layer
+
+def split_windows(dag: DAGCircuit, window_depth: int):
+    """
+    Op nodes of `dag` grouped in topological order into slices of `window_depth` layers.
+    """
+    windows = []
+    for node, layer in layer_indices(dag.topological_op_nodes()):
+        index = layer // window_depth
+        if index == len(windows):
+            windows.append([])
+        windows[index].append(node)
+    return windows
+
+def _bit_maps(window_dag: DAGCircuit, dag: DAGCircuit):
+    # Bits of a DAG converted back from pytket are new objects, matched by register name and index.
+    qubits = {(qreg.name, index): qubit for qreg in dag.qregs.values() for index, qubit in enumerate(qreg)}
+    clbits = {(creg.name, index): clbit for creg in dag.cregs.values() for index, clbit in enumerate(creg)}
+    qubit_map = {qubit: qubits[(qreg.name, index)] for qreg in window_dag.qregs.values() for index, qubit in enumerate(qreg)}
+    clbit_map = {clbit: clbits[(creg.name, index)] for creg in window_dag.cregs.values() for index, clbit in enumerate(creg)}
+    return qubit_map, clbit_map
+
+def run_windowed(dag: DAGCircuit, apply, window_depth: int, overlap: int = 2, result_cache=None, tket_pass=None, target=None):
+    """
+    Apply `apply` (e.g. `BasePass.apply`) to consecutive slices of `window_depth` layers of `dag`
+    instead of to the whole circuit, so that only one slice at a time is held as a pytket circuit.
+    The last `overlap` layers of each optimized slice are not committed but prepended to the next
+    slice, so gates across a boundary are optimized together. Implicit wire swaps are made
+    explicit in each slice.
+
+    With a `result_cache`, optimized slices are stored in it, keyed by their content, `tket_pass`
+    and `target`, and looked up before applying the pass. When a circuit only differs from a
+    previous one in a few gates, the pass then only runs again on the slices with the changes and
+    the slices after them whose carried over layers changed, and the rest of the result is reused.
+
+    Returns the new DAG and a dict with the number of windows, whether any of them was modified,
+    how many were found in the result cache and the time spent converting and applying the pass.
+    A slice found in the result cache counts as modified.
+    """
+    stats = {
+        'windows': 0,
+        'modified': False,
+        'window_cache_hits': 0,
+        'conversion_in_time': 0.0,
+        'apply_time': 0.0,
+        'conversion_out_time': 0.0,
+    }
+    windows = split_windows(dag, window_depth)
+    new_dag = dag.copy_empty_like()
+    carry = []
+    for index in range(len(windows)):
+        start = time.perf_counter()
+        window_dag = dag.copy_empty_like()
+        window_dag.global_phase = 0
+        for op, qargs, cargs in carry:
+            window_dag.apply_operation_back(op, qargs, cargs)
+        for node in windows[index]:
+            window_dag.apply_operation_back(node.op, node.qargs, node.cargs)
+        windows[index] = None
+
+        key, cached = None, None
+        if result_cache is not None:
+            key, parameters = result_cache.key(window_dag, tket_pass, target)
+            if key is not None:
+                cached = result_cache.lookup(key, parameters)
+
+        if cached is not None:
+            converted = applied = time.perf_counter()
+            modified = True
+            stats['window_cache_hits'] += 1
+            window_dag = cached
+        else:
+            tkcirc = qiskit_dag_to_tk(window_dag)
+            converted = time.perf_counter()
+
+            modified = apply(tkcirc)
+            applied = time.perf_counter()
+
+            if modified:
+                tkcirc.replace_implicit_wire_swaps()
+                window_dag = tk_to_qiskit_dag(tkcirc)
+            del tkcirc
+            if key is not None:
+                result_cache.store(key, parameters, window_dag, time.perf_counter() - start)
+
+        if modified:
+            new_dag.global_phase += window_dag.global_phase
+            qubit_map, clbit_map = _bit_maps(window_dag, dag)
+        else:
+            qubit_map, clbit_map = None, None
+
+        last = index == len(windows) - 1
+        carry = _commit(window_dag, new_dag, 0 if last else overlap, qubit_map, clbit_map)
+        end = time.perf_counter()
+
+        stats['windows'] += 1
+        stats['modified'] = stats['modified'] or modified
+        stats['conversion_in_time'] += converted - start
+        stats['apply_time'] += applied - converted
+        stats['conversion_out_time'] += end - applied
+
+    return new_dag, stats
+
+def _commit(window_dag, new_dag, overlap, qubit_map, clbit_map):
+    # Append all but the last `overlap` layers of `window_dag` to `new_dag`, and return the rest.
+    nodes = list(layer_indices(window_dag.topological_op_nodes()))
+    last_layer = max((layer for _, layer in nodes), default=-1) - overlap
+    carry = []
+    for node, layer in nodes:
+        qargs, cargs = node.qargs, node.cargs
+        if qubit_map is not None:
+            qargs = tuple(qubit_map[qubit] for qubit in qargs)
+            cargs = tuple(clbit_map[clbit] for clbit in cargs)
+        if layer <= last_layer:
+            new_dag.apply_operation_back(node.op, qargs, cargs)
+        else:
+            carry.append((node.op, qargs, cargs))
+    return carry
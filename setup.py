@@ -13,6 +13,7 @@ setuptools.setup(
     entry_points = {
         'qiskit.transpiler.init': [
             'tket = qiskit_tket_passes.plugins:TketInitPassManager',
+            'tket_auto = qiskit_tket_passes.plugins:TketAutoInitPassManager',
         ],
         'qiskit.transpiler.layout': [
             'tket = qiskit_tket_passes.plugins:TketLayoutPassManager',
@@ -25,6 +26,8 @@ setuptools.setup(
         ],
         'qiskit.transpiler.optimization': [
             'tket = qiskit_tket_passes.plugins:TketOptimizationPassManager',
+            'tket_incremental = qiskit_tket_passes.plugins:TketIncrementalOptimizationPassManager',
+            'tket_auto = qiskit_tket_passes.plugins:TketAutoOptimizationPassManager',
         ]
     }
 )
\ No newline at end of file
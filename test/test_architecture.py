@@ -0,0 +1,82 @@
+import tempfile
+import unittest
+
+import numpy as np
+import rustworkx as rx
+from qiskit.providers.fake_provider import FakeManilaV2, FakeQuitoV2
+from qiskit.transpiler import CouplingMap
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes.architecture import ArchitectureCache, ArchitecturePrecomputation, architecture_and_coupling_map, architecture_precomputation, build_architecture, edge_array
+
+class TestArchitecture(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.edges = [[0, 1], [1, 0], [1, 2], [2, 1], [1, 3], [3, 1]]
+
+    def test_edge_array(self):
+        expected = np.array(self.edges)
+        graph = rx.PyDiGraph()
+        graph.add_nodes_from(range(4))
+        graph.extend_from_edge_list([tuple(edge) for edge in self.edges])
+
+        for edges in [self.edges, expected, CouplingMap(self.edges), graph]:
+            np.testing.assert_array_equal(edge_array(edges), expected)
+        self.assertEqual(edge_array([]).shape, (0, 2))
+
+    def test_architecture_and_coupling_map(self):
+        arc, coupling_map = architecture_and_coupling_map(np.array(self.edges), num_qubits=5)
+
+        self.assertEqual(sorted((a.index[0], b.index[0]) for a, b in arc.coupling), sorted(map(tuple, self.edges)))
+        self.assertEqual(sorted(coupling_map.get_edges()), sorted(map(tuple, self.edges)))
+        self.assertEqual(coupling_map.size(), 5)
+
+    def test_pairs_are_memoized(self):
+        cache = ArchitectureCache(maxsize=1)
+
+        pair = cache.get(self.edges)
+        self.assertIs(cache.get(np.array(self.edges)), pair)
+        self.assertIs(cache.get(CouplingMap(self.edges)), pair)
+        self.assertEqual(cache.info().hits, 2)
+
+        cache.get(self.edges[:2])
+        self.assertIsNot(cache.get(self.edges), pair)
+        self.assertEqual(cache.info().currsize, 1)
+
+        self.assertIs(build_architecture(self.edges), build_architecture(np.array(self.edges)))
+
+    def test_precomputation(self):
+        precomputation = ArchitecturePrecomputation(self.edges, num_qubits=5)
+
+        self.assertEqual(precomputation.distances[0, 2], 2)
+        self.assertEqual(precomputation.distances[3, 0], 2)
+        self.assertEqual(precomputation.distances[0, 4], np.inf)
+        self.assertTrue(precomputation.are_adjacent([[0, 1], [3, 1]]))
+        self.assertFalse(precomputation.are_adjacent([[0, 1], [0, 2]]))
+        self.assertFalse(precomputation.are_adjacent([[0, 5]]))
+
+    def test_precomputation_save_and_load(self):
+        target = FakeQuitoV2().target
+        precomputation = architecture_precomputation(target)
+        self.assertIs(architecture_precomputation(FakeQuitoV2().target), precomputation)
+        precomputation.remember_placement('key', [1, None, 3])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'quito.npz')
+            precomputation.save(path)
+            loaded = ArchitecturePrecomputation.load(path, target=target)
+            with self.assertRaises(ValueError):
+                ArchitecturePrecomputation.load(path, target=FakeManilaV2().target)
+
+        self.assertIs(architecture_precomputation(target), loaded)
+        np.testing.assert_array_equal(loaded.distances, precomputation.distances)
+        self.assertEqual(loaded.placement('key'), [1, None, 3])
+
+if __name__ == '__main__':
+    unittest.main()
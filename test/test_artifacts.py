@@ -0,0 +1,130 @@
+import json
+import os
+import tempfile
+import unittest
+
+from qiskit.circuit import QuantumCircuit
+from qiskit.providers.fake_provider import FakeQuitoV2
+from qiskit.transpiler import CouplingMap, PassManager, PassManagerConfig
+from qiskit.transpiler.passes import GatesInBasis, Optimize1qGates, TrivialLayout
+from qiskit.transpiler.preset_passmanagers import common
+import pytket.passes as tkps
+
+import sys
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass, fuse_tket_passes, portfolio_pass
+from qiskit_tket_passes.artifacts import dump_pass_manager, load_pass_manager, load_pass_manager_dict, save_pass_manager
+import qiskit_tket_passes.plugins as plgn
+from qiskit_tket_passes.plugins import _not_all_gates_in_basis
+
+def _circuit():
+    circ = QuantumCircuit(3)
+    for _ in range(5):
+        circ.h(0)
+        circ.cx(0, 1)
+        circ.rz(0.2, 1)
+        circ.cx(1, 2)
+        circ.cx(0, 1)
+    return circ
+
+def _without_order(_dict):
+    # pytket serializes gate sets in no particular order.
+    if isinstance(_dict, dict):
+        return {key: _without_order(value) for key, value in _dict.items()}
+    if isinstance(_dict, list):
+        items = [_without_order(item) for item in _dict]
+        return sorted(items) if all(isinstance(item, str) for item in items) else items
+    return _dict
+
+class TestArtifacts(unittest.TestCase):
+
+    def test_save_and_load(self):
+        pm = PassManager(fuse_tket_passes([
+            ToQiskitPass(tkps.RemoveRedundancies),
+            ToQiskitPass(tkps.SynthesiseTket),
+        ]))
+        pm.append(ToQiskitPass(tkps.FullPeepholeOptimise, time_budget=60, fallbacks=[tkps.SynthesiseTket, None]))
+        pm.append(ToQiskitPass(tkps.CliffordSimp, window_depth=4))
+        pm.append(portfolio_pass([tkps.SynthesiseTket(), tkps.FullPeepholeOptimise()], cost='depth'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pm.json')
+            save_pass_manager(pm, path)
+            loaded = load_pass_manager(path)
+
+        self.assertEqual(loaded.run(_circuit()), pm.run(_circuit()))
+        _dict = dump_pass_manager(loaded)
+        self.assertEqual(_dict, dump_pass_manager(pm))
+        self.assertEqual(_dict['pass_sets'][1]['sequence'][0]['fallbacks'][1], None)
+        self.assertEqual(_dict['pass_sets'][2]['sequence'][0]['window_depth'], 4)
+        self.assertEqual(len(_dict['pass_sets'][3]['sequence'][0]['candidates']), 1)
+
+    def test_version_check(self):
+        artifact = dump_pass_manager(PassManager([ToQiskitPass(tkps.RemoveRedundancies)]))
+        artifact = json.loads(json.dumps(artifact))
+        artifact['versions']['pytket'] = '0.0.1'
+
+        with self.assertRaises(ValueError):
+            load_pass_manager_dict(artifact)
+        self.assertIsInstance(load_pass_manager_dict(artifact, check_versions=False), PassManager)
+
+    def test_qiskit_passes_are_not_saved(self):
+        with self.assertRaises(ValueError):
+            dump_pass_manager(PassManager([ToQiskitPass(tkps.RemoveRedundancies), Optimize1qGates()]))
+
+    def test_save_and_load_conditions_and_qiskit_passes(self):
+        coupling_map = CouplingMap.from_line(4)
+        pm = PassManager([TrivialLayout(coupling_map)])
+        pm += common.generate_embed_passmanager(coupling_map)
+        pm.append(GatesInBasis(basis_gates=['cx', 'rz', 'sx', 'x']))
+        pm.append(ToQiskitPass(tkps.RemoveRedundancies), condition=_not_all_gates_in_basis)
+
+        artifact = json.loads(json.dumps(dump_pass_manager(pm)))
+        loaded = load_pass_manager_dict(artifact)
+
+        self.assertEqual(dump_pass_manager(loaded), artifact)
+        self.assertEqual(artifact['pass_sets'][-1]['condition'], 'not_all_gates_in_basis')
+        tr_circ = loaded.run(_circuit())
+        self.assertEqual(tr_circ, pm.run(_circuit()))
+        self.assertEqual(tr_circ.num_qubits, 4)
+
+    def test_save_and_load_stage_plugins(self):
+        plugins = [
+            plgn.TketInitPassManager,
+            plgn.TketLayoutPassManager,
+            plgn.TketRoutingPassManager,
+            plgn.TketTranslationPassManager,
+            plgn.TketOptimizationPassManager,
+            plgn.TketIncrementalOptimizationPassManager,
+        ]
+        configs = {
+            'backend': PassManagerConfig.from_backend(FakeQuitoV2()),
+            'basis_gates': PassManagerConfig(basis_gates=['cx', 'rz', 'sx', 'x']),
+        }
+        for config_name, config in configs.items():
+            for plugin in plugins:
+                for optimization_level in range(4):
+                    pm = plugin().pass_manager(config, optimization_level)
+                    if pm is None:
+                        continue
+                    with self.subTest(config=config_name, plugin=plugin.__name__, optimization_level=optimization_level):
+                        artifact = json.loads(json.dumps(dump_pass_manager(pm)))
+                        loaded = load_pass_manager_dict(artifact)
+                        self.assertEqual(_without_order(dump_pass_manager(loaded)), _without_order(artifact))
+                        if plugin is not plgn.TketRoutingPassManager:
+                            # Routing needs the layout set by the layout stage.
+                            self.assertEqual(loaded.run(_circuit()), pm.run(_circuit()))
+
+        with self.assertRaises(ValueError):
+            dump_pass_manager(plgn.TketAutoOptimizationPassManager().pass_manager(configs['backend'], 1))
+
+    def test_unregistered_conditions_are_not_saved(self):
+        pm = PassManager()
+        pm.append(ToQiskitPass(tkps.RemoveRedundancies), condition=lambda property_set: True)
+        with self.assertRaises(ValueError):
+            dump_pass_manager(pm)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+
+import numpy as np
+from qiskit.circuit import ClassicalRegister, Parameter, QuantumCircuit, QuantumRegister
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from qiskit.quantum_info import Operator
+
+import pytket.passes as tkps
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes.circuit_encoding import decode_dag, decode_tk, encode_dag, encode_tk, read_shared_circuit, release_shared_circuit, share_circuit
+from qiskit_tket_passes.utils import qiskit_dag_to_tk
+
+class TestCircuitEncoding(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.circ = QuantumCircuit(3)
+        for _ in range(5):
+            self.circ.h(0)
+            self.circ.cx(0, 1)
+            self.circ.rz(0.2, 1)
+            self.circ.swap(1, 2)
+            self.circ.ccx(0, 1, 2)
+        self.circ.global_phase = 0.3
+
+    def test_encode_dag(self):
+        dag = circuit_to_dag(self.circ)
+        encoded = encode_dag(dag)
+        self.assertEqual(len(encoded.optypes), 25)
+        self.assertEqual(encoded.arg_offsets[-1], len(encoded.args))
+        self.assertEqual(decode_tk(encoded), qiskit_dag_to_tk(dag))
+        self.assertTrue(Operator(dag_to_circuit(decode_dag(encoded))).equiv(Operator(self.circ)))
+
+    def test_encode_tk(self):
+        circ = QuantumCircuit(QuantumRegister(2, 'a'), QuantumRegister(1, 'b'), ClassicalRegister(3, 'm'))
+        circ.h(0)
+        circ.cx(0, 2)
+        circ.barrier()
+        circ.rz(0.3, 1)
+        circ.measure(range(3), range(3))
+        tkcirc = qiskit_dag_to_tk(circuit_to_dag(circ))
+
+        new_circ = dag_to_circuit(decode_dag(encode_tk(tkcirc)))
+        self.assertEqual(new_circ, circ)
+
+        # The implicit qubit permutation of the result is replaced by SWAP gates.
+        tkcirc = qiskit_dag_to_tk(circuit_to_dag(self.circ))
+        tkps.FullPeepholeOptimise().apply(tkcirc)
+        new_circ = dag_to_circuit(decode_dag(encode_tk(tkcirc)))
+        self.assertTrue(Operator(new_circ).equiv(Operator(self.circ)))
+
+        circ = QuantumCircuit(1)
+        circ.rz(Parameter('a'), 0)
+        with self.assertRaises(ValueError):
+            encode_tk(qiskit_dag_to_tk(circuit_to_dag(circ)))
+
+    def test_shared_memory(self):
+        encoded = encode_dag(circuit_to_dag(self.circ))
+        shared = share_circuit(encoded)
+        for unlink in (False, True):
+            read = read_shared_circuit(shared, unlink=unlink)
+            for name, value in encoded._asdict().items():
+                if isinstance(value, np.ndarray):
+                    np.testing.assert_array_equal(getattr(read, name), value)
+                else:
+                    self.assertEqual(getattr(read, name), value)
+        with self.assertRaises(FileNotFoundError):
+            read_shared_circuit(shared)
+
+        shared = share_circuit(encode_dag(circuit_to_dag(QuantumCircuit(2))))
+        self.assertEqual(len(read_shared_circuit(shared).optypes), 0)
+        release_shared_circuit(shared)
+        release_shared_circuit(shared)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import tempfile
+import unittest
+
+import numpy as np
+from qiskit.circuit import QuantumCircuit
+from qiskit.converters import circuit_to_dag
+from qiskit.quantum_info import Operator
+from qiskit.providers.fake_provider import FakeQuitoV2
+from qiskit.transpiler import PassManager, PassManagerConfig
+
+import pytket.passes as tkps
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass, instrumentation
+from qiskit_tket_passes.cost_model import FEATURES, AutoTketPass, CostModel, circuit_features
+from qiskit_tket_passes.plugins import TketAutoOptimizationPassManager
+
+class TestCostModel(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.circ = QuantumCircuit(3)
+        for _ in range(5):
+            self.circ.h(0)
+            self.circ.cx(0, 1)
+            self.circ.rz(0.2, 1)
+            self.circ.cx(1, 2)
+
+        self.levels = {
+            1: [ToQiskitPass(tkps.RemoveRedundancies)],
+            3: [ToQiskitPass(tkps.FullPeepholeOptimise)],
+        }
+
+    def test_circuit_features(self):
+        features = circuit_features(circuit_to_dag(self.circ))
+        self.assertEqual(features, {'qubits': 3, 'gates': 20, 'two_qubit_gates': 10, 'clifford_gates': 15})
+
+    def test_fit(self):
+        expected = CostModel({'default': [-9.0, 0.0, 1.0, 0.0, 0.0], 'SynthesiseTket': [-8.0, 0.5, 1.5, 0.2, -0.3]})
+        rng = np.random.default_rng(0)
+        records = []
+        for _ in range(40):
+            features = dict(zip(FEATURES, (int(value) for value in rng.integers(1, 1000, len(FEATURES)))))
+            step = {'pass_names': ['SynthesiseTket'], 'features': features, 'time': expected.predict(['SynthesiseTket'], features)}
+            records.append({'pass': 'AutoTketPass', 'steps': [step]})
+        records.append({'pass': 'TketPass_SynthesiseTket', 'time': 1.0})
+
+        model = CostModel.fit(records)
+        # The ridge penalty only slightly biases the fit towards the default exponents.
+        for record in records[:-1]:
+            step = record['steps'][0]
+            self.assertAlmostEqual(model.predict(step['pass_names'], step['features']) / step['time'], 1, delta=0.2)
+        self.assertEqual(model.coefficients['CliffordSimp'], CostModel().coefficients['CliffordSimp'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cost_model.json')
+            model.save(path)
+            self.assertEqual(CostModel.load(path).coefficients, model.coefficients)
+
+    def test_fit_fused_steps(self):
+        expected = CostModel({
+            'default': [-9.0, 0.0, 1.0, 0.0, 0.0],
+            'SynthesiseTket': [-8.0, 0.5, 1.5, 0.2, -0.3],
+            'RemoveRedundancies': [-11.0, 0.0, 1.8, -0.2, -0.5],
+        })
+        rng = np.random.default_rng(0)
+        records = []
+        for index in range(60):
+            # Only fused steps, with the passes in different proportions
+            pass_names = ['SynthesiseTket', 'RemoveRedundancies'] + ['RemoveRedundancies'] * (index % 3)
+            features = dict(zip(FEATURES, (int(value) for value in rng.integers(1, 1000, len(FEATURES)))))
+            step = {'pass_names': pass_names, 'features': features, 'time': expected.predict(pass_names, features)}
+            records.append({'pass': 'AutoTketPass', 'steps': [step]})
+
+        model = CostModel.fit(records)
+        for record in records:
+            step = record['steps'][0]
+            self.assertAlmostEqual(model.predict(step['pass_names'], step['features']) / step['time'], 1, delta=0.2)
+        self.assertNotEqual(model.coefficients['RemoveRedundancies'], CostModel().coefficients['RemoveRedundancies'])
+
+    def test_fit_tket_auto_plugin_records(self):
+        pm = TketAutoOptimizationPassManager().pass_manager(PassManagerConfig.from_backend(FakeQuitoV2()), optimization_level=2)
+        records = []
+        sink = instrumentation.add_sink(lambda record: records.append(record) if record['pass'] == 'AutoTketPass' else None)
+        try:
+            for num_gates in (5, 10, 20):
+                circ = QuantumCircuit(3)
+                for _ in range(num_gates):
+                    circ.h(0)
+                    circ.cx(0, 1)
+                    circ.rz(0.2, 1)
+                    circ.cx(1, 2)
+                pm.run(circ)
+        finally:
+            instrumentation.remove_sink(sink)
+        # The stage fuses its passes, so most steps apply several of them.
+        steps = [step for record in records for step in record['steps']]
+        fused = {name for step in steps if len(step['pass_names']) > 1 for name in step['pass_names']}
+        fused -= {name for step in steps if len(step['pass_names']) == 1 for name in step['pass_names']}
+        self.assertIn('SynthesiseTket', fused)
+
+        def _log_error(model):
+            return sum((np.log(model.predict(step['pass_names'], step['features'])) - np.log(step['time'])) ** 2 for step in steps)
+
+        model = CostModel.fit(records)
+        for name in fused:
+            self.assertNotEqual(model.coefficients[name], CostModel()._coefficients(name).tolist())
+        self.assertLess(_log_error(model), _log_error(CostModel()))
+
+    def test_auto_pass(self):
+        _pass = AutoTketPass(self.levels, time_budget=float('inf'))
+        pm = PassManager(_pass)
+        new_circ = pm.run(self.circ)
+        self.assertEqual(pm.property_set['tket_auto']['level'], 3)
+        self.assertTrue(Operator(new_circ).equiv(Operator(self.circ)))
+        self.assertEqual([step['pass_names'] for step in _pass.last_record['steps']], [['FullPeepholeOptimise']])
+
+        pm = PassManager(AutoTketPass(self.levels, time_budget=0))
+        new_circ = pm.run(self.circ)
+        self.assertEqual(pm.property_set['tket_auto']['level'], 1)
+        self.assertTrue(Operator(new_circ).equiv(Operator(self.circ)))
+
+        with self.assertRaises(ValueError):
+            AutoTketPass({1: [tkps.RemoveRedundancies()]})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,10 +1,39 @@
+import os
+import subprocess
+import sys
 import unittest
+from unittest import mock
 
+from qiskit import transpile
+from qiskit.circuit import QuantumCircuit
+from qiskit.providers.fake_provider import FakeQuitoV2
+from qiskit.quantum_info import Operator, Statevector
+from qiskit.transpiler import CouplingMap, PassManagerConfig, Target
 from qiskit.transpiler.preset_passmanagers.plugin import (
     list_stage_plugins,
     passmanager_stage_plugins,
 )
 import qiskit_tket_passes.plugins as plgn
+
+TKET_STAGES = {f'{stage}_method': 'tket' for stage in ['init', 'layout', 'routing', 'translation', 'optimization']}
+
+def _permuting_circuit():
+    circ = QuantumCircuit(4)
+    circ.h(0)
+    for qubit_0, qubit_1 in [(0, 1), (1, 2), (2, 3), (3, 0), (0, 2)]:
+        circ.cx(qubit_0, qubit_1)
+    circ.swap(1, 3)
+    circ.rz(0.3, 3)
+    return circ
+
+def _is_equivalent(tr_circ, circ):
+    # The operator of a transpiled circuit follows its layouts, and may act on its ancillas too.
+    # Only the states from |0...0> are compared, as `SimplifyInitial` relies on that initial state.
+    operator = Operator.from_circuit(tr_circ)
+    padded = QuantumCircuit(operator.num_qubits)
+    padded.compose(circ, range(circ.num_qubits), inplace=True)
+    state = Statevector.from_int(0, 2 ** operator.num_qubits)
+    return state.evolve(operator).equiv(state.evolve(padded))
     
 class TestPassManagerStagePlugins(unittest.TestCase):
     def test_plugins_are_installed(self):
@@ -28,6 +57,66 @@ class TestPassManagerStagePlugins(unittest.TestCase):
         plugins = passmanager_stage_plugins('optimization')
         self.assertIsInstance(plugins['tket'], plgn.TketOptimizationPassManager)
 
+    def test_plugins_do_not_import_pytket(self):
+        # Qiskit imports the plugins module whenever it discovers stage plugins.
+        code = 'import sys, qiskit_tket_passes.plugins; print(any(name.split(".")[0] == "pytket" for name in sys.modules))'
+        parent = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+        result = subprocess.run([sys.executable, '-c', code], cwd=parent, capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    def test_all_to_all_targets_skip_mapping(self):
+        target = Target.from_configuration(basis_gates=['cx', 'rz', 'sx', 'x'], num_qubits=4, coupling_map=CouplingMap.from_full(4))
+        config = PassManagerConfig(target=target, basis_gates=list(target.operation_names), coupling_map=target.build_coupling_map())
+
+        self.assertIsNone(plgn.TketRoutingPassManager().pass_manager(config, optimization_level=1))
+        layout = plgn.TketLayoutPassManager().pass_manager(config, optimization_level=1)
+        circ = QuantumCircuit(3)
+        circ.cx(0, 1)
+        circ.cx(0, 2)
+        laid_out = layout.run(circ)
+        self.assertEqual(laid_out.num_qubits, 4)
+        self.assertEqual([laid_out.find_bit(qubit).index for qubit in laid_out.data[1].qubits], [0, 2])
+
+        translation = plgn.TketTranslationPassManager().pass_manager(config, optimization_level=1)
+        self.assertEqual(translation.run(circ), circ)
+        self.assertIsNone(translation.property_set['tket_pass_modified'])
+        circ.h(1)
+        translated = translation.run(circ)
+        self.assertTrue(set(translated.count_ops()) <= set(target.operation_names))
+        self.assertTrue(Operator(translated).equiv(Operator(circ)))
+
+        config = PassManagerConfig(basis_gates=['cx', 'rz', 'sx', 'x', 'save_statevector'])
+        self.assertIsNone(plgn.TketLayoutPassManager().pass_manager(config, optimization_level=1))
+        self.assertIsNone(plgn.TketRoutingPassManager().pass_manager(config, optimization_level=1))
+
+    def test_transpile_level_3_sets_final_layout(self):
+        circ = _permuting_circuit()
+        tr_circ = transpile(circ, backend=FakeQuitoV2(), optimization_level=3, seed_transpiler=0, **TKET_STAGES)
+
+        self.assertIsNotNone(tr_circ.layout.final_layout)
+        self.assertTrue(_is_equivalent(tr_circ, circ))
+
+    def test_transpile_tket_auto_stages(self):
+        circ = _permuting_circuit()
+        stages = dict(TKET_STAGES, init_method='tket_auto', optimization_method='tket_auto')
+        for optimization_level in range(4):
+            with self.subTest(optimization_level=optimization_level):
+                tr_circ = transpile(circ, backend=FakeQuitoV2(), optimization_level=optimization_level, seed_transpiler=0, **stages)
+                self.assertTrue(set(tr_circ.count_ops()) <= set(FakeQuitoV2().target.operation_names))
+                self.assertTrue(_is_equivalent(tr_circ, circ))
+
+    def test_transpile_basis_gates_only(self):
+        basis_gates = ['cx', 'rz', 'sx', 'x']
+        circ = _permuting_circuit()
+        # Without `ElidePermutations`, passes before layout replace implicit permutations by SWAP gates.
+        for supports_permutation_layout in [True, False]:
+            with mock.patch('qiskit_tket_passes.to_qiskit_pass._supports_virtual_permutation_layout', return_value=supports_permutation_layout):
+                for optimization_level in range(4):
+                    with self.subTest(supports_permutation_layout=supports_permutation_layout, optimization_level=optimization_level):
+                        tr_circ = transpile(circ, basis_gates=basis_gates, optimization_level=optimization_level, seed_transpiler=0, **TKET_STAGES)
+                        self.assertTrue(set(tr_circ.count_ops()) <= set(basis_gates))
+                        self.assertTrue(_is_equivalent(tr_circ, circ))
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+
+import numpy as np
+from qiskit.circuit import Parameter, QuantumCircuit
+try:
+    from qiskit.extensions import UnitaryGate
+except ImportError:
+    from qiskit.circuit.library import UnitaryGate
+from qiskit.converters import circuit_to_dag
+from qiskit.transpiler import PassManager
+import pytket.passes as tkps
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes.result_cache import CompiledCircuitCache, dag_structure_key
+
+def _ansatz(name):
+    theta = Parameter(name)
+    circ = QuantumCircuit(2)
+    circ.h(0)
+    circ.cx(0, 1)
+    circ.rz(theta, 1)
+    circ.cx(0, 1)
+    circ.cx(0, 1)
+    return circ
+
+class TestCompiledCircuitCache(unittest.TestCase):
+
+    def test_hit_rebinds_parameters(self):
+        cache = CompiledCircuitCache()
+        pm = PassManager([ToQiskitPass(tkps.RemoveRedundancies, result_cache=cache)])
+
+        first = pm.run(_ansatz('a'))
+        second = pm.run(_ansatz('b'))
+
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        self.assertEqual([param.name for param in first.parameters], ['a'])
+        self.assertEqual([param.name for param in second.parameters], ['b'])
+        self.assertEqual(second.count_ops(), first.count_ops())
+
+    def test_hit_sets_modified(self):
+        cache = CompiledCircuitCache()
+        _pass = ToQiskitPass(tkps.RemoveRedundancies, result_cache=cache)
+        redundant = QuantumCircuit(2)
+        redundant.h(0)
+        redundant.cx(0, 1)
+        redundant.cx(0, 1)
+        optimal = QuantumCircuit(2)
+        optimal.h(0)
+        optimal.cx(0, 1)
+
+        # Every hit follows a run with the other outcome.
+        for circ, modified in [(redundant, True), (optimal, False), (redundant, True), (optimal, False)]:
+            dag = circuit_to_dag(circ)
+            new_dag = _pass.run(dag)
+            self.assertEqual(_pass.property_set['tket_pass_modified'], modified)
+            self.assertEqual(new_dag is dag, not modified)
+        self.assertEqual(cache.info().hits, 2)
+
+    def test_key_of_array_parameters(self):
+        # Permutation matrices that only differ in the middle, where their repr is abbreviated
+        keys = set()
+        for row in (30, 31):
+            matrix = np.eye(64)
+            matrix[[row, row + 2]] = matrix[[row + 2, row]]
+            circ = QuantumCircuit(6)
+            circ.append(UnitaryGate(matrix), range(6))
+            keys.add(dag_structure_key(circuit_to_dag(circ))[0])
+        self.assertEqual(len(keys), 2)
+
+    def test_disk_tier_is_shared(self):
+        with tempfile.TemporaryDirectory() as directory:
+            pm = PassManager([ToQiskitPass(tkps.SynthesiseTket, result_cache=CompiledCircuitCache(directory=directory))])
+            pm.run(_ansatz('a'))
+
+            cache = CompiledCircuitCache(directory=directory)
+            pm = PassManager([ToQiskitPass(tkps.SynthesiseTket, result_cache=cache)])
+            pm.run(_ansatz('c'))
+
+            self.assertEqual(cache.info().disk_hits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
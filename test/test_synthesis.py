@@ -0,0 +1,46 @@
+import unittest
+
+import numpy as np
+from qiskit.providers.fake_provider import FakeQuitoV2
+import pytket.passes as tkps
+from pytket.circuit import Circuit
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes.synthesis import _CX_RECIPES, SynthesisCache, default_synthesis_cache
+from qiskit_tket_passes.target_cache import default_cache
+
+class TestSynthesis(unittest.TestCase):
+
+    def test_seeded_replacements_are_exact(self):
+        cx = Circuit(2).CX(0, 1).get_unitary()
+        swap = Circuit(2).SWAP(0, 1).get_unitary()
+        cache = SynthesisCache()
+        for gates, _, _ in _CX_RECIPES:
+            basis = gates | {'measure', 'reset'}
+            self.assertTrue(np.allclose(cache.get(basis, 'cx_replacement').get_unitary(), cx))
+            self.assertTrue(np.allclose(cache.get(basis, 'swap_replacement').get_unitary(), swap))
+        self.assertEqual(cache.info().transpilations, 0)
+
+    def test_unseeded_basis_is_transpiled_once(self):
+        cache = SynthesisCache()
+        basis = {'cz', 'rx', 'ry', 'measure'}
+        circ = cache.get(basis, 'cx_replacement')
+        self.assertTrue(np.allclose(circ.get_unitary(), Circuit(2).CX(0, 1).get_unitary()))
+        self.assertIs(cache.get(basis, 'cx_replacement'), circ)
+        self.assertEqual(cache.info().transpilations, 1)
+        self.assertEqual(cache.info().hits, 1)
+
+    def test_rebase_passes_do_not_transpile(self):
+        default_cache.clear()
+        default_synthesis_cache.clear()
+        ToQiskitPass(tkps.RebaseCustom, target=FakeQuitoV2().target)
+        ToQiskitPass(tkps.DecomposeSwapsToCircuit, target=FakeQuitoV2().target)
+        self.assertEqual(default_synthesis_cache.info().transpilations, 0)
+
+if __name__ == '__main__':
+    unittest.main()
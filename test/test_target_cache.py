@@ -0,0 +1,58 @@
+import unittest
+
+from qiskit.providers.fake_provider import FakeManilaV2, FakeQuitoV2
+import pytket.passes as tkps
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes.target_cache import TargetArtifactCache, default_cache, target_fingerprint
+
+class TestTargetCache(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+
+        self.target = FakeQuitoV2().target
+
+    def test_fingerprint_depends_on_content(self):
+        self.assertEqual(target_fingerprint(self.target), target_fingerprint(FakeQuitoV2().target))
+        self.assertNotEqual(target_fingerprint(self.target), target_fingerprint(FakeManilaV2().target))
+
+    def test_fingerprint_is_memoized(self):
+        from qiskit_tket_passes import target_cache
+
+        target = FakeManilaV2().target
+        fingerprint = target_fingerprint(target)
+        self.assertIs(target_cache._fingerprints[id(target)][0], target)
+        self.assertEqual(target_fingerprint(target), fingerprint)
+
+        for _ in range(target_cache._FINGERPRINTS_MAXSIZE + 1):
+            target_fingerprint(FakeQuitoV2().target)
+        self.assertLessEqual(len(target_cache._fingerprints), target_cache._FINGERPRINTS_MAXSIZE)
+
+    def test_artifacts_are_shared_between_passes(self):
+        default_cache.clear()
+
+        pass_1 = ToQiskitPass(tkps.CXMappingPass, target=self.target)
+        misses = default_cache.info().misses
+        pass_2 = ToQiskitPass(tkps.CXMappingPass, target=FakeQuitoV2().target)
+
+        self.assertEqual(default_cache.info().misses, misses)
+        self.assertGreater(default_cache.info().hits, 0)
+        self.assertIs(pass_1.tket_argument('arc'), pass_2.tket_argument('arc'))
+
+    def test_lru_eviction(self):
+        cache = TargetArtifactCache(maxsize=1)
+        cache.get(self.target, 'value', lambda: 1)
+        cache.get(FakeManilaV2().target, 'value', lambda: 2)
+        self.assertEqual(cache.get(self.target, 'value', lambda: 3), 3)
+
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (0, 3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
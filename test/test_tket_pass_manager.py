@@ -1,10 +1,47 @@
+import asyncio
+import os
+import random
+import tempfile
 import unittest
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+from qiskit import QuantumCircuit
 from qiskit.circuit.random import random_circuit
-from pytket.passes import SequencePass
+from qiskit.quantum_info import Operator
+from pytket.architecture import Architecture
+from pytket.passes import DecomposeBoxes, DefaultMappingPass, FullPeepholeOptimise, RebaseTket, RemoveRedundancies, SequencePass, SynthesiseTket
 from pytket.extensions.qiskit import IBMQBackend
 from qiskit_tket_passes import TketPassManager
 
+class _OfflineBackend:
+    # Stands in for a pytket backend that needs no credentials: CX and TK1 (converted to U) gates
+    # on a line of 5 qubits.
+    coupling_map = [[0, 1], [1, 2], [2, 3], [3, 4]]
+    basis_gates = ['cx', 'u']
+
+    def default_compilation_pass(self, optimisation_level=2):
+        passes = [DecomposeBoxes()]
+        if optimisation_level == 1:
+            passes.append(SynthesiseTket())
+        elif optimisation_level >= 2:
+            passes.append(FullPeepholeOptimise())
+        passes += [DefaultMappingPass(Architecture(self.coupling_map)), RebaseTket(), RemoveRedundancies()]
+        return SequencePass(passes)
+
+def _random_circuit(seed, num_qubits=3, num_gates=10):
+    rng = random.Random(seed)
+    circ = QuantumCircuit(num_qubits)
+    for _ in range(num_gates):
+        qubit_0, qubit_1 = rng.sample(range(num_qubits), 2)
+        gate = rng.choice(['cx', 'h', 'rz'])
+        if gate == 'cx':
+            circ.cx(qubit_0, qubit_1)
+        elif gate == 'h':
+            circ.h(qubit_0)
+        else:
+            circ.rz(rng.random(), qubit_0)
+    return circ
+
 class TestTketPassManager(unittest.TestCase):
     def setUp(self):
         super().setUp()
@@ -51,5 +88,92 @@ class TestTketPassManager(unittest.TestCase):
                 qubit_1 = tr_circ.find_bit(_instruction.qubits[1])[0]
                 self.assertIn([qubit_0, qubit_1], coupling_map)
 
+class TestTketPassManagerOffline(unittest.TestCase):
+    def setUp(self):
+        super().setUp()
+
+        self.backend = _OfflineBackend()
+
+    def _assert_compiled(self, tr_circuits):
+        for tr_circ in tr_circuits:
+            for op in tr_circ.count_ops():
+                self.assertIn(op, self.backend.basis_gates)
+            for _instruction in tr_circ.data:
+                if _instruction.operation.name == 'cx':
+                    qubits = sorted(tr_circ.find_bit(qubit)[0] for qubit in _instruction.qubits)
+                    self.assertIn(qubits, self.backend.coupling_map)
+
+    def test_tket_pass_manager_run_batch(self):
+        circuits = [_random_circuit(seed) for seed in range(4)]
+        pm = TketPassManager(self.backend)
+
+        tr_circuits = list(pm.run_batch(circuits, max_workers=2))
+        self.assertEqual(len(tr_circuits), len(circuits))
+        self._assert_compiled(tr_circuits)
+
+        indices = sorted(index for index, _ in pm.run_batch(circuits, max_workers=2, ordered=False))
+        self.assertEqual(indices, list(range(len(circuits))))
+
+    def test_tket_pass_manager_run_batch_shared_memory(self):
+        circuits = [_random_circuit(seed) for seed in range(4)]
+        pm = TketPassManager(self.backend)
+
+        shared = list(pm.run_batch(circuits, max_workers=2, chunksize=2))
+        pickled = list(pm.run_batch(circuits, max_workers=2, chunksize=2, shared_memory=False))
+        self._assert_compiled(shared)
+        for shared_circ, pickled_circ in zip(shared, pickled):
+            self.assertEqual(Operator(shared_circ), Operator(pickled_circ))
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), 'Shared memory blocks are not listed in /dev/shm.')
+    def test_tket_pass_manager_run_batch_releases_shared_memory(self):
+        circuits = [_random_circuit(seed) for seed in range(6)]
+        pm = TketPassManager(self.backend)
+        blocks = set(os.listdir('/dev/shm'))
+
+        # Closing the generator early releases the blocks of the circuits and of the results, read or not.
+        for ordered in [True, False]:
+            results = pm.run_batch(circuits, max_workers=2, ordered=ordered, chunksize=2)
+            for _ in results:
+                break
+            results.close()
+            self.assertEqual(set(os.listdir('/dev/shm')) - blocks, set())
+
+    def test_tket_pass_manager_arun(self):
+        circuits = [_random_circuit(seed) for seed in range(4)]
+        pm = TketPassManager(self.backend)
+
+        async def _compile():
+            tr_circuits = await pm.arun(circuits, max_concurrency=2, timeout=60)
+            indices = sorted([index async for index, _ in pm.arun_iter(circuits, max_concurrency=2, ordered=False)])
+            return tr_circuits, indices
+
+        tr_circuits, indices = asyncio.run(_compile())
+        self.assertEqual(len(tr_circuits), len(circuits))
+        self.assertEqual(indices, list(range(len(circuits))))
+        self._assert_compiled(tr_circuits)
+
+    def test_tket_pass_manager_arun_with_executor(self):
+        circuits = [_random_circuit(seed) for seed in range(4)]
+        pm = TketPassManager(self.backend)
+
+        for executor_cls in [ThreadPoolExecutor, ProcessPoolExecutor]:
+            with self.subTest(executor=executor_cls.__name__), executor_cls(max_workers=2) as executor:
+                tr_circuits = asyncio.run(pm.arun(circuits, executor=executor, max_concurrency=2))
+                self.assertEqual(len(tr_circuits), len(circuits))
+                self._assert_compiled(tr_circuits)
+
+    def test_tket_pass_manager_save_load(self):
+        circ = _random_circuit(1)
+        pm = TketPassManager(self.backend, optimization_level=2)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pm.json')
+            pm.save(path)
+            loaded = TketPassManager.load(path)
+
+        self.assertIsInstance(loaded, TketPassManager)
+        self.assertEqual(loaded.run(circ), pm.run(circ))
+        self.assertEqual(loaded._tket_pass.to_dict(), pm._tket_pass.to_dict())
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
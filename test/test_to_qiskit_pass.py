@@ -1,12 +1,16 @@
 import unittest
 
-from qiskit.circuit import QuantumCircuit
+from qiskit.circuit import Measure, QuantumCircuit
+from qiskit.circuit.library import CXGate, SXGate, XGate
+from qiskit.converters import circuit_to_dag
+from qiskit.quantum_info import Operator
 from qiskit.providers.fake_provider import FakeQuitoV2
-from qiskit.transpiler import PassManager, TransformationPass
+from qiskit.transpiler import InstructionProperties, Layout, PassManager, Target, TransformationPass
+from qiskit.transpiler.passes import ApplyLayout, Optimize1qGates, SetLayout
 
 import pytket.passes as tkps
 from pytket.architecture import Architecture
-from pytket.circuit import OpType
+from pytket.circuit import Circuit, OpType
 from pytket.placement import GraphPlacement, NoiseAwarePlacement
 from pytket.transform import CXConfigType, PauliSynthStrat
 
@@ -15,7 +19,11 @@ import os
 current = os.path.dirname(os.path.realpath(__file__))
 parent = os.path.dirname(current)
 sys.path.append(parent)
-from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes import TimeBudgetExceeded, ToQiskitPass, fuse_tket_passes, portfolio_pass
+from qiskit_tket_passes import instrumentation
+from qiskit_tket_passes.portfolio import apply_portfolio, two_qubit_gate_cost
+from qiskit_tket_passes.result_cache import CompiledCircuitCache
+from qiskit_tket_passes.to_qiskit_pass import _average_errors_from_target
 
 class TestToQiskitPass(unittest.TestCase):
 
@@ -51,6 +59,29 @@ class TestToQiskitPass(unittest.TestCase):
         _pass = ToQiskitPass(tkps.CXMappingPass, target=self.target)
         self.assertIsInstance(_pass.tket_argument('placer'), NoiseAwarePlacement)
 
+    def test_noise_averages_from_target(self):
+        target = Target(num_qubits=3)
+        target.add_instruction(SXGate(), {(0,): InstructionProperties(error=0.1), (1,): InstructionProperties(error=0.2), (2,): None})
+        target.add_instruction(XGate(), {(0,): InstructionProperties(error=0.3), (1,): InstructionProperties(error=0.2)})
+        target.add_instruction(CXGate(), {(0, 1): InstructionProperties(error=0.01), (1, 0): InstructionProperties(error=0.03), (1, 2): InstructionProperties(error=0.02)})
+        target.add_instruction(Measure(), {(0,): InstructionProperties(error=0.05), (1,): InstructionProperties(error=0.06)})
+
+        node_errors, edge_errors, readout_errors = _average_errors_from_target(target, target.build_coupling_map())
+
+        self.assertEqual(node_errors.keys(), {0, 1})
+        self.assertAlmostEqual(node_errors[0], 0.2)
+        self.assertAlmostEqual(node_errors[1], 0.2)
+        self.assertEqual(edge_errors.keys(), {(0, 1), (1, 0), (1, 2), (2, 1)})
+        self.assertAlmostEqual(edge_errors[(0, 1)], 0.01)
+        self.assertAlmostEqual(edge_errors[(1, 0)], 0.03)
+        self.assertAlmostEqual(edge_errors[(2, 1)], 0.04)
+        self.assertEqual(readout_errors, {0: 0.05, 1: 0.06, 2: 0.0})
+
+    def test_noise_averages_without_error_data(self):
+        target = Target(num_qubits=2)
+        target.add_instruction(CXGate(), {(0, 1): None})
+        self.assertIsNone(_average_errors_from_target(target, target.build_coupling_map()))
+
     def test_placer_from_str(self):
         _pass = ToQiskitPass(tkps.CXMappingPass, target=self.target, placer='Graph')
         self.assertIsInstance(_pass.tket_argument('placer'), GraphPlacement)
@@ -80,5 +111,245 @@ class TestToQiskitPass(unittest.TestCase):
         _pass = ToQiskitPass(tkps.OptimisePhaseGadgets, cx_config='Tree')
         self.assertEqual(_pass.tket_argument('cx_config'), CXConfigType.Tree)
 
+    def test_fuse_consecutive_tket_passes(self):
+        passes = fuse_tket_passes([
+            ToQiskitPass(tkps.RemoveRedundancies),
+            ToQiskitPass(tkps.SynthesiseTket),
+            Optimize1qGates(),
+            ToQiskitPass(tkps.CliffordSimp, allow_swaps=False),
+        ])
+
+        self.assertEqual(len(passes), 3)
+        self.assertEqual(passes[0].__class__.__name__, 'TketPass_SequencePass')
+        self.assertIsInstance(passes[1], Optimize1qGates)
+        self.assertEqual(passes[2].__class__.__name__, 'TketPass_CliffordSimp')
+
+        circ = QuantumCircuit(2)
+        circ.h(0)
+        circ.cx(0, 1)
+        circ.cx(0, 1)
+        tr_circ = PassManager(passes).run(circ)
+        self.assertNotIn('cx', tr_circ.count_ops())
+
+    def test_instrumentation_records(self):
+        circ = QuantumCircuit(2)
+        circ.cx(0, 1)
+        circ.cx(0, 1)
+        circ.h(0)
+
+        records = []
+        callback_records = []
+        sink = instrumentation.add_sink(records.append)
+        try:
+            pm = PassManager([ToQiskitPass(tkps.RemoveRedundancies), Optimize1qGates()])
+            pm.run(circ, callback=instrumentation.pass_manager_callback(callback_records.append))
+        finally:
+            instrumentation.remove_sink(sink)
+
+        self.assertEqual(len(records), 1)
+        record = records[0]
+        self.assertEqual(record['pass'], 'TketPass_RemoveRedundancies')
+        self.assertEqual((record['gates_before'], record['gates_after']), (3, 1))
+        self.assertTrue(record['modified'])
+        for key in ['conversion_in_time', 'apply_time', 'conversion_out_time']:
+            self.assertGreaterEqual(record[key], 0)
+
+        self.assertEqual([_record['pass'] for _record in callback_records], ['TketPass_RemoveRedundancies', 'Optimize1qGates'])
+        self.assertIn('total_time', callback_records[0])
+        self.assertEqual(pm.property_set['tket_pass_records'], records)
+
+    def test_unchanged_circuit_is_not_converted_back(self):
+        circ = QuantumCircuit(2)
+        circ.h(0)
+        circ.cx(0, 1)
+        dag = circuit_to_dag(circ)
+
+        _pass = ToQiskitPass(tkps.RemoveRedundancies)
+        self.assertIs(_pass.run(dag), dag)
+        self.assertFalse(_pass.property_set['tket_pass_modified'])
+
+        circ.cx(0, 1)
+        dag = circuit_to_dag(circ)
+        self.assertIsNot(_pass.run(dag), dag)
+        self.assertTrue(_pass.property_set['tket_pass_modified'])
+
+    def test_windowed_pass(self):
+        circ = QuantumCircuit(3)
+        for _ in range(20):
+            circ.h(0)
+            circ.cx(0, 1)
+            circ.rz(0.2, 1)
+            circ.cx(1, 2)
+            circ.cx(0, 1)
+            circ.swap(1, 2)
+        circ.global_phase = 0.3
+
+        _pass = ToQiskitPass(tkps.FullPeepholeOptimise, window_depth=8)
+        new_circ = PassManager(_pass).run(circ)
+
+        self.assertGreater(_pass.last_record['windows'], 1)
+        self.assertLess(new_circ.size(), circ.size())
+        self.assertTrue(Operator(new_circ).equiv(Operator(circ)))
+
+        with self.assertRaises(ValueError):
+            ToQiskitPass(tkps.CXMappingPass, target=self.target, window_depth=8)
+
+    def test_placement_sets_layout(self):
+        circ = QuantumCircuit(3)
+        circ.cx(0, 1)
+        circ.cx(1, 2)
+        circ.cx(0, 2)
+
+        pm = PassManager(ToQiskitPass(tkps.NaivePlacementPass, target=self.target, set_layout=True))
+        new_circ = pm.run(circ)
+
+        layout = pm.property_set['layout']
+        self.assertEqual(set(layout.get_virtual_bits()), set(circ.qubits))
+        self.assertEqual(len(set(layout.get_virtual_bits().values())), circ.num_qubits)
+        self.assertEqual(new_circ, circ)
+
+    def test_routing_sets_final_layout(self):
+        circ = QuantumCircuit(5)
+        circ.h(0)
+        circ.cx(0, 2)
+        circ.cx(1, 4)
+        circ.cx(0, 4)
+        circ.cx(2, 3)
+
+        pm = PassManager([
+            SetLayout(Layout.generate_trivial_layout(*circ.qregs)),
+            ApplyLayout(),
+            ToQiskitPass(tkps.RoutingPass, target=self.target, set_layout=True),
+        ])
+        new_circ = pm.run(circ)
+
+        edges = set(self.target.build_coupling_map().get_edges())
+        for instruction in new_circ.data:
+            if len(instruction.qubits) == 2:
+                qubits = tuple(new_circ.find_bit(qubit).index for qubit in instruction.qubits)
+                self.assertTrue(qubits in edges or qubits[::-1] in edges)
+        self.assertIsNotNone(pm.property_set['final_layout'])
+
+    def test_time_budget_fallbacks(self):
+        circ = QuantumCircuit(3)
+        for _ in range(10):
+            circ.h(0)
+            circ.cx(0, 1)
+            circ.rz(0.2, 1)
+            circ.cx(1, 2)
+
+        _pass = ToQiskitPass(tkps.FullPeepholeOptimise, time_budget=60)
+        new_circ = PassManager(_pass).run(circ)
+        self.assertTrue(Operator(new_circ).equiv(Operator(circ)))
+        self.assertEqual(new_circ, PassManager(ToQiskitPass(tkps.FullPeepholeOptimise)).run(circ))
+
+        _pass = ToQiskitPass(tkps.FullPeepholeOptimise, time_budget=1e-6)
+        with self.assertRaises(TimeBudgetExceeded):
+            PassManager(_pass).run(circ)
+
+        _pass = ToQiskitPass(tkps.FullPeepholeOptimise, time_budget=1e-6, fallbacks=[ToQiskitPass(tkps.CliffordSimp, time_budget=1e-6), tkps.SynthesiseTket])
+        pm = PassManager(_pass)
+        new_circ = pm.run(circ)
+        self.assertTrue(Operator(new_circ).equiv(Operator(circ)))
+        self.assertEqual([_item['fallback'] for _item in pm.property_set['tket_fallbacks']], ['TketPass_CliffordSimp', 'TketPass_SynthesiseTket'])
+
+        pm = PassManager(ToQiskitPass(tkps.FullPeepholeOptimise, time_budget=1e-6, fallbacks=[None]))
+        self.assertEqual(pm.run(circ), circ)
+        self.assertEqual(pm.property_set['tket_fallbacks'], [{'pass': 'TketPass_FullPeepholeOptimise', 'time_budget': 1e-6, 'fallback': None}])
+        self.assertFalse(pm.property_set['tket_pass_modified'])
+
+    def test_incremental_pass(self):
+        circ = QuantumCircuit(3)
+        for _ in range(20):
+            circ.h(0)
+            circ.cx(0, 1)
+            circ.rz(0.2, 1)
+            circ.cx(1, 2)
+
+        result_cache = CompiledCircuitCache()
+        _pass = ToQiskitPass(tkps.FullPeepholeOptimise, result_cache=result_cache, incremental=True)
+        PassManager(_pass).run(circ)
+        self.assertEqual(result_cache.hits, _pass.last_record['window_cache_hits'])
+
+        circ.cx(2, 0)
+        circ.rx(0.5, 2)
+        new_circ = PassManager(_pass).run(circ)
+        self.assertGreater(_pass.last_record['window_cache_hits'], 0)
+        self.assertLess(_pass.last_record['window_cache_hits'], _pass.last_record['windows'])
+        self.assertTrue(Operator(new_circ).equiv(Operator(circ)))
+
+        fused = fuse_tket_passes([ToQiskitPass(tkps.SynthesiseTket), ToQiskitPass(tkps.RemoveRedundancies), ToQiskitPass(tkps.SimplifyInitial)], incremental=True)
+        self.assertEqual(len(fused), 2)
+        self.assertTrue(fused[0].incremental)
+        self.assertFalse(fused[1].incremental)
+
+    def test_portfolio_pass(self):
+        circ = QuantumCircuit(3)
+        for _ in range(10):
+            circ.h(0)
+            circ.cx(0, 1)
+            circ.rz(0.2, 1)
+            circ.cx(1, 2)
+            circ.cx(0, 1)
+
+        candidates = [tkps.RemoveRedundancies(), tkps.SequencePass([tkps.SynthesiseTket(), tkps.CliffordSimp()]), tkps.FullPeepholeOptimise()]
+        pm = PassManager(portfolio_pass(candidates, time_budget=60))
+        new_circ = pm.run(circ)
+        self.assertTrue(Operator(new_circ).equiv(Operator(circ)))
+
+        choice = pm.property_set['tket_portfolio'][0]
+        costs = choice['costs']
+        self.assertEqual(len(costs), 3)
+        self.assertEqual(choice['chosen'], choice['candidates'][costs.index(min(costs))])
+        self.assertEqual(sum(1 for instruction in new_circ.data if len(instruction.qubits) == 2), min(costs))
+
+        pm = PassManager(portfolio_pass([tkps.FullPeepholeOptimise(), tkps.SynthesiseTket()], time_budget=1e-6))
+        with self.assertRaises(TimeBudgetExceeded):
+            pm.run(circ)
+
+        with self.assertRaises(ValueError):
+            portfolio_pass(candidates, cost='fidelity')
+
+        _pass = portfolio_pass([tkps.SynthesiseTket(), tkps.FullPeepholeOptimise()], target=self.target, cost='fidelity')
+        self.assertTrue(Operator(PassManager(_pass).run(circ)).equiv(Operator(circ)))
+
+        # A SWAP that FullPeepholeOptimise turns into an implicit permutation still costs a gate,
+        # unless the permutation is kept out of the circuit.
+        tkcirc = Circuit(2).CX(0, 1).CX(1, 0).CX(0, 1)
+        for implicit_swaps, expected in [(False, 1), (True, 0)]:
+            _, costs, _ = apply_portfolio([tkps.FullPeepholeOptimise()], tkcirc, two_qubit_gate_cost, implicit_swaps=implicit_swaps)
+            self.assertEqual(costs, [expected])
+
+    def test_mapping_reuses_precomputation(self):
+        circ = QuantumCircuit(3)
+        circ.cx(0, 1)
+        circ.cx(1, 2)
+        circ.rz(0.3, 0)
+
+        layouts = []
+        for _ in range(2):
+            _pass = ToQiskitPass(tkps.PlacementPass, target=self.target, placer='Graph', set_layout=True)
+            pm = PassManager(_pass)
+            pm.run(circ)
+            layouts.append(pm.property_set['layout'].get_virtual_bits())
+        self.assertTrue(_pass.last_record['placement_reused'])
+        self.assertEqual(layouts[0], layouts[1])
+
+        # Every CX is on an edge of the target.
+        circ = QuantumCircuit(5)
+        circ.cx(0, 1)
+        circ.cx(3, 1)
+        circ.cx(3, 4)
+        _pass = ToQiskitPass(tkps.RoutingPass, target=self.target, set_layout=True)
+        pm = PassManager([
+            SetLayout(Layout.generate_trivial_layout(*circ.qregs)),
+            ApplyLayout(),
+            _pass,
+        ])
+        new_circ = pm.run(circ)
+        self.assertTrue(_pass.last_record['routing_skipped'])
+        self.assertEqual(new_circ.count_ops(), circ.count_ops())
+        self.assertEqual(pm.property_set['final_layout'], Layout.generate_trivial_layout(*new_circ.qregs))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import unittest
+
+from qiskit.circuit import Gate, Parameter, QuantumCircuit
+from qiskit.converters import circuit_to_dag, dag_to_circuit
+from qiskit.quantum_info import Operator
+from qiskit.providers.fake_provider import FakeQuitoV2
+import pytket.passes as tkps
+
+import sys
+import os
+current = os.path.dirname(os.path.realpath(__file__))
+parent = os.path.dirname(current)
+sys.path.append(parent)
+from qiskit_tket_passes import ToQiskitPass
+from qiskit_tket_passes import utils
+from qiskit_tket_passes.utils import get_signatures, qiskit_dag_to_tk, select_signature, tk_to_qiskit_dag, tket_pass_from_dict
+
+class InnerGate(Gate):
+    def __init__(self, theta):
+        super().__init__('inner', 2, [theta])
+
+    def _define(self):
+        qc = QuantumCircuit(2, global_phase=0.4)
+        qc.h(0)
+        qc.cx(0, 1)
+        qc.rz(self.params[0], 1)
+        self.definition = qc
+
+class OuterGate(Gate):
+    def __init__(self):
+        super().__init__('outer', 3, [])
+
+    def _define(self):
+        qc = QuantumCircuit(3, global_phase=0.1)
+        qc.append(InnerGate(0.3), [1, 2])
+        qc.x(0)
+        qc.append(InnerGate(0.5), [2, 0])
+        self.definition = qc
+
+class TestUtils(unittest.TestCase):
+
+    def test_native_conversion_round_trip(self):
+        circ = QuantumCircuit(3, 3)
+        circ.h(0)
+        circ.cx(0, 1)
+        circ.rz(0.3, 1)
+        circ.rzz(0.7, 1, 2)
+        circ.sx(2)
+        circ.barrier()
+        circ.global_phase = 0.2
+
+        tkcirc = qiskit_dag_to_tk(circuit_to_dag(circ))
+        self.assertEqual(tkcirc.n_gates, 6)
+
+        tkps.SynthesiseTket().apply(tkcirc)
+        tr_circ = dag_to_circuit(tk_to_qiskit_dag(tkcirc))
+        self.assertTrue(Operator(tr_circ).equiv(Operator(circ)))
+
+        circ.measure(range(3), range(3))
+        tr_circ = dag_to_circuit(tk_to_qiskit_dag(qiskit_dag_to_tk(circuit_to_dag(circ))))
+        self.assertEqual(tr_circ.count_ops()['measure'], 3)
+
+    def test_symbolic_parameters_conversion(self):
+        theta = Parameter('theta')
+        circ = QuantumCircuit(1)
+        circ.rx(theta, 0)
+
+        tkcirc = qiskit_dag_to_tk(circuit_to_dag(circ))
+        self.assertEqual(len(tkcirc.free_symbols()), 1)
+
+        tr_circ = dag_to_circuit(tk_to_qiskit_dag(tkcirc))
+        self.assertEqual([param.name for param in tr_circ.parameters], ['theta'])
+
+    def test_nested_gate_definitions_expansion(self):
+        circ = QuantumCircuit(4)
+        circ.append(OuterGate(), [3, 1, 0])
+        circ.append(OuterGate(), [0, 1, 2])
+        circ.global_phase = 0.7
+        dag = circuit_to_dag(circ)
+
+        tkcirc = qiskit_dag_to_tk(dag)
+        self.assertEqual(tkcirc.n_gates, 14)
+        self.assertEqual(dag.count_ops(), {'outer': 2})
+        self.assertTrue(Operator(dag_to_circuit(tk_to_qiskit_dag(tkcirc))).equiv(Operator(circ)))
+
+        # Both instances share a single expansion of each definition
+        keys = [key[1:3] for key in utils._expansions if key[0] in (InnerGate, OuterGate)]
+        self.assertCountEqual(keys, [('inner', (0.3,)), ('inner', (0.5,)), ('outer', ())])
+
+    def test_signatures_of_overloaded_pass(self):
+        signatures = get_signatures(tkps.RebaseCustom)
+        self.assertGreater(len(signatures), 1)
+        self.assertIs(get_signatures(tkps.RebaseCustom), signatures)
+
+        # The parameter names of the overloads differ between pytket versions.
+        for signature in signatures:
+            kwargs = {argument[0]: None for argument in signature}
+            arg_names = {argument[0] for argument in select_signature(tkps.RebaseCustom, kwargs)}
+            self.assertTrue(arg_names.issuperset(kwargs))
+
+        self.assertEqual(select_signature(tkps.RebaseCustom, {}), signatures[0])
+
+    def test_tket_pass_from_dict_with_custom_rebase(self):
+        rebase = ToQiskitPass(tkps.RebaseCustom, target=FakeQuitoV2().target)._pass
+        tket_pass = tket_pass_from_dict(tkps.SequencePass([tkps.SynthesiseTket(), rebase]).to_dict())
+
+        circ = QuantumCircuit(2)
+        circ.h(0)
+        circ.cx(0, 1)
+        tkcirc = qiskit_dag_to_tk(circuit_to_dag(circ))
+        tket_pass.apply(tkcirc)
+
+        ops = dag_to_circuit(tk_to_qiskit_dag(tkcirc)).count_ops()
+        self.assertTrue(set(ops).issubset({'cx', 'id', 'rz', 'sx', 'x'}))
+
+if __name__ == '__main__':
+    unittest.main()